@@ -0,0 +1,91 @@
+"""Compare building every page of the Atom feed one at a time and in one pass.
+
+It also times building them again with the entries already serialized,
+as happens in watch mode.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.feeds --posts 10000 100000
+"""
+
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from mismiy import markdown
+from mismiy.gen import Gen
+from mismiy.loader import Page
+
+from .synthetic import WORDS
+
+
+class MemoryLoader:
+    """Stands in for a `Loader`, without having to write and parse files."""
+
+    id = "urn:uuid:9c6e0a5e-6c54-4d39-a1a4-c8e3a1b2d3e4"
+    title = "Synthetic blog"
+    url = "https://synthetic.example/"
+
+    def __init__(self, posts: list[Page]):
+        self._posts = posts
+
+    def posts(self) -> list[Page]:
+        # Like `Loader.posts`, make a new list each time.
+        return list(self._posts)
+
+
+def make_posts(count: int) -> list[Page]:
+    start = datetime(2000, 1, 1, 9, tzinfo=timezone.utc)
+    bodies = [f"Hello, *{word}*." for word in WORDS]
+    markdown.html_cache.html_many(bodies)  # So conversion is not measured.
+    return [
+        Page(
+            f"post-{i}",
+            {
+                "title": f"Post {i}",
+                "published": start + timedelta(hours=6 * i),
+                "kind": "post",
+            },
+            bodies[i % len(bodies)],
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--posts", type=int, nargs="+", default=[10_000, 100_000])
+    args = arg_parser.parse_args()
+
+    gen = Gen(Path(__file__).parent.parent / "templates")
+    for count in args.posts:
+        loader = MemoryLoader(make_posts(count))
+
+        gen.feed_entries.clear()
+        start = time.perf_counter()
+        page_count = (count + gen.page_size - 1) // gen.page_size
+        for page in range(1, page_count + 1):
+            gen._atom_feed(loader, page).to_string()
+        per_page = time.perf_counter() - start
+
+        gen.feed_entries.clear()
+        start = time.perf_counter()
+        for _, doc in gen.atom_feed(loader).docs():
+            doc.to_string()
+        single_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _, doc in gen.atom_feed(loader).docs():
+            doc.to_string()
+        cached = time.perf_counter() - start
+
+        print(
+            f"{count:7} posts, {page_count:5} feed pages: "
+            f"one at a time {per_page:6.2f}s, single pass {single_pass:6.2f}s, "
+            f"cached entries {cached:6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
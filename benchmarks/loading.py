@@ -0,0 +1,49 @@
+"""Compare loading many small pages serially and with worker processes.
+
+Worker processes are sent files in batches, or for comparison one file
+at a time. The parse cache is not used, so every file is parsed each time.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.loading --posts 20000 --jobs 4
+"""
+
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from mismiy import loader
+from mismiy.loader import Loader
+
+from .synthetic import make_site
+
+
+def load(posts_dir, jobs: int) -> float:
+    now = datetime(2100, 1, 1, tzinfo=timezone.utc)
+    start = time.perf_counter()
+    pages = Loader([posts_dir], now=now, jobs=jobs).pages()
+    assert pages
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--posts", type=int, default=20_000)
+    arg_parser.add_argument("--jobs", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        posts_dir = make_site(temp_dir, args.posts)
+        load(posts_dir, 1)  # So that all runs find the files in the OS cache.
+
+        print(f"{args.posts} pages:")
+        print(f"  serial            {load(posts_dir, 1):6.2f}s")
+        with patch.object(loader, "batch_size", lambda count, jobs: 1):
+            print(f"  {args.jobs} jobs, unbatched {load(posts_dir, args.jobs):6.2f}s")
+        print(f"  {args.jobs} jobs, batched   {load(posts_dir, args.jobs):6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
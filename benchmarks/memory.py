@@ -0,0 +1,125 @@
+"""Measure the memory used by pages, the tag index, and feed trees.
+
+The site is measured twice: with stand-ins for `Page`, `LazyPage`,
+`Person`, `TagInfo`, and `Elt` that keep their fields in a dict,
+and that give every element its own attribute dict and child list,
+as they used to; and with the compact classes themselves.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.memory --posts 100000
+"""
+
+import gc
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import MappingProxyType
+from unittest.mock import patch
+
+from mismiy import feeds, loader, markdown, tagging, xml
+from mismiy.gen import Gen
+from mismiy.loader import LazyPage, Loader, Page, Person
+from mismiy.tagging import Tagging, TagInfo
+from mismiy.xml import Elt
+
+from .synthetic import make_site
+
+
+def unslotted(cls: type, *bases: type) -> type:
+    """A copy of this slotted class whose instances have a `__dict__` instead."""
+    namespace = {
+        k: v
+        for k, v in vars(cls).items()
+        if k not in cls.__slots__ and k not in ("__slots__", "__weakref__")
+    }
+    return type(cls.__name__, bases or cls.__bases__, namespace)
+
+
+UnslottedPage = unslotted(Page)
+UnslottedLazyPage = unslotted(LazyPage, UnslottedPage)
+UnslottedPerson = unslotted(Person)
+UnslottedTagInfo = unslotted(TagInfo)
+
+
+class UnslottedElt(unslotted(Elt)):
+    """Gives every element its own attribute dict and child list."""
+
+    def __init__(self, etype: str, attrs=None, text: str = None):
+        super().__init__(etype, attrs, text)
+        self.attrs = MappingProxyType(dict(self.attrs))
+        self.elements = []
+
+
+STAND_INS = [
+    (loader, "Page", UnslottedPage),
+    (loader, "LazyPage", UnslottedLazyPage),
+    (loader, "Person", UnslottedPerson),
+    (tagging, "TagInfo", UnslottedTagInfo),
+    (xml, "Elt", UnslottedElt),
+    (feeds, "Elt", UnslottedElt),
+    (loader, "Elt", UnslottedElt),
+]
+
+
+def measure(posts_dir: Path, *, lazy: bool, stand_ins: bool):
+    now = datetime(2100, 1, 1, tzinfo=timezone.utc)
+    gen = Gen(Path(__file__).parent.parent / "templates")
+    gen.page_size = 100
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    loader = Loader([posts_dir], now=now, lazy=lazy)
+    pages = loader.pages()
+    after_pages = tracemalloc.get_traced_memory()[0]
+
+    tagging = Tagging()
+    for page in pages:
+        tagging.add(page)
+    after_tagging = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Convert the Markdown in advance so that only the feed trees are measured.
+    markdown.html_cache.html_many([page.body for page in pages])
+    tracemalloc.start()
+    feed_count = (len(pages) + gen.page_size - 1) // gen.page_size
+    feeds = [gen._atom_feed(loader, page=i + 1) for i in range(feed_count)]
+    feeds_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    mb = 1024 * 1024
+    print(
+        f"{len(pages)} pages ({'lazy' if lazy else 'eager'}, "
+        f"{'with stand-ins' if stand_ins else 'compact'}):"
+    )
+    print(f"  pages     {(after_pages - baseline) / mb:8.1f} MiB")
+    print(f"  tag index {(after_tagging - after_pages) / mb:8.1f} MiB")
+    print(f"  {len(feeds):4} feeds {feeds_size / mb:8.1f} MiB")
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--posts", type=int, default=10_000)
+    arg_parser.add_argument("--tags", type=int, default=50)
+    arg_parser.add_argument("--tags-per-post", type=int, default=3)
+    arg_parser.add_argument("--lazy", action="store_true")
+    args = arg_parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        posts_dir = make_site(temp_dir, args.posts, args.tags, args.tags_per_post)
+        # Load once first, so strings interned along the way are counted in neither.
+        Loader([posts_dir], lazy=args.lazy).pages()
+        with ExitStack() as stack:
+            for module, name, stand_in in STAND_INS:
+                stack.enter_context(patch.object(module, name, stand_in))
+            measure(posts_dir, lazy=args.lazy, stand_ins=True)
+        measure(posts_dir, lazy=args.lazy, stand_ins=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare writing a large site map with `Doc` and with `XmlWriter`.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.sitemap --urls 100000 1000000
+"""
+
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from mismiy.xml import Doc, XmlWriter
+
+NAMESPACES = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+
+
+def urls(count: int):
+    for i in range(count):
+        yield f"https://synthetic.example/post-{i}.html", f"2024-{i % 12 + 1:02d}-01"
+
+
+def with_doc(path: Path, count: int):
+    doc = Doc("sm:urlset", namespaces=NAMESPACES)
+    for loc, lastmod in urls(count):
+        url = doc.element("sm:url")
+        url.element("sm:loc", loc)
+        url.element("sm:lastmod", lastmod)
+    path.write_bytes(doc.to_string().encode("UTF-8"))
+
+
+def with_writer(path: Path, count: int):
+    with path.open("wb") as f, XmlWriter(f, "sm:urlset", namespaces=NAMESPACES) as w:
+        for loc, lastmod in urls(count):
+            with w.nested("sm:url"):
+                w.element("sm:loc", loc)
+                w.element("sm:lastmod", lastmod)
+
+
+def measure(func, path: Path, count: int) -> tuple[float, float]:
+    """The time taken in seconds and the peak memory in MiB."""
+    start = time.perf_counter()
+    func(path, count)
+    duration = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(path, count)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak / (1024 * 1024)
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--urls", type=int, nargs="+", default=[100_000])
+    args = arg_parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        doc_path = Path(temp_dir) / "doc.xml"
+        writer_path = Path(temp_dir) / "writer.xml"
+        for count in args.urls:
+            doc_time, doc_peak = measure(with_doc, doc_path, count)
+            writer_time, writer_peak = measure(with_writer, writer_path, count)
+            assert doc_path.read_bytes() == writer_path.read_bytes()
+
+            mb = doc_path.stat().st_size / (1024 * 1024)
+            print(
+                f"{count:8} URLs ({mb:.1f} MiB): "
+                f"Doc {doc_time:6.2f}s ({mb / doc_time:5.1f} MiB/s, peak {doc_peak:6.2f} MiB), "
+                f"XmlWriter {writer_time:6.2f}s ({mb / writer_time:5.1f} MiB/s, "
+                f"peak {writer_peak:6.2f} MiB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Generate synthetic sites for benchmarks."""
+
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from mismiy.loader import Page
+
+WORDS = (
+    "apple banana cherry damson elder fig grape hazel ilama jujube kiwi lime "
+    "mango nectarine olive peach quince raspberry sloe tamarind ugli vanilla "
+    "walnut xigua yuzu zucchini"
+).split()
+
+
+def make_site(
+    root: Path | str,
+    posts: int,
+    tags: int = 50,
+    tags_per_post: int = 3,
+    seed: int = 1,
+) -> Path:
+    """Write a directory of posts under `root` and return its path.
+
+    Tags are drawn from a Zipf-like distribution, so that a few are very
+    common and most are rare, as on a real blog.
+    """
+    rng = random.Random(seed)
+    tag_names, weights = zipf_tags(tags)
+    posts_dir = Path(root) / "posts"
+    posts_dir.mkdir(parents=True, exist_ok=True)
+    (posts_dir / "META.yaml").write_text(
+        "title: Synthetic blog\nurl: https://synthetic.example/\n"
+    )
+    start = datetime(2000, 1, 1, 9)
+    for i in range(posts):
+        published = start + timedelta(hours=6 * i)
+        post_tags = set(rng.choices(tag_names, weights, k=tags_per_post))
+        title = " ".join(rng.choices(WORDS, k=4)).title()
+        paragraphs = "\n\n".join(
+            " ".join(rng.choices(WORDS, k=40)).capitalize() + "."
+            for _ in range(rng.randint(1, 5))
+        )
+        tag_lines = "".join(f"  - {tag}\n" for tag in sorted(post_tags))
+        name = f"{published:%Y-%m-%d}-{i}.md"
+        (posts_dir / name).write_text(
+            f"title: {title}\n"
+            f"published: {published.isoformat()}\n"
+            f"tags:\n{tag_lines}"
+            f"\n{paragraphs}\n",
+            encoding="UTF-8",
+        )
+    return posts_dir
+
+
+def zipf_tags(tags: int) -> tuple[list[str], list[float]]:
+    """Names of tags and weights for choosing them, so that a few are very common."""
+    tag_names = [f"{WORDS[i % len(WORDS)].title()} {i}" for i in range(tags)]
+    weights = [1 / (i + 1) for i in range(tags)]
+    return tag_names, weights
+
+
+def make_tagged_pages(
+    posts: int, tags: int = 50, tags_per_post: int = 3, seed: int = 1
+) -> list[Page]:
+    """Make pages with tags like those of `make_site`, without writing files."""
+    rng = random.Random(seed)
+    tag_names, weights = zipf_tags(tags)
+    return [
+        Page(
+            f"post-{i}",
+            {
+                "title": f"Post {i}",
+                "tags": sorted(set(rng.choices(tag_names, weights, k=tags_per_post))),
+            },
+            "",
+        )
+        for i in range(posts)
+    ]
@@ -0,0 +1,85 @@
+"""Compare indexing pages by tags with lists and with bitsets.
+
+For each engine, pages with Zipf-like tags are indexed, then the pages
+and links of every tagged page are found, as `Gen` does. Combinations are
+limited to `--max-combination` tags, since otherwise `Tagging` needs
+memory for every subset of the tags of every page.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.tag_index --posts 10000 --tags 200 --tags-per-post 5
+"""
+
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from mismiy.tagging import BitsetTagging, Tagging, numpy
+
+from .synthetic import make_tagged_pages
+
+
+def index(tagging: Tagging, pages) -> Tagging:
+    for page in pages:
+        tagging.add(page)
+    tagging.count(frozenset())  # Looking something up builds the bitsets.
+    return tagging
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--posts", type=int, default=10000)
+    arg_parser.add_argument("--tags", type=int, default=200)
+    arg_parser.add_argument("--tags-per-post", type=int, default=5)
+    arg_parser.add_argument("--max-combination", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    pages = make_tagged_pages(args.posts, args.tags, args.tags_per_post)
+    engines = {
+        "lists": lambda: Tagging(max_combination_size=args.max_combination),
+        "bitsets": lambda: BitsetTagging(
+            max_combination_size=args.max_combination, use_numpy=False
+        ),
+    }
+    if numpy is not None:
+        engines["bitsets+numpy"] = lambda: BitsetTagging(
+            max_combination_size=args.max_combination, use_numpy=True
+        )
+
+    expected = None
+    for name, make in engines.items():
+        tracemalloc.start()
+        tagging = index(make(), pages)
+        size = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+        tracemalloc.stop()
+        del tagging
+
+        start = time.perf_counter()
+        tagging = index(make(), pages)
+        counts = {tags: len(ps) for tags, ps in tagging.combinations()}
+        indexing = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = {
+            tags: (
+                [tagging.tag_info(tag) for tag in tags],
+                tagging.narrowing_tags(tags),
+                tagging.widening_tags(tags),
+                count,
+            )
+            for tags, count in counts.items()
+        }
+        linking = time.perf_counter() - start
+        if expected is None:
+            expected = results
+        assert results == expected
+
+        print(
+            f"{name:14} {len(counts)} combinations, "
+            f"indexed in {indexing:6.2f}s ({size:7.2f} MiB), "
+            f"links in {linking:6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
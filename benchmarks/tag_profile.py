@@ -0,0 +1,94 @@
+"""Profile the share of build time spent working out tag infos.
+
+A site whose posts have many tags is generated twice: with `Tagging`,
+which remembers tags, hrefs, and labels, and for comparison with a subclass
+that works them out every time, as `Tagging` used to. Pages are loaded and
+their Markdown converted in advance, so only generating the site is profiled.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.tag_profile --posts 500 --tags 100 --tags-per-post 6
+"""
+
+import cProfile
+import pstats
+from argparse import ArgumentParser
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from mismiy import markdown
+from mismiy.gen import Gen
+from mismiy.loader import Loader
+from mismiy.tagging import Tagging, TagInfo, tagify
+
+from .synthetic import make_site
+
+
+class UnmemoizedTagging(Tagging):
+    """Works out tag infos, hrefs, and labels every time they are needed."""
+
+    def tag_info(self, term: str) -> TagInfo:
+        tag = tagify(term)
+        return TagInfo(
+            self.tag_labels[tag],
+            self.tags_file((tag,)),
+            self.count(frozenset((tag,))),
+        )
+
+    def tags_file(self, tags: Iterable[str]) -> str:
+        urlified = "+".join(sorted(tags))
+        return self.href_format.format(tags=urlified)
+
+    def combination_label(self, tags: frozenset[str]) -> str:
+        return " + ".join(sorted(self.tag_labels[tag] for tag in tags))
+
+
+def profile(loader: Loader, out_dir: Path, tagging_class: type[Tagging]):
+    gen = Gen(
+        Path(__file__).parent.parent / "templates",
+        incremental=False,
+        tagging_class=tagging_class,
+    )
+    profiler = cProfile.Profile()
+    profiler.runcall(gen.render_pages, loader, out_dir)
+    stats = pstats.Stats(profiler)
+
+    total = stats.total_tt
+    in_tags = sum(
+        cumtime
+        for (_, _, func), (_, _, _, cumtime, _) in stats.stats.items()
+        if func in ("_tagged_infos", "page_tags")
+    )
+    print(
+        f"{tagging_class.__name__:18} {total:6.2f}s, "
+        f"{in_tags:6.2f}s ({in_tags / total:5.1%}) working out tag infos"
+    )
+    return total, in_tags
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--posts", type=int, default=500)
+    arg_parser.add_argument("--tags", type=int, default=100)
+    arg_parser.add_argument("--tags-per-post", type=int, default=6)
+    args = arg_parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        posts_dir = make_site(temp_dir, args.posts, args.tags, args.tags_per_post)
+        loader = Loader([posts_dir], now=datetime(2100, 1, 1, tzinfo=timezone.utc))
+        markdown.html_cache.html_many([page.body for page in loader.pages()])
+
+        out_dir = Path(temp_dir) / "out"
+        # Build once first, so both profiles find the output files already there.
+        Gen(Path(__file__).parent.parent / "templates").render_pages(loader, out_dir)
+        total, before = profile(loader, out_dir, UnmemoizedTagging)
+        _, after = profile(loader, out_dir, Tagging)
+        print(
+            f"Remembering tag infos saves {(before - after) / total:.1%} of build time."
+        )
+
+
+if __name__ == "__main__":
+    main()
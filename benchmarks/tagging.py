@@ -0,0 +1,62 @@
+"""Time finding the narrowings of every combination of tags.
+
+The pages have tags drawn from a Zipf-like distribution. Narrowings are found
+from the lattice of combinations kept by `Tagging`, and for comparison by
+scanning every combination, as `Tagging.narrowing_tags` used to.
+
+Run from the root of the repository, for example:
+
+    python -m benchmarks.tagging --posts 2000 --tags 200 --tags-per-post 5
+"""
+
+import time
+from argparse import ArgumentParser
+
+from mismiy.tagging import Tagging, TagInfo
+
+from .synthetic import make_tagged_pages
+
+
+def narrowing_tags_by_scan(tagging: Tagging, tags: frozenset[str]) -> list[TagInfo]:
+    tag_count = len(tags) + 1
+    page_count = len(tagging.pages_by_tags[tags])
+    return [
+        TagInfo(tagging.tag_labels[next(iter(k - tags))], tagging.tags_file(k), len(ps))
+        for k, ps in tagging.pages_by_tags.items()
+        if k > tags and len(k) == tag_count and len(ps) < page_count
+    ]
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--posts", type=int, default=2000)
+    arg_parser.add_argument("--tags", type=int, default=200)
+    arg_parser.add_argument("--tags-per-post", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    pages = make_tagged_pages(args.posts, args.tags, args.tags_per_post)
+    start = time.perf_counter()
+    tagging = Tagging()
+    for page in pages:
+        tagging.add(page)
+    indexing = time.perf_counter() - start
+    combinations = [tags for tags, _ in tagging.combinations()]
+    print(
+        f"{len(pages)} pages, {len(tagging.tag_labels)} tags, "
+        f"{len(combinations)} combinations, indexed in {indexing:.2f}s"
+    )
+
+    start = time.perf_counter()
+    by_lattice = [tagging.narrowing_tags(tags) for tags in combinations]
+    lattice = time.perf_counter() - start
+    print(f"  narrowings from lattice {lattice:8.2f}s")
+
+    start = time.perf_counter()
+    by_scan = [narrowing_tags_by_scan(tagging, tags) for tags in combinations]
+    scan = time.perf_counter() - start
+    print(f"  narrowings by scanning  {scan:8.2f}s")
+    assert by_scan == by_lattice
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Remembering what each output file was made from, so unchanged ones can be skipped."""
+
+import json
+from dataclasses import asdict, dataclass, field
+from hashlib import sha256
+from pathlib import Path
+
+
+def digest(*parts: str) -> str:
+    """Hash these strings together, for comparing inputs between builds."""
+    h = sha256()
+    for part in parts:
+        h.update(part.encode("UTF-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+@dataclass
+class Changes:
+    """Names of the output files added, changed, and removed by a build."""
+
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+
+class BuildGraph:
+    """Maps each output file to the digests of the inputs it was generated from.
+
+    The inputs of an output are a dict whose keys name them
+    (like `page:about` or `template:post.html`) and whose values are digests.
+    If an output file exists and its inputs are the same as when it was
+    last generated, then it need not be generated again.
+    Static files copied to the output are recorded the same way,
+    with the modification time and size of the original as their input.
+
+    It is also a manifest of the hash of the content of each output file,
+    so that files are only written when their content changes,
+    and files from earlier builds that are no longer generated can be pruned.
+
+    The graph is saved as JSON in the output directory, so that it
+    is discarded along with the outputs it describes. It includes the
+    changes made by the last build, for the benefit of deployment scripts.
+    """
+
+    file_name = ".mismiy-build.json"
+    layout = 2
+
+    def __init__(self, public_path: Path | str, fingerprint: str = ""):
+        self.public_path = Path(public_path)
+        self.path = self.public_path / self.file_name
+        self.fingerprint = f"{self.layout} {fingerprint}"
+        self.outputs = {}
+        self.hashes = {}
+        self._load()
+        self.recorded = {}
+        self.changes = Changes()
+
+    def _load(self):
+        try:
+            with self.path.open(encoding="UTF-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Content hashes are still valid even if the inputs are not.
+        self.hashes = saved.get("hashes", {})
+        if saved.get("fingerprint") == self.fingerprint:
+            self.outputs = saved.get("outputs", {})
+
+    def up_to_date(self, name: str, inputs: dict[str, str]) -> bool:
+        """Whether this output exists and was generated from the same inputs."""
+        return self.outputs.get(name) == inputs and (self.public_path / name).exists()
+
+    def record(self, name: str, inputs: dict[str, str]):
+        """Note the inputs of this output, which is now up to date."""
+        self.recorded[name] = inputs
+
+    def write(self, name: str, text: str):
+        """Write this output file, unless it already has exactly this content."""
+        self.write_bytes(name, text.encode("UTF-8"))
+
+    def write_bytes(self, name: str, data: bytes):
+        """Write this output file, unless it already has exactly these bytes."""
+        new_hash = sha256(data).hexdigest()
+        path = self.public_path / name
+        if exists := path.exists():
+            old_hash = self.hashes.get(name) or sha256(path.read_bytes()).hexdigest()
+        else:
+            old_hash = None
+        if new_hash != old_hash:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            (self.changes.changed if exists else self.changes.added).append(name)
+        self.hashes[name] = new_hash
+
+    def prune(self):
+        """Delete output files from earlier builds that were not recorded in this one."""
+        for name in sorted(
+            (self.hashes.keys() | self.outputs.keys()) - self.recorded.keys()
+        ):
+            self.hashes.pop(name, None)
+            path = self.public_path / name
+            if path.exists():
+                path.unlink()
+                self.changes.removed.append(name)
+
+    def save(self):
+        """Write the graph for the outputs recorded in this build."""
+        self.outputs = self.recorded
+        self.recorded = {}
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with temp_path.open("w", encoding="UTF-8") as f:
+            json.dump(
+                {
+                    "fingerprint": self.fingerprint,
+                    "outputs": self.outputs,
+                    "hashes": self.hashes,
+                    "changes": asdict(self.changes),
+                },
+                f,
+            )
+        temp_path.replace(self.path)
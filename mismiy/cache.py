@@ -0,0 +1,33 @@
+"""Saving and loading caches that persist between runs."""
+
+import pickle
+from pathlib import Path
+from typing import Any
+
+
+def load_pickle(path: Path, fingerprint: str) -> Any | None:
+    """Load data saved with `save_pickle`.
+
+    Returns None if the file is missing or unreadable, or if it was
+    saved with a different fingerprint (say, by a different version).
+    """
+    try:
+        with path.open("rb") as f:
+            saved_fingerprint, data = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.PickleError):
+        return None
+    if saved_fingerprint == fingerprint:
+        return data
+
+
+def save_pickle(path: Path, fingerprint: str, data: Any):
+    """Save data so it can be loaded with `load_pickle`.
+
+    The file is replaced atomically, so a concurrent or interrupted
+    run does not leave a half-written cache behind.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with temp_path.open("wb") as f:
+        pickle.dump((fingerprint, data), f)
+    temp_path.replace(path)
@@ -9,8 +9,9 @@ from pathlib import Path
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from mismiy import markdown, tagging
 from mismiy.gen import Gen
-from mismiy.loader import Loader
+from mismiy.loader import Loader, ParseCache
 
 
 class GeneratingEventHandler(FileSystemEventHandler):
@@ -19,24 +20,28 @@ class GeneratingEventHandler(FileSystemEventHandler):
         self.gen = gen
         self.out_dir = out_dir
 
-    def again(self):
+    def again(self, *changed_files: Path | str):
         start = time.perf_counter()
-        self.loader.flush()
+        self.loader.invalidate(changed_files)
         self.gen.render_pages(self.loader, self.out_dir)
         duration = time.perf_counter() - start
         print(f"Generated again in {duration:.2f}s.")
 
     def on_created(self, event):
-        # for now we regenerate everything; this saves us having to work out dependencies.
-        self.again()
+        # Only the changed page is reloaded, but everything is regenerated;
+        # this saves us having to work out dependencies.
+        self.again(event.src_path)
 
     def on_modified(self, event):
-        # for now we regenerate everything; this saves us having to work out dependencies.
-        self.again()
+        # Directories are modified whenever the files in them are.
+        if not event.is_directory:
+            self.again(event.src_path)
 
     def on_deleted(self, event):
-        # for now we regenerate everything; this saves us having to work out dependencies.
-        self.again()
+        self.again(event.src_path)
+
+    def on_moved(self, event):
+        self.again(event.src_path, event.dest_path)
 
 
 class TemplateFlushingEventHandler(FileSystemEventHandler):
@@ -139,6 +144,79 @@ def main(argv: list[str] = None):
         help="Override the default locale. "
         "Must be a locale specifier like `en_GB.UTF-8`.",
     )
+    arg_parser.add_argument(
+        "--cache-dir",
+        metavar="PATH",
+        default=".mismiy-cache",
+        help="Directory for remembering parsed pages and HTML between runs. "
+        "Default is `.mismiy-cache`.",
+    )
+    arg_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the cache, and regenerate every output file.",
+    )
+    arg_parser.add_argument(
+        "--jobs",
+        "-j",
+        metavar="N",
+        type=int,
+        default=1,
+        help="Number of worker processes for loading and rendering pages. "
+        "Default is 1.",
+    )
+    arg_parser.add_argument(
+        "--archived-feeds",
+        action="store_true",
+        help="Put older posts in archive feeds that do not change once full.",
+    )
+    arg_parser.add_argument(
+        "--compact-feeds",
+        action="store_true",
+        help="Write feeds without indentation, to make them smaller.",
+    )
+    arg_parser.add_argument(
+        "--max-tag-combination",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Most tags to combine on one tagged page. Default is no limit.",
+    )
+    arg_parser.add_argument(
+        "--min-tagged-pages",
+        metavar="N",
+        type=int,
+        default=1,
+        help="Fewest pages for a combination of tags to get a page. Default is 1.",
+    )
+    arg_parser.add_argument(
+        "--tag-index",
+        metavar="ENGINE",
+        choices=list(tagging.ENGINES),
+        default="lists",
+        help="How to index pages by tags, `lists` or `bitsets`. Default is `lists`.",
+    )
+    arg_parser.add_argument(
+        "--equivalent-tag-pages",
+        metavar="MODE",
+        choices=["separate", "shared", "redirect"],
+        default="separate",
+        help="What to do with combinations of tags with the same pages as another: "
+        "`separate` pages, one `shared` page, or `redirect` to the shared page. "
+        "Default is `separate`.",
+    )
+    arg_parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Read the bodies of pages only when needed, to save memory.",
+    )
+    arg_parser.add_argument(
+        "--markdown",
+        metavar="ENGINE",
+        choices=list(markdown.ENGINES),
+        default="mistletoe",
+        help="Markdown implementation, `mistletoe` or `cmark`. Default is `mistletoe`.",
+    )
     arg_parser.add_argument(
         "pages_dirs",
         metavar="PATH",
@@ -147,17 +225,48 @@ def main(argv: list[str] = None):
         help="A directory with posts or pages. My be repeated. Default is just posts.",
     )
     args = arg_parser.parse_args(argv)
+    if args.max_tag_combination is not None and args.max_tag_combination < 1:
+        arg_parser.error("argument --max-tag-combination: must be at least 1")
 
     locale.setlocale(locale.LC_ALL, args.locale or "")
 
     now = args.as_of or datetime.now()
     include_drafts = args.drafts if args.drafts is not None else bool(args.watch)
+    try:
+        markdown.html_cache.use_engine(markdown.ENGINES[args.markdown]())
+    except RuntimeError as e:
+        arg_parser.error(str(e))
+    if args.no_cache:
+        cache = None
+    else:
+        cache = ParseCache(Path(args.cache_dir) / "pages.pickle")
+        markdown.html_cache.load(Path(args.cache_dir) / "html.pickle")
     loader = Loader(
-        [Path(x) for x in args.pages_dirs], include_drafts=include_drafts, now=now
+        [Path(x) for x in args.pages_dirs],
+        include_drafts=include_drafts,
+        now=now,
+        cache=cache,
+        jobs=args.jobs,
+        lazy=args.lazy,
     )
 
-    gen = Gen(Path(args.templates_dir), Path(args.static_dir))
-    gen.render_pages(loader, Path(args.out_dir))
+    gen = Gen(
+        Path(args.templates_dir),
+        Path(args.static_dir),
+        incremental=not args.no_cache,
+        jobs=args.jobs,
+        archived_feeds=args.archived_feeds,
+        compact_feeds=args.compact_feeds,
+        max_tag_combination=args.max_tag_combination,
+        min_tagged_pages=args.min_tagged_pages,
+        tagging_class=tagging.ENGINES[args.tag_index],
+        equivalent_tag_pages=args.equivalent_tag_pages,
+    )
+    changes = gen.render_pages(loader, Path(args.out_dir))
+    print(
+        f"Added {len(changes.added)}, changed {len(changes.changed)}, "
+        f"and removed {len(changes.removed)} files."
+    )
 
     if args.watch:
         print("Watching for changes ...")
@@ -0,0 +1,221 @@
+"""Generating the Atom feed of the posts."""
+
+from collections.abc import Iterator, Sequence
+from datetime import datetime
+from importlib.metadata import version
+from urllib.parse import urljoin
+
+from .build import digest
+from .loader import Page, datetime_naïve
+from .xml import Doc, Elt, Raw
+
+
+def feed_href(page: int) -> str:
+    """The href of this page of the feed, relative to the root of the site."""
+    return f"feed-{page}.atom" if page > 1 else "feed.atom"
+
+
+def archive_href(archive: int) -> str:
+    """The href of this archive document, relative to the root of the site."""
+    return f"feed-archive-{archive}.atom"
+
+
+class AtomFeed:
+    """Builds the pages of the Atom feed of these posts.
+
+    The posts are in chronological order, as returned by `Loader.posts`.
+    The first page of the feed has the most recent posts. The list of
+    posts is reversed once, so each page is a slice of it, and building
+    every page is a single pass over the posts.
+
+    If `archived` is true then instead of a paged feed there is an
+    archived feed as described in RFC 5005: the current feed has
+    the most recent posts, and older posts are in archive documents.
+    These are numbered from the oldest post, so that once one is full
+    its posts never change. Each archive document links to the next
+    newer one, so the newest changes once more, to gain that link,
+    when enough posts have been added to fill the next.
+
+    Entries are serialized once and copied in to each document they appear in.
+    If an `entry_cache` dict is supplied, serialized entries are kept in it
+    so they can be reused by the next feed built with the same cache,
+    so long as the post and the feed ID are unchanged.
+
+    If `compact` is true, documents are written without indentation or
+    line breaks between elements, which makes them smaller.
+    """
+
+    def __init__(
+        self,
+        posts: Sequence[Page],
+        id: str,
+        title: str,
+        url: str | None = None,
+        page_size: int = 12,
+        archived: bool = False,
+        entry_cache: dict[str, tuple[str, Raw]] | None = None,
+        compact: bool = False,
+    ):
+        self.recent = list(reversed(posts))
+        self.id = id
+        self.title = title
+        self.url = url
+        self.page_size = page_size
+        self.archived = archived
+        if archived:
+            self.page_count = 1 if self.recent else 0
+        else:
+            self.page_count = (len(self.recent) + page_size - 1) // page_size
+        self.archive_count = len(self.recent) // page_size if archived else 0
+        self.version = version("mismiy")
+        self.entry_cache = {} if entry_cache is None else entry_cache
+        self.compact = compact
+
+    def window(self, page: int) -> list[Page]:
+        """The posts in this page of the feed, most recent first."""
+        start = (page - 1) * self.page_size
+        return self.recent[start : start + self.page_size]
+
+    def archive_window(self, archive: int) -> list[Page]:
+        """The posts in this archive document, most recent first."""
+        end = len(self.recent) - (archive - 1) * self.page_size
+        return self.recent[end - self.page_size : end]
+
+    def to_string(self, doc: Doc) -> str:
+        """The text of one of the documents of this feed."""
+        return doc.to_string(compact=self.compact)
+
+    def docs(self) -> Iterator[tuple[str, Doc]]:
+        """Yield the href and document of each page of the feed."""
+        for archive in range(1, self.archive_count + 1):
+            yield archive_href(archive), self.archive_doc(archive)
+        for page in range(1, self.page_count + 1):
+            yield feed_href(page), self.doc(page)
+
+    def doc(self, page: int) -> Doc:
+        """The document for one page of the feed."""
+        doc = self._start(feed_href(page))
+        if page == 1 and self.url:
+            doc.element("atom:link", {"rel": "alternate", "href": self.url})
+
+        if self.archived:
+            if self.archive_count:
+                doc.element(
+                    "atom:link",
+                    {"rel": "prev-archive", "href": archive_href(self.archive_count)},
+                )
+        else:
+            if page > 1:
+                doc.element(
+                    "atom:link",
+                    {"rel": "first", "href": feed_href(1)},
+                )
+                doc.element(
+                    "atom:link",
+                    {"rel": "previous", "href": feed_href(page - 1)},
+                )
+            if page < self.page_count:
+                doc.element(
+                    "atom:link",
+                    {"rel": "next", "href": feed_href(page + 1)},
+                )
+                doc.element(
+                    "atom:link",
+                    {"rel": "last", "href": feed_href(self.page_count)},
+                )
+
+        return self._finish(doc, self.window(page))
+
+    def archive_doc(self, archive: int) -> Doc:
+        """The document for one archive of the feed.
+
+        Its content depends only on the posts in it and whether there is
+        a newer archive, so it does not change as more posts are added.
+        """
+        posts = self.archive_window(archive)
+        doc = self._start(archive_href(archive))
+        doc.element("fh:archive")
+        doc.element("atom:link", {"rel": "current", "href": feed_href(1)})
+        if archive > 1:
+            doc.element(
+                "atom:link",
+                {"rel": "prev-archive", "href": archive_href(archive - 1)},
+            )
+        if archive < self.archive_count:
+            doc.element(
+                "atom:link",
+                {"rel": "next-archive", "href": archive_href(archive + 1)},
+            )
+        return self._finish(doc, posts)
+
+    def _start(self, href: str) -> Doc:
+        doc = Doc("atom:feed")
+
+        # Feed metadata comes first
+        doc.element("atom:id", {}, self.id)
+        doc.element("atom:title", {}, self.title)
+        if url := self.url:
+            self_href = urljoin(url, href)
+            doc.attrs["xml:base"] = self_href
+            doc.element(
+                "atom:link",
+                {"rel": "self", "href": self_href},
+            )
+        return doc
+
+    def _finish(self, doc: Doc, posts: list[Page]) -> Doc:
+        updated = max(
+            (p.meta.get("updated", p.meta["published"]) for p in posts),
+            default=datetime(2024, 5, 5),
+        )
+        doc.element("atom:updated", {}, atom_date(updated))
+        doc.element(
+            "atom:generator",
+            {"uri": "https://github.com/pdc/mismiy", "version": self.version},
+            "Mismiy",
+        )
+
+        # Entries go at end.
+        for post in posts:
+            doc.append(self.cached_entry(post))
+        return doc
+
+    def forget_stale_entries(self):
+        """Remove entries for posts no longer in the feed from the entry cache."""
+        for name in self.entry_cache.keys() - {p.name for p in self.recent}:
+            del self.entry_cache[name]
+
+    def cached_entry(self, post: Page) -> Raw:
+        """The entry for one post, serialized ready to copy in to a feed document."""
+        key = digest(
+            self.id, str(self.compact), repr(sorted(post.meta.items())), post.body
+        )
+        if (cached := self.entry_cache.get(post.name)) and cached[0] == key:
+            return cached[1]
+        raw = self.entry(post).to_raw(
+            indent="  ", default_prefix="atom:", compact=self.compact
+        )
+        self.entry_cache[post.name] = key, raw
+        return raw
+
+    def entry(self, post: Page) -> Elt:
+        """The entry for one post."""
+        result = Elt("atom:entry")
+        result.element("atom:id", post.make_id(self.id))
+        result.element("atom:title", post.meta["title"])
+        result.element("atom:published", atom_date(post.meta["published"]))
+        updated = post.meta.get("updated") or post.meta["published"]
+        result.element("atom:updated", atom_date(updated))
+        if person := post.meta.get("author"):
+            result.append(person.atom_person("atom:author"))
+        result.element(
+            "atom:link", {"rel": "alternate", "type": "text/html", "href": post.href}
+        )
+        result.element("atom:content", {"type": "html"}, post.body_html())
+        return result
+
+
+def atom_date(d: datetime) -> str:
+    # Atom does not allow timestamps without time zones.
+    assert not datetime_naïve(d)
+    return d.isoformat()
@@ -1,16 +1,20 @@
-import shutil
-from collections.abc import Mapping, Sequence
+import locale
+import posixpath
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
-from importlib.metadata import version
+from html import escape
 from pathlib import Path
 from typing import Any
-from urllib.parse import urljoin
 
 from chevron import render
 
-from .loader import Loader, Page, datetime_naïve
-from .tagging import Tagging
+from . import markdown
+from .build import BuildGraph, Changes, digest
+from .feeds import AtomFeed, archive_href, feed_href
+from .loader import Loader, Page, month_name
+from .tagging import Tagging, TagInfo
+from .templates import CompiledTemplates
 from .xml import Doc, Elt
 
 
@@ -22,11 +26,75 @@ class Link:
     type: str | None = None
 
 
+@dataclass
+class Site:
+    """What the outputs are generated from, which is shared with worker processes."""
+
+    loader: Loader
+    tagging: Tagging
+    feed: AtomFeed
+
+
 class Gen:
+    """Generates the HTML pages and Atom feeds of the site.
+
+    Unless `incremental` is false, a build graph is kept in the output
+    directory and outputs whose inputs have not changed are not generated again.
+
+    If `jobs` is more than 1, then outputs are rendered by a pool of that
+    many worker processes, which are sent the templates, pages, and tags.
+
+    If `archived_feeds` is true, the feed is split in to archive documents
+    that do not change once full, instead of pages that all change
+    whenever a post is added. If `compact_feeds` is true, feeds are written
+    without indentation.
+
+    Pages are generated for combinations of up to `max_tag_combination` tags
+    (all of them if it is None) that have at least `min_tagged_pages` pages.
+    The index of pages by tags is made with `tagging_class`.
+
+    Combinations of tags with exactly the same pages as another have
+    their own pages if `equivalent_tag_pages` is `separate`. If it is `shared`,
+    they share the page of the combination with the most tags, and if it is
+    `redirect` they also get small pages that redirect to it.
+
+    The index of pages by tags is kept from one build to the next, as in
+    watch mode, and only the pages that have changed are indexed again.
+    Then the inputs of tag pages are worked out again only if they have
+    a tag from one of those pages.
+    """
+
     page_size = 12
 
-    def __init__(self, tpl_dir: Path | str, static_dir: Path | str = None):
+    def __init__(
+        self,
+        tpl_dir: Path | str,
+        static_dir: Path | str = None,
+        incremental: bool = True,
+        jobs: int = 1,
+        archived_feeds: bool = False,
+        compact_feeds: bool = False,
+        max_tag_combination: int | None = None,
+        min_tagged_pages: int = 1,
+        tagging_class: type[Tagging] = Tagging,
+        equivalent_tag_pages: str = "separate",
+    ):
         self.tpl_dir = Path(tpl_dir)
+        self.incremental = incremental
+        self.jobs = jobs
+        self.archived_feeds = archived_feeds
+        self.compact_feeds = compact_feeds
+        self.max_tag_combination = max_tag_combination
+        self.min_tagged_pages = min_tagged_pages
+        self.tagging_class = tagging_class
+        self.equivalent_tag_pages = equivalent_tag_pages
+        self.feed_entries = {}
+        self._tagging = None
+        self._tagging_options = None
+        self._tagged_pages = {}
+        self._page_order = {}
+        self._tagged_digests = {}
+        self.compiled = CompiledTemplates()
         self.flush_tpls()
         if static_dir:
             self.static_dir = Path(static_dir)
@@ -42,47 +110,302 @@ class Gen:
         self.templates = {
             self.fname(file): file.read_text() for file in self.tpl_dir.glob("**/*")
         }
+        self.compiled.load(self.templates)
+        self._template_digests = {}
+
+    def template_digest(self, name: str) -> str:
+        """Digest of this template and of the partials it includes."""
+        if (result := self._template_digests.get(name)) is None:
+            self._template_digests[name] = ""  # In case it includes itself.
+            text = self.templates.get(name, "")
+            tokens = self.compiled[name] if name in self.compiled else []
+            partials = sorted({key for tag, key in tokens if tag == "partial"})
+            result = digest(text, *(self.template_digest(p) for p in partials))
+            self._template_digests[name] = result
+        return result
+
+    def render_pages(self, loader: Loader, public_path: Path | str) -> Changes:
+        """Generate HTML files in the specified directory.
 
-    def render_pages(self, loader: Loader, public_path: Path | str):
-        """Generate HTML files in the specified directory."""
+        Static files are copied too, unless an output has the same name.
+        Files whose content is unchanged are not rewritten, and files
+        generated or copied by the previous build but not this one are deleted.
+        Returns the names of the files added, changed, and removed.
+        """
         public_path = Path(public_path)
-        if self.static_dir:
-            shutil.copytree(self.static_dir, public_path, dirs_exist_ok=True)
-        elif not public_path.exists():
-            public_path.mkdir()
+        public_path.mkdir(parents=True, exist_ok=True)
 
-        # Make an index of the pages by tags.
-        tagging = Tagging()
+        # Month names depend on the locale, and appear in any page with a date.
+        months = " ".join(month_name(m) for m in range(1, 13))
+        graph = BuildGraph(public_path, f"{markdown.html_cache.fingerprint} {months}")
+        if not self.incremental:
+            graph.outputs = {}
+        try:
+            self._render_all(loader, graph)
+            if self.static_dir:
+                self._copy_static(graph)
+            graph.prune()
+        finally:
+            graph.save()
+            markdown.html_cache.save()
+        return graph.changes
+
+    def _copy_static(self, graph: BuildGraph):
+        """Copy static files that have changed since the last build."""
+        for path in sorted(self.static_dir.rglob("*")):
+            name = path.relative_to(self.static_dir).as_posix()
+            if name in graph.recorded or not path.is_file():
+                continue  # Generated outputs take precedence.
+            st = path.stat()
+            inputs = {"static": f"{st.st_mtime_ns} {st.st_size}"}
+            if not graph.up_to_date(name, inputs):
+                graph.write_bytes(name, path.read_bytes())
+            graph.record(name, inputs)
+
+    def _render_all(self, loader: Loader, graph: BuildGraph):
         index_page = None
+        pages = []
         for page in loader.pages():
             if page.name == "index":
                 index_page = page
-                continue
-            tagging.add(page)
+            else:
+                pages.append(page)
+        # Digests of what is needed to link to each page.
+        ref_digests = {
+            page.name: digest(page.name, repr(sorted(page.meta.items())))
+            for page in loader.pages()
+        }
+        tagging, changed_tags, relabelled_tags = self._index_tags(pages, ref_digests)
 
-        # Now we can render the individual pages.
+        # Work out which outputs need generating, and render them.
+        site = Site(loader, tagging, self.atom_feed(loader))
+        site.feed.forget_stale_entries()
+        stale = []
+        plan = self._plan(site, index_page, ref_digests, changed_tags, relabelled_tags)
+        for name, job, inputs in plan:
+            if graph.up_to_date(name, inputs):
+                graph.record(name, inputs)
+            else:
+                stale.append((name, job, inputs))
+        texts = self._render_jobs([job for _, job, _ in stale], site)
+        for (name, _, inputs), text in zip(stale, texts):
+            graph.write(name, text)
+            graph.record(name, inputs)
+
+    def _index_tags(
+        self, pages: list[Page], ref_digests: dict[str, str]
+    ) -> tuple[Tagging, set[str] | None, set[str]]:
+        """Index the pages by tags, updating the index from the previous build.
+
+        Returns the index, the tags of pages added, removed, or changed
+        since the previous build (or None if the index was made afresh),
+        and those of them whose labels changed.
+        """
+        previous = self._tagged_pages
+        self._tagged_pages = {
+            page.name: (page, ref_digests[page.name]) for page in pages
+        }
+        self._page_order.clear()
+        self._page_order.update((page.name, i) for i, page in enumerate(pages))
+
+        options = (
+            self.tagging_class,
+            self.max_tag_combination,
+            self.min_tagged_pages,
+            self.equivalent_tag_pages,
+        )
+        if (
+            self._tagging is None
+            or options != self._tagging_options
+            # Pages with the same name cannot be told apart.
+            or len(self._tagged_pages) < len(pages)
+        ):
+            self._tagging_options = options
+            self._tagging = self.tagging_class(
+                max_combination_size=self.max_tag_combination,
+                min_pages=self.min_tagged_pages,
+                collapse_equivalent=self.equivalent_tag_pages != "separate",
+                page_order=self._page_order,
+            )
+            for page in pages:
+                self._tagging.add(page)
+            return self._tagging, None, set()
+
+        # Removed pages first, so the rest are all in the new order.
+        tagging = self._tagging
+        labels = dict(tagging.tag_labels)
+        changed = set()
+        for name, (page, _) in previous.items():
+            if name not in self._tagged_pages:
+                changed |= tagging.remove(page)
+        for name, (page, ref_digest) in self._tagged_pages.items():
+            if (old := previous.get(name)) is None:
+                changed |= tagging.add(page)
+            elif old[0] is not page or old[1] != ref_digest:
+                changed |= tagging.update(old[0], page)
+        changed_tags = {tag for tags in changed for tag in tags}
+        relabelled_tags = {
+            tag
+            for tag in changed_tags
+            if tagging.tag_labels.get(tag) != labels.get(tag)
+        }
+        return tagging, changed_tags, relabelled_tags
+
+    def _plan(
+        self,
+        site: Site,
+        index_page: Page | None,
+        ref_digests: dict[str, str],
+        changed_tags: set[str] | None = None,
+        relabelled_tags: set[str] = frozenset(),
+    ) -> Iterator[tuple[str, tuple, dict[str, str]]]:
+        """Yield the name, rendering job, and inputs of each output file.
+
+        The job is passed to `render_job` if the output needs generating.
+        The inputs of tag pages are reused from the previous build
+        unless they have one of `changed_tags` (or it is None), or
+        one of `relabelled_tags` narrows them.
+        """
+        loader, tagging, feed = site.loader, site.tagging, site.feed
+        # Digests of the pages, for deciding which outputs need generating.
+        page_digests = {}
+        for page in loader.pages():
+            page_digests[page.name] = digest(ref_digests[page.name], page.body)
+            page.drop_body()
+
+        # The individual pages.
         for page in loader.pages():
             if page.name == "index":
                 continue
+            layout = page.meta["kind"]
+            yield f"{page.name}.html", ("page", page), {
+                f"page:{page.name}": page_digests[page.name],
+                f"template:{layout}.html": self.template_digest(f"{layout}.html"),
+                "tags": digest(repr(tagging.page_tags(page))),
+            }
+
+        # The index pages.
+        posts = loader.posts()
+        inputs = {
+            "template:index.html": self.template_digest("index.html"),
+            "posts": digest(*(ref_digests[p.name] for p in posts)),
+        }
+        if index_page:
+            inputs["page:index"] = page_digests[index_page.name]
+        yield "index.html", ("index", index_page), inputs
+
+        tpl_digest = self.template_digest("tagged.html")
+        # Which tag pages share a page may change even if their tags have not.
+        if changed_tags is None or tagging.collapse_equivalent:
+            previous_digests = {}
+        else:
+            previous_digests = self._tagged_digests
+        # Other tags appear on a tag page only as narrowings, and then only
+        # their labels can change without its own tags changing as well.
+        stale = set()
+        if previous_digests and relabelled_tags:
+            for tags, _ in tagging.combinations():
+                for tag in relabelled_tags & tags:
+                    stale.add(tags - {tag})
+        self._tagged_digests = {}
+        for tags, pages in tagging.combinations():
+            name = tagging.tags_file(tags)
+            if (canonical := tagging.canonical_tags(tags)) != tags:
+                if self.equivalent_tag_pages == "redirect":
+                    href = tagging.tags_file(canonical)
+                    href = posixpath.relpath(href, posixpath.dirname(name))
+                    yield name, ("redirect", href), {"redirect": href}
+                continue
+            digests = previous_digests.get(tags)
+            if digests is None or not changed_tags.isdisjoint(tags) or tags in stale:
+                digests = (
+                    digest(*(ref_digests[p.name] for p in pages)),
+                    digest(*(repr(x) for x in self._tagged_infos(tagging, tags))),
+                )
+            self._tagged_digests[tags] = digests
+            yield name, ("tagged", tags), {
+                "template:tagged.html": tpl_digest,
+                "pages": digests[0],
+                "tags": digests[1],
+            }
 
+        # The feed pages.
+        feed_digest = digest(
+            feed.id,
+            feed.title,
+            feed.url or "",
+            str(feed.compact),
+            str(feed.page_count),
+            str(feed.archive_count),
+        )
+        for page in range(1, feed.page_count + 1):
+            yield feed_href(page), ("feed", page), {
+                "feed": feed_digest,
+                "posts": digest(*(page_digests[p.name] for p in feed.window(page))),
+            }
+
+        # Archives do not depend on how many posts come after them, only on
+        # whether there is a newer archive to link to, so once that has been
+        # written they are never generated again.
+        archive_digest = digest(feed.id, feed.title, feed.url or "", str(feed.compact))
+        for archive in range(1, feed.archive_count + 1):
+            posts = feed.archive_window(archive)
+            yield archive_href(archive), ("archive", archive), {
+                "feed": archive_digest,
+                "posts": digest(*(page_digests[p.name] for p in posts)),
+                "newest": str(archive == feed.archive_count),
+            }
+
+    def _render_jobs(self, jobs: list[tuple], site: Site) -> Iterable[str]:
+        """Render these jobs, in worker processes if there are enough to share."""
+        if self.jobs <= 1 or len(jobs) <= 1:
+            return (self.render_job(job, site) for job in jobs)
+        return self._render_jobs_in_parallel(jobs, site)
+
+    def _render_jobs_in_parallel(self, jobs: list[tuple], site: Site) -> Iterator[str]:
+        engine = markdown.html_cache.engine
+        initargs = (
+            (self, site),
+            locale.setlocale(locale.LC_ALL),
+            engine.name,
+            markdown.html_cache.path,
+        )
+        chunksize = max(1, len(jobs) // (self.jobs * 4))
+        with ProcessPoolExecutor(
+            self.jobs, initializer=_init_worker, initargs=initargs
+        ) as executor:
+            for text, converted in executor.map(
+                _render_in_worker, jobs, chunksize=chunksize
+            ):
+                # Remember HTML converted by the workers for next time.
+                markdown.html_cache.update(converted)
+                yield text
+
+    def render_job(self, job: tuple, site: Site) -> str:
+        """Render one output file, as planned by `_plan`."""
+        kind, key = job
+        if kind == "page":
+            page = key
             layout = page.meta["kind"]
             context = page.context()
-            if tags_info := tagging.page_tags(page):
+            if tags_info := site.tagging.page_tags(page):
                 context["tags"] = tags_info
-            self._render_1(public_path, f"{page.name}.html", context, f"{layout}.html")
-
-        # Now let’s render the index pages.
-        self.render_index(loader, public_path, index_page)
-        self.render_tagged(tagging, public_path)
-
-        post_count = len(loader.posts())
-        page_count = (post_count + self.page_size - 1) // self.page_size
-        for i in range(page_count):
-            feed_path = public_path / (self.feed_href(page=i + 1))
-            with feed_path.open("w", encoding="UTF-8") as f:
-                self._atom_feed(loader, page=(i + 1)).write_to(f)
+            result = self._render_1(f"{page.name}.html", context, f"{layout}.html")
+            page.drop_body()
+            return result
+        if kind == "index":
+            return self.render_index(site.loader, key)
+        if kind == "tagged":
+            return self.render_tagged(site.tagging, key)
+        if kind == "redirect":
+            return redirect_html(key)
+        if kind == "feed":
+            return site.feed.to_string(site.feed.doc(key))
+        if kind == "archive":
+            return site.feed.to_string(site.feed.archive_doc(key))
+        raise ValueError(f"Unknown kind of job {kind!r}")
 
-    def render_index(self, loader: Loader, public_path: Path, index_page: Page | None):
+    def render_index(self, loader: Loader, index_page: Page | None) -> str:
         links = [Link("alternate", self.feed_href(page=1), type="application/atom+xml")]
         context = {
             "reverse_chronological": [p.reference() for p in reversed(loader.posts())],
@@ -91,35 +414,37 @@ class Gen:
         }
         if index_page:
             context.update(index_page.context())
-        self._render_1(public_path, "index.html", context)
-
-    def render_tagged(self, tagging: Tagging, public_path: Path):
-        first = True
-        for tags, pages in tagging.pages_by_tags.items():
-            context = {
-                "tags": sorted(
-                    (tagging.tag_info(tag) for tag in tags),
-                    key=lambda t: (-t.count, t.label),
-                ),
-                "narrowings": tagging.narrowing_tags(tags),
-                "widenings": tagging.widening_tags(tags),
-                "reverse_chronological": [p.reference() for p in reversed(pages)],
-                "dotdotslash": "../",
-            }
-            name = tagging.tags_file(tags)
-            if first:
-                subdir = public_path / name.rpartition("/")[0]
-                if not subdir.exists():
-                    subdir.mkdir(parents=True)
-            self._render_1(public_path, name, context, tpl_name="tagged.html")
+        return self._render_1("index.html", context)
+
+    def render_tagged(self, tagging: Tagging, tags: frozenset[str]) -> str:
+        tag_infos, narrowings, widenings = self._tagged_infos(tagging, tags)
+        context = {
+            "tags": tag_infos,
+            "narrowings": narrowings,
+            "widenings": widenings,
+            "reverse_chronological": [
+                p.reference() for p in reversed(tagging.pages_for_tags(tags))
+            ],
+            "dotdotslash": "../",
+        }
+        return self._render_1(tagging.tags_file(tags), context, tpl_name="tagged.html")
+
+    def _tagged_infos(
+        self, tagging: Tagging, tags: frozenset[str]
+    ) -> tuple[list[TagInfo], list[TagInfo], list[TagInfo]]:
+        """Tag infos for the tags, narrowings, and widenings on a tag page."""
+        tag_infos = sorted(
+            (tagging.tag_info(tag) for tag in tags),
+            key=lambda t: (-t.count, t.label),
+        )
+        return tag_infos, tagging.narrowing_tags(tags), tagging.widening_tags(tags)
 
     def _render_1(
         self,
-        public_path: Path,
         name: str,
         context: dict[str, Any],
         tpl_name: str = None,
-    ):
+    ) -> str:
         more_context = {}
         # Add has_foo for all lists to facilitate existence checks.
         for k, v in context.items():
@@ -137,96 +462,70 @@ class Gen:
                     except TypeError as e:
                         print(e)
 
-        out_file = public_path / name
-        html = render(
-            self.templates[tpl_name or name],
+        return render(
+            self.compiled[tpl_name or name],
             context | more_context,
-            partials_dict=self.templates,
+            partials_dict=self.compiled,
         )
-        out_file.write_text(html, encoding="UTF-8")
-
-    def _atom_feed(self, loader: Loader, page: int) -> Doc:
-        doc = Doc("atom:feed")
-        posts = loader.posts()
-        page_count = (len(posts) + self.page_size - 1) // self.page_size
-        if page > 1:
-            offset = (page - 1) * self.page_size
-            posts = posts[-offset - self.page_size : -offset]
-        else:
-            posts = posts[-self.page_size :]
-        posts.reverse()
-
-        # Feed metadata comes first
-        doc.element("atom:id", {}, loader.id)
-        doc.element("atom:title", {}, loader.title)
-        if url := loader.url:
-            self_href = urljoin(url, self.feed_href(page))
-            doc.attrs["xml:base"] = self_href
-            doc.element(
-                "atom:link",
-                {"rel": "self", "href": self_href},
-            )
-            if page == 1:
-                doc.element("atom:link", {"rel": "alternate", "href": url})
-
-        if page > 1:
-            doc.element(
-                "atom:link",
-                {"rel": "first", "href": self.feed_href(1)},
-            )
-            doc.element(
-                "atom:link",
-                {"rel": "previous", "href": self.feed_href(page - 1)},
-            )
-        if page < page_count:
-            doc.element(
-                "atom:link",
-                {"rel": "next", "href": self.feed_href(page + 1)},
-            )
-            doc.element(
-                "atom:link",
-                {"rel": "last", "href": self.feed_href(page_count)},
-            )
 
-        updated = max(
-            (p.meta.get("updated", p.meta["published"]) for p in posts),
-            default=datetime(2024, 5, 5),
-        )
-        doc.element("atom:updated", {}, atom_date(updated))
-        doc.element(
-            "atom:generator",
-            {"uri": "https://github.com/pdc/mismiy", "version": version("mismiy")},
-            "Mismiy",
+    def atom_feed(self, loader: Loader) -> AtomFeed:
+        """The builder for the pages of the feed of the posts."""
+        return AtomFeed(
+            loader.posts(),
+            loader.id,
+            loader.title,
+            loader.url,
+            self.page_size,
+            archived=self.archived_feeds,
+            entry_cache=self.feed_entries,
+            compact=self.compact_feeds,
         )
 
-        # Entries go at end.
-        for post in posts:
-            doc.append(self._atom_entry(loader, post))
-        return doc
+    def _atom_feed(self, loader: Loader, page: int) -> Doc:
+        return self.atom_feed(loader).doc(page)
 
     def _atom_entry(self, loader: Loader, post: Page) -> Elt:
-        result = Elt("atom:entry")
-        result.element("atom:id", post.make_id(loader.id))
-        result.element("atom:title", post.meta["title"])
-        result.element("atom:published", atom_date(post.meta["published"]))
-        updated = post.meta.get("updated") or post.meta["published"]
-        result.element("atom:updated", atom_date(updated))
-        if person := post.meta.get("author"):
-            result.append(person.atom_person("atom:author"))
-        result.element(
-            "atom:link", {"rel": "alternate", "type": "text/html", "href": post.href}
-        )
-        result.element("atom:content", {"type": "html"}, post.body_html())
-        return result
+        return self.atom_feed(loader).entry(post)
 
     def feed_href(self, page):
-        return f"feed-{page}.atom" if page > 1 else "feed.atom"
+        return feed_href(page)
 
     def fname(self, file: Path) -> str:
         return str(file.relative_to(self.tpl_dir))
 
 
-def atom_date(d: datetime) -> str:
-    # Atom does not allow timestamps without time zones.
-    assert not datetime_naïve(d)
-    return d.isoformat()
+def redirect_html(href: str) -> str:
+    """A page that sends browsers on to this href."""
+    href = escape(href)
+    return (
+        "<!DOCTYPE html>\n"
+        '<meta charset="UTF-8">\n'
+        f'<link rel="canonical" href="{href}">\n'
+        f'<meta http-equiv="refresh" content="0; url={href}">\n'
+        f'<a href="{href}">{href}</a>\n'
+    )
+
+
+# Set in worker processes by `_init_worker`: the Gen and the Site.
+_worker_state = None
+
+
+def _init_worker(
+    state: tuple, locale_name: str, engine_name: str, html_cache_path: Path | None
+):
+    global _worker_state
+    _worker_state = state
+    # Month names and so on must come out the same as in the main process.
+    locale.setlocale(locale.LC_ALL, locale_name)
+    if markdown.html_cache.engine.name != engine_name:
+        markdown.html_cache.use_engine(markdown.ENGINES[engine_name]())
+    if html_cache_path and not markdown.html_cache.entries:
+        markdown.html_cache.load(html_cache_path)
+    markdown.html_cache.converted = {}
+
+
+def _render_in_worker(job: tuple) -> tuple[str, dict]:
+    gen, site = _worker_state
+    text = gen.render_job(job, site)
+    converted, markdown.html_cache.converted = markdown.html_cache.converted, {}
+    return text, converted
@@ -1,17 +1,26 @@
 import locale
+import os
 import re
-from collections.abc import Mapping
+import stat
+import sys
+from bisect import bisect_left
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import date, datetime, timezone, tzinfo
+from hashlib import sha256
+from os import stat_result
 from pathlib import Path
 from typing import Any, Self
 from uuid import UUID, uuid5
 from zoneinfo import ZoneInfo
 
-import mistletoe
+from dateutil.parser import parse as parse_datetime
 from strictyaml import Datetime, Email, Enum, Map, Optional, Str, UniqueSeq, Url
 from strictyaml import load as yaml_load
 
+from . import __version__, markdown
+from .cache import load_pickle, save_pickle
 from .tagging import Tagging
 from .xml import Elt
 
@@ -49,8 +58,16 @@ meta_schema = Map(
 # In the above, the `id` fields are `Str` rather than `Url` because
 # the URL validator does not like URLs that start with `tag:` and `urn:`.
 
+# For `quick_meta`: the subset of the post schema it handles, and the
+# lines and values it recognizes.
+quick_scalar_keys = {"title", "author", "id"}
+quick_datetime_keys = {"published", "updated"}
+quick_line_re = re.compile(r"([a-z]+):(?: +(.*))?")
+quick_item_re = re.compile(r"( *)- +(.*)")
+quick_plain_re = re.compile(r"[^-?:,\[\]{}#&*!|>'\"%@`\s][^\t]*")
 
-@dataclass
+
+@dataclass(slots=True)
 class Person:
     name: str
     uri: str | None = None
@@ -72,7 +89,7 @@ class Person:
         return cls(**obj)
 
 
-@dataclass
+@dataclass(slots=True)
 class Page:
     """One page on the site."""
 
@@ -116,7 +133,13 @@ class Page:
 
     def body_html(self):
         """The body of the entry, formatted as HTML fragment."""
-        return mistletoe.markdown(self.body)
+        return markdown.html_cache.html(self.body)
+
+    def drop_body(self):
+        """Release the memory used by the body, if it can be reloaded later.
+
+        Only lazily loaded pages can do this.
+        """
 
     def make_id(self, feed_id: str):
         """Given id of feed, create a unique id for this post."""
@@ -143,31 +166,307 @@ class Page:
             tz: the tzinfo value to use for published dates lacking
                 a time zone
         """
-        parts = blank_line.split(text, 1)
-        if len(parts) != 2:
-            raise ValueError("Expected meta and body separated by blank line.")
-        meta = yaml_load(parts[0], post_schema).data
-        if not meta.get("published") and (m := date_re.search(name)):
-            meta["published"] = datetime(int(m[1]), int(m[2]), int(m[3]))
-        for k, v in meta.items():
-            if isinstance(v, datetime) and datetime_naïve(v):
-                meta[k] = v.replace(tzinfo=tz)
-        if obj := meta.get("author"):
-            meta["author"] = Person.new(obj)
-        return cls(name, meta, parts[1])
+        meta, body = parse_text(text)
+        return cls.from_parts(name, meta, body, tz)
 
     @classmethod
-    def from_file(cls, name: str, file: Path, tz: tzinfo) -> "Page":
+    def from_parts(
+        cls, name: str, meta: dict[str, Any], body: str, tz: tzinfo
+    ) -> "Page":
+        """Create a post from metadata already validated against `post_schema`.
+
+        The meta dict is updated in place, so pass a copy if it is to be reused.
+        """
+        return cls(name, finish_meta(name, meta, tz), body)
+
+    @classmethod
+    def from_file(
+        cls, name: str, file: Path, tz: tzinfo, cache: "ParseCache" = None
+    ) -> "Page":
+        if cache:
+            meta, body = cache.parse(file)
+            return cls.from_parts(name, meta, body, tz)
         return cls.from_text(name, file.read_text(encoding="UTF-8"), tz)
 
 
+class LazyPage(Page):
+    """A page whose body is read from its file only when it is needed.
+
+    This means the metadata for all the pages can be loaded without
+    having to keep all their bodies in memory as well.
+    """
+
+    __slots__ = ("file", "offset", "_body")
+
+    def __init__(self, name: str, meta: Mapping[str, Any], file: Path, offset: int):
+        self.name = name
+        self.meta = meta
+        self.file = file
+        self.offset = offset  # Where the body starts in the text of the file.
+        self._body = None
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._body = self.file.read_text(encoding="UTF-8")[self.offset :]
+        return self._body
+
+    def drop_body(self):
+        self._body = None
+
+    # The state pickled by `Page` includes the body, which cannot be set here.
+    def __getstate__(self):
+        return self.name, self.meta, self.file, self.offset, self._body
+
+    def __setstate__(self, state):
+        self.name, self.meta, self.file, self.offset, self._body = state
+
+
+def finish_meta(name: str, meta: dict[str, Any], tz: tzinfo) -> dict[str, Any]:
+    """Fill in the gaps in metadata validated against `post_schema`.
+
+    Arguments:
+        name: names the post; used to guess published date
+        meta: the metadata, which is updated in place
+        tz: the tzinfo value to use for dates lacking a time zone
+    """
+    if not meta.get("published") and (m := date_re.search(name)):
+        meta["published"] = datetime(int(m[1]), int(m[2]), int(m[3]))
+    for k, v in meta.items():
+        if isinstance(v, datetime) and datetime_naïve(v):
+            meta[k] = v.replace(tzinfo=tz)
+    if obj := meta.get("author"):
+        meta["author"] = Person.new(obj)
+    if terms := meta.get("tags"):
+        # The same few tags are repeated across many pages.
+        meta["tags"] = [sys.intern(term) for term in terms]
+    return meta
+
+
+def parse_text(text: str) -> tuple[dict[str, Any], str]:
+    """Split document in to metadata (validated against `post_schema`) and body."""
+    parts = blank_line.split(text, 1)
+    if len(parts) != 2:
+        raise ValueError("Expected meta and body separated by blank line.")
+    return parse_meta(parts[0]), parts[1]
+
+
+def parse_meta(head: str) -> dict[str, Any]:
+    """Parse and validate metadata against `post_schema`."""
+    if (result := quick_meta(head)) is not None:
+        return result
+    return yaml_load(head, post_schema).data
+
+
+def quick_meta(head: str) -> dict[str, Any] | None:
+    """Parse metadata that uses only the simplest subset of YAML.
+
+    This is much faster than the full StrictYAML parser, and gives
+    the same result for metadata consisting of `key: value` lines
+    and a block list of tags. If the metadata uses anything
+    else (quotes, comments, nested author, and so on) or
+    would fail validation, returns None.
+    """
+    result = {}
+    tags = indent = None
+    for line in head.splitlines():
+        if tags is not None and (m := quick_item_re.fullmatch(line)):
+            # All items must be indented the same.
+            indent = m[1] if indent is None else indent
+            item = m[2].rstrip(" ")
+            if m[1] != indent or item in tags or not is_quick_plain(item):
+                return None
+            tags.append(item)
+            continue
+        if not (m := quick_line_re.fullmatch(line)) or m[1] in result:
+            return None
+        key, value = m[1], (m[2] or "").rstrip(" ")
+        tags = indent = None
+        if key == "tags" and not value:
+            tags = result[key] = []
+        elif not is_quick_plain(value):
+            return None
+        elif key in quick_scalar_keys:
+            result[key] = value
+        elif key in quick_datetime_keys:
+            try:
+                result[key] = parse_datetime(value)
+            except (ValueError, OverflowError):
+                return None
+        else:
+            return None
+    if "title" not in result or result.get("tags") == []:
+        return None
+    return result
+
+
+def is_quick_plain(value: str) -> bool:
+    """Whether this is a YAML plain scalar that `quick_meta` can interpret."""
+    return bool(
+        quick_plain_re.fullmatch(value)
+        and ": " not in value
+        and " #" not in value
+        and not value.endswith(":")
+    )
+
+
+def read_page_file(file: Path) -> tuple[str, dict[str, Any], str, int]:
+    """Read and parse a page file.
+
+    Returns the digest of its content, the metadata, the body,
+    and the offset of the body within the text of the file.
+
+    This and `read_page_header` are module-level functions
+    so they can be run in a worker process.
+    """
+    content = file.read_bytes()
+    # Translate newlines the same way as `Path.read_text`.
+    text = content.decode("UTF-8").replace("\r\n", "\n").replace("\r", "\n")
+    meta, body = parse_text(text)
+    return sha256(content).hexdigest(), meta, body, len(text) - len(body)
+
+
+def read_page_header(file: Path) -> tuple[None, dict[str, Any], None, int]:
+    """Read and parse just the metadata from the start of the page file.
+
+    Returns the same as `read_page_file` except without the digest or body.
+    """
+    head = ""
+    with file.open(encoding="UTF-8") as f:
+        for line in f:
+            head += line
+            # The separator is complete once something other than whitespace follows it.
+            if (m := blank_line.search(head)) and m.end() < len(head):
+                break
+        else:
+            if not (m := blank_line.search(head)):
+                raise ValueError("Expected meta and body separated by blank line.")
+    return None, parse_meta(head[: m.start()]), None, m.end()
+
+
+def read_many(read: Callable[[Path], tuple], files: list[Path]) -> list[tuple]:
+    """Read several page files with `read`, as one task for a worker process."""
+    return [read(file) for file in files]
+
+
+def batch_size(count: int, jobs: int, most: int = 64) -> int:
+    """How many of `count` files to send to a worker process at a time.
+
+    There are a few batches per worker, so the work is shared out evenly
+    even if some files take longer than others, but no more than `most`
+    files in each, so that the results are not too large to send back.
+    """
+    return max(1, min(most, -(-count // (4 * jobs))))
+
+
+class ParseCache:
+    """Remembers the metadata and body of Markdown files between runs.
+
+    Entries are keyed by file path. If the modification time and size
+    of the file are unchanged then it is not read at all; otherwise
+    it is read and hashed, and only parsed if the content has changed.
+
+    Pages loaded lazily have their metadata cached but not their
+    bodies, and are not hashed (since that means reading the whole file).
+
+    The whole cache is discarded if the version of Mismiy or the
+    schema for post metadata changes.
+    """
+
+    layout = 2  # Increment when the format of entries changes.
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.fingerprint = f"{__version__} {self.layout} {post_schema!r}"
+        self._entries = None
+        self._dirty = False
+
+    @property
+    def entries(self) -> dict[str, tuple]:
+        if self._entries is None:
+            self._entries = load_pickle(self.path, self.fingerprint) or {}
+        return self._entries
+
+    def lookup(
+        self, file: Path, st: stat_result | None = None, lazy=False
+    ) -> tuple[str | None, dict[str, Any], str | None, int] | None:
+        """Return the same as `read_page_file` if this file is unchanged.
+
+        If `lazy` is true, then the body is not needed, and may be None.
+        Do not modify the metadata: it belongs to the cache.
+        """
+        if not (entry := self.entries.get(str(file.absolute()))):
+            return None
+        st = st or file.stat()
+        stamp, *found = entry
+        digest, _, body, _ = found
+        if not lazy and body is None:
+            return None
+        if stamp == (st.st_mtime_ns, st.st_size):
+            return found
+        # Touched but maybe not changed.
+        if not lazy and digest and sha256(file.read_bytes()).hexdigest() == digest:
+            return found
+
+    def store(
+        self,
+        file: Path,
+        st: stat_result,
+        digest: str | None,
+        meta: dict[str, Any],
+        body: str | None,
+        offset: int,
+    ):
+        """Remember the results of `read_page_file` or `read_page_header`."""
+        key = str(file.absolute())
+        entry = (st.st_mtime_ns, st.st_size), digest, meta, body, offset
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self._dirty = True
+
+    def forget(self, file: Path):
+        """Drop the entry for this file, which has been deleted."""
+        if self.entries.pop(str(file.absolute()), None):
+            self._dirty = True
+
+    def prune(self, directory: Path, keep: Iterable[Path]):
+        """Drop entries for files in this directory other than those in `keep`."""
+        prefix = os.path.join(directory.absolute(), "")
+        keep = {str(file.absolute()) for file in keep}
+        for key in [k for k in self.entries if k.startswith(prefix) and k not in keep]:
+            del self.entries[key]
+            self._dirty = True
+
+    def parse(self, file: Path) -> tuple[dict[str, Any], str]:
+        """Return metadata and body of this file, parsing it only if needed.
+
+        The metadata is a fresh dict each time, so the caller may modify it.
+        """
+        st = file.stat()
+        if not (found := self.lookup(file, st)):
+            found = read_page_file(file)
+        self.store(file, st, *found)
+        _, meta, body, _ = found
+        return dict(meta), body
+
+    def save(self):
+        """Write the cache back to disc if it has changed."""
+        if self._dirty:
+            save_pickle(self.path, self.fingerprint, self.entries)
+            self._dirty = False
+
+
+def month_name(month: int) -> str:
+    """The name of this month (1 to 12) in the current locale."""
+    return locale.nl_langinfo(getattr(locale, f"MON_{month}"))
+
+
 def expand_date(d: datetime | date) -> Mapping[str, str]:
-    month_name = locale.nl_langinfo(getattr(locale, f"MON_{d.month}"))
     return {
         "year": str(d.year),
         "month": str(d.month),
         "month_2digits": "%02d" % d.month,
-        "month_name": month_name,
+        "month_name": month_name(d.month),
         "day": str(d.day),
         "day_2digits": "%02d" % d.day,
         "iso_date": d.date().isoformat(),
@@ -175,18 +474,59 @@ def expand_date(d: datetime | date) -> Mapping[str, str]:
     }
 
 
+def scan_pages(
+    root: Path, suffixes: Collection[str], exclude: Collection[str] = ()
+) -> Iterator[tuple[str, Path, stat_result]]:
+    """Find page files in this directory and its subdirectories in a single pass.
+
+    Yields the name of the page (the path relative to the root,
+    with slashes and without the suffix), the path of the file,
+    and its stat result.
+
+    Directories whose names start with a dot or are in `exclude`
+    are skipped. Unreadable directories are skipped silently,
+    as they are by `Path.rglob`.
+    """
+    stack = [(root, "")]
+    while stack:
+        dir_path, prefix = stack.pop()
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith(".") and entry.name not in exclude:
+                    stack.append((Path(entry.path), f"{prefix}{entry.name}/"))
+            else:
+                stem, suffix = os.path.splitext(entry.name)
+                if suffix in suffixes and entry.is_file():
+                    yield prefix + stem, Path(entry.path), entry.stat()
+
+
 class Source:
     """Loads pages from a directory full of Markdown files."""
 
     meta_file_name = "META.yaml"
 
     def __init__(
-        self, pages_dir: Path | str, include_drafts=False, now: datetime | None = None
+        self,
+        pages_dir: Path | str,
+        include_drafts=False,
+        now: datetime | None = None,
+        cache: ParseCache | None = None,
+        lazy=False,
+        suffixes: Collection[str] = (".markdown", ".md"),
+        exclude: Collection[str] = (),
     ):
         self._meta = None
         self._pages = None
         self.pages_dir = Path(pages_dir)
         self.include_drafts = include_drafts
+        self.cache = cache
+        self.lazy = lazy
+        self.suffixes = frozenset(suffixes)
+        self.exclude = frozenset(exclude)
         self.now = now.astimezone(self.tz) if now else datetime.now(self.tz)
 
     @property
@@ -241,30 +581,160 @@ class Source:
         """Discard any cached posts, so next call to pages() loads them afresh."""
         self._pages = None
 
+    def __getstate__(self):
+        # Worker processes only need the loaded pages, not the parse cache.
+        return self.__dict__ | {"cache": None}
+
+    @property
+    def loaded(self) -> bool:
+        return self._pages is not None
+
+    def page_files(self) -> list[tuple[str, Path, stat_result]]:
+        """Names, paths, and stat results of the Markdown files in the pages directory."""
+        return list(scan_pages(self.pages_dir, self.suffixes, self.exclude))
+
     def pages(self):
-        kind = self.kind
         if self._pages is None:
-            self._pages = []
-            for suffix in ".markdown", ".md":
-                for page_path in self.pages_dir.rglob(f"*{suffix}"):
-                    name = str(page_path.relative_to(self.pages_dir))
-                    name = name.removesuffix(suffix)
-                    page = Page.from_file(name, page_path, tz=self.tz)
-
-                    published = page.meta.get("published")
-                    is_draft = (
-                        published > self.now if published else self.kind == "post"
-                    )
-                    if is_draft:
-                        if self.include_drafts:
-                            page.meta["is_draft"] = True
-                        else:
-                            continue
-                    page.meta["kind"] = kind
-                    self._pages.append(page)
-            self._pages.sort(key=lambda page: page.name)
+            self.finish_loading(self.start_loading())
         return self._pages
 
+    def start_loading(
+        self, executor: Executor | None = None, jobs: int = 1
+    ) -> list[tuple]:
+        """Find page files and start parsing the ones not already in the cache.
+
+        If an executor is supplied then files are parsed by it, possibly in
+        other processes, in batches sized to keep its `jobs` workers busy.
+        Call `finish_loading` with the result to collect them.
+
+        If the source is lazy, then only the metadata is read at this stage.
+        """
+        read = read_page_header if self.lazy else read_page_file
+        started = []
+        missing = []
+        for name, page_path, st in self.page_files():
+            if not (
+                loaded := self.cache and self.cache.lookup(page_path, st, self.lazy)
+            ):
+                if executor:
+                    missing.append(len(started))
+                else:
+                    loaded = read(page_path)
+            started.append((name, page_path, st, loaded))
+
+        # Files are sent to the executor in batches, since parsing one small
+        # file takes less time than sending it to another process and back.
+        size = batch_size(len(missing), jobs)
+        for start in range(0, len(missing), size):
+            batch = missing[start : start + size]
+            future = executor.submit(read_many, read, [started[i][1] for i in batch])
+            for j, i in enumerate(batch):
+                name, page_path, st, _ = started[i]
+                started[i] = name, page_path, st, (future, j)
+        return started
+
+    def finish_loading(self, started: list[tuple]):
+        """Create pages from the results of `start_loading`."""
+        self._all_pages = []
+        for name, page_path, st, loaded in started:
+            if isinstance(loaded[0], Future):
+                future, j = loaded
+                loaded = future.result()[j]
+            self._all_pages.append(self._make_page(name, page_path, st, loaded))
+        self._all_pages.sort(key=page_name)
+        self._pages = []
+        self._filter_drafts()
+        if self.cache:
+            self.cache.prune(self.pages_dir, (s[1] for s in started))
+            self.cache.save()
+
+    def _make_page(self, name: str, page_path: Path, st: stat_result, loaded: tuple):
+        if self.cache:
+            self.cache.store(page_path, st, *loaded)
+        _, meta, body, offset = loaded
+        meta = finish_meta(name, dict(meta), self.tz)
+        meta["kind"] = self.kind
+        if self.lazy:
+            return LazyPage(name, meta, page_path, offset)
+        return Page(name, meta, body)
+
+    def _filter_drafts(self):
+        """Update `_pages` in place to be the pages that are not excluded as drafts.
+
+        Drafts are kept in `_all_pages` so that they can be reconsidered
+        without reading their files again.
+        """
+        pages = []
+        for page in self._all_pages:
+            published = page.meta.get("published")
+            if published > self.now if published else self.kind == "post":
+                if not self.include_drafts:
+                    continue
+                page.meta["is_draft"] = True
+            else:
+                page.meta.pop("is_draft", None)
+            pages.append(page)
+        self._pages[:] = pages
+
+    def invalidate(self, path: Path | str) -> bool:
+        """Reload the page for this file, which was created, modified, or deleted.
+
+        Other pages are not reloaded. Changes to the metadata file,
+        or to whole directories, cause all pages to be reloaded
+        the next time they are needed. The parse cache is updated
+        but not saved, since several files usually change together.
+
+        Returns whether the path is in this source’s directory.
+        """
+        pages_dir = self.pages_dir.absolute()
+        path = Path(path).absolute()
+        if not path.is_relative_to(pages_dir):
+            return False
+        if self._pages is None:
+            return True
+        if path == pages_dir / self.meta_file_name:
+            self._meta = None
+            self.flush()
+            return True
+        relative = path.relative_to(pages_dir)
+        if any(
+            part.startswith(".") or part in self.exclude for part in relative.parts[:-1]
+        ):
+            return True
+        if path.suffix not in self.suffixes:
+            prefix = f"{relative.as_posix()}/"
+            if path.is_dir() or any(p.name.startswith(prefix) for p in self._all_pages):
+                # A directory was added, moved, or deleted.
+                self.flush()
+            return True
+
+        name = relative.with_suffix("").as_posix()
+        i = bisect_left(self._all_pages, name, key=page_name)
+        found = i < len(self._all_pages) and self._all_pages[i].name == name
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            st = None
+        if st and stat.S_ISREG(st.st_mode):
+            if not (loaded := self.cache and self.cache.lookup(path, st, self.lazy)):
+                loaded = (read_page_header if self.lazy else read_page_file)(path)
+            page = self._make_page(name, path, st, loaded)
+            if found:
+                self._all_pages[i] = page
+            else:
+                self._all_pages.insert(i, page)
+        else:
+            if self.cache:
+                self.cache.forget(path)
+            if found:
+                del self._all_pages[i]
+        self._filter_drafts()
+        return True
+
+
+def page_name(page: Page) -> str:
+    return page.name
+
 
 class Loader:
     """Loads pages from one or more directories full of Makrdown files."""
@@ -274,10 +744,18 @@ class Loader:
         pages_dirs: list[Path | str],
         include_drafts=False,
         now: datetime | None = None,
+        cache: ParseCache | None = None,
+        jobs: int = 1,
+        lazy=False,
+        suffixes: Collection[str] = (".markdown", ".md"),
+        exclude: Collection[str] = (),
     ):
         self.sources = [
-            Source(pages_dir, include_drafts, now) for pages_dir in pages_dirs
+            Source(pages_dir, include_drafts, now, cache, lazy, suffixes, exclude)
+            for pages_dir in pages_dirs
         ]
+        self.cache = cache
+        self.jobs = jobs
 
     @property
     def id(self):
@@ -312,11 +790,39 @@ class Loader:
         for source in self.sources:
             source.flush()
 
+    def invalidate(self, paths: Iterable[Path | str]):
+        """Reload just the pages for these files, which have been changed."""
+        for path in paths:
+            for source in self.sources:
+                if source.invalidate(path):
+                    break
+        if self.cache:
+            self.cache.save()
+
+    def load(self):
+        """Load any sources not yet loaded.
+
+        If `jobs` is more than 1, then files from all the sources are
+        parsed in parallel by a pool of that many worker processes.
+        Otherwise sources are loaded lazily when their pages are needed.
+        """
+        pending = [source for source in self.sources if not source.loaded]
+        if self.jobs > 1 and pending:
+            with ProcessPoolExecutor(self.jobs) as executor:
+                started = [
+                    (source, source.start_loading(executor, self.jobs))
+                    for source in pending
+                ]
+                for source, loading in started:
+                    source.finish_loading(loading)
+
     def pages(self) -> list[Page]:
+        self.load()
         return [p for source in self.sources for p in source.pages()]
 
     def posts(self):
         """Pages that have ‘post’ nature."""
+        self.load()
         posts = [
             p
             for source in self.sources
@@ -0,0 +1,177 @@
+"""Converting Markdown to HTML."""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from hashlib import sha256
+from importlib.metadata import version
+from pathlib import Path
+
+import mistletoe
+from mistletoe import block_token, span_token
+from mistletoe.block_token import Document
+from mistletoe.html_renderer import HtmlRenderer
+
+from . import __version__
+from .cache import load_pickle, save_pickle
+
+try:
+    from cmarkgfm import cmark
+except ImportError:
+    cmark = None
+
+
+class MistletoeEngine:
+    """Converts Markdown to HTML with mistletoe.
+
+    Unlike `mistletoe.markdown`, which creates a renderer for every
+    document, each thread keeps one renderer and reuses it.
+    """
+
+    name = "mistletoe"
+
+    def __init__(self):
+        self.fingerprint = f"mistletoe {mistletoe.__version__}"
+        self._local = threading.local()
+
+    def html(self, body: str) -> str:
+        return self.html_many([body])[0]
+
+    def html_many(self, bodies: Iterable[str]) -> list[str]:
+        renderer = self._renderer()
+        result = []
+        for body in bodies:
+            # Link reference definitions belong to one document.
+            renderer.footnotes = {}
+            result.append(renderer.render(Document(body)))
+        return result
+
+    def _renderer(self) -> HtmlRenderer:
+        if not (renderer := getattr(self._local, "renderer", None)):
+            renderer = self._local.renderer = HtmlRenderer()
+        # The renderer adds its extra token types (for inline HTML) when
+        # created, but another renderer may have reset them since.
+        for token in renderer._extras:
+            module = (
+                span_token if issubclass(token, span_token.SpanToken) else block_token
+            )
+            if token not in module._token_types:
+                module.add_token(token)
+        return renderer
+
+
+class CmarkEngine:
+    """Converts Markdown to HTML with cmark-gfm, GitHub’s C implementation of CommonMark.
+
+    This is much faster than mistletoe, but needs the optional package `cmarkgfm`.
+    The HTML is the same except that cmark escapes double quotes in text.
+    """
+
+    name = "cmark"
+    extensions = ["table", "strikethrough"]
+
+    def __init__(self):
+        if cmark is None:
+            raise RuntimeError(
+                "The cmark engine needs the cmarkgfm package, "
+                "installed with the extra `mismiy[cmark]`."
+            )
+        self.fingerprint = f"cmarkgfm {version('cmarkgfm')}"
+
+    def html(self, body: str) -> str:
+        return cmark.markdown_to_html_with_extensions(
+            body, cmark.Options.CMARK_OPT_UNSAFE, self.extensions
+        )
+
+    def html_many(self, bodies: Iterable[str]) -> list[str]:
+        return [self.html(body) for body in bodies]
+
+
+ENGINES = {engine.name: engine for engine in [MistletoeEngine, CmarkEngine]}
+
+
+class HtmlCache:
+    """Remembers the HTML converted from Markdown, keyed by a hash of the Markdown.
+
+    This means each distinct body is converted at most once, even though
+    a post appears on its own page and in one or more feed pages.
+    If it has a path then the cache can be saved and reloaded so that
+    unchanged bodies need not be converted in the next run either.
+
+    At most `maxsize` entries are kept: when another is added the
+    least recently used entry is discarded.
+    """
+
+    def __init__(
+        self,
+        path: Path | str | None = None,
+        maxsize: int = 100_000,
+        engine: MistletoeEngine | CmarkEngine | None = None,
+    ):
+        self.path = Path(path) if path else None
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self._dirty = False
+        # If this is a dict then newly converted entries are added to it too,
+        # so that worker processes can send them back to the main process.
+        self.converted = None
+        self.use_engine(engine or MistletoeEngine())
+
+    def use_engine(self, engine: MistletoeEngine | CmarkEngine):
+        """Switch to a different Markdown engine, discarding cached HTML."""
+        self.engine = engine
+        self.fingerprint = f"{__version__} {engine.fingerprint}"
+        self.entries.clear()
+
+    def html(self, body: str) -> str:
+        """The body converted to HTML."""
+        return self.html_many([body])[0]
+
+    def html_many(self, bodies: Iterable[str]) -> list[str]:
+        """Convert these bodies to HTML, passing those not in the cache to the engine in one go."""
+        bodies = list(bodies)
+        keys = [sha256(body.encode("UTF-8")).digest() for body in bodies]
+        found = {}
+        missing = {}
+        for key, body in zip(keys, bodies):
+            if (html := self.entries.get(key)) is not None:
+                self.entries.move_to_end(key)
+                found[key] = html
+            else:
+                missing[key] = body
+        if missing:
+            converted = dict(zip(missing, self.engine.html_many(missing.values())))
+            found.update(converted)
+            self.update(converted)
+            if self.converted is not None:
+                self.converted.update(converted)
+        return [found[key] for key in keys]
+
+    def update(self, entries: Mapping[bytes, str]):
+        """Add entries converted elsewhere (say, by `html_many` in another process)."""
+        if entries:
+            self.entries.update(entries)
+            self._dirty = True
+            self._trim()
+
+    def _trim(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def load(self, path: Path | str):
+        """Use this file to save the cache, and load entries from it if it exists."""
+        self.path = Path(path)
+        if entries := load_pickle(self.path, self.fingerprint):
+            entries.update(self.entries)
+            self.entries = entries
+            self._trim()
+
+    def save(self):
+        """Write the cache back to disc if it has a path and has changed."""
+        if self.path and self._dirty:
+            save_pickle(self.path, self.fingerprint, self.entries)
+            self._dirty = False
+
+
+# The cache used by `Page.body_html`.
+html_cache = HtmlCache()
@@ -1,14 +1,25 @@
 import itertools
 import re
-from collections.abc import Generator, Iterable, Set
-from dataclasses import dataclass
+import sys
+from array import array
+from bisect import bisect_right, insort
+from collections.abc import Generator, Iterable, Iterator, Mapping, Set
+from dataclasses import dataclass, field
+from functools import partial
 
+try:
+    import numpy
+    from numpy import bitwise_count  # noqa: F401 (new in NumPy 2.0)
+except ImportError:
+    numpy = None
 
-@dataclass
+
+@dataclass(slots=True)
 class TagInfo:
     label: str
     href: str
     count: int
+    first: bool = field(default=False, compare=False, repr=False)
 
 
 unword_re = re.compile(r"\W+")
@@ -16,42 +27,299 @@ unword_re = re.compile(r"\W+")
 
 def tagify(term: str) -> str:
     """Convert a term to the form used in URLs and searches."""
-    return unword_re.sub("", term).lower()
+    return sys.intern(unword_re.sub("", term).lower())
 
 
 class Tagging:
+    """Index of pages by their tags and combinations of tags.
+
+    Each page is indexed under every combination of its tags, so that
+    each combination can have a page listing the pages with all those tags.
+    A page with many tags has very many combinations, so if
+    `max_combination_size` is supplied, only combinations of up to that
+    many tags are indexed. Only combinations with at least `min_pages`
+    pages get pages of their own, and combinations of more than one tag
+    are indexed only once they have that many: since a combination has no
+    more pages than any of its parents, its pages are looked for only when
+    all of its parents have enough. Pages for other combinations
+    are found when asked for.
+
+    If `collapse_equivalent` is true, combinations with exactly the same
+    pages share one page, and links to any of them go to that page.
+
+    Pages can be removed and updated as well as added. If `page_order` maps
+    the names of pages to their positions, pages are kept in that order,
+    so the results are the same as indexing the pages afresh. Otherwise
+    they are in the order they were added.
+
+    The indexed combinations form a lattice: each combination is linked to
+    its children, the combinations with one more tag, in `narrower`.
+    Its parents are found by removing one tag at a time.
+
+    Tags for terms, and hrefs and labels of tags and combinations, are
+    remembered once worked out. Labels and counts can change when a page
+    is added, so those are worked out again afterwards.
+    """
+
+    name = "lists"
     pages_by_tags: dict[frozenset, list]
+    narrower: dict[frozenset, list[frozenset]]
 
-    def __init__(self, href_format="tagged/{tags}.html"):
+    def __init__(
+        self,
+        href_format="tagged/{tags}.html",
+        max_combination_size: int | None = None,
+        min_pages: int = 1,
+        collapse_equivalent: bool = False,
+        page_order: Mapping[str, int] | None = None,
+    ):
+        if max_combination_size is not None and max_combination_size < 1:
+            raise ValueError(
+                f"max_combination_size must be at least 1, not {max_combination_size}"
+            )
         self.pages_by_tags = {}
+        self.narrower = {}
         self.tag_labels = {}
         self.href_format = href_format
+        self.max_combination_size = max_combination_size
+        self.min_pages = min_pages
+        self.collapse_equivalent = collapse_equivalent
+        self.page_order = page_order
+        self._reordered = False
+        self._canonical = None
+        self._tags_by_term = {}
+        self._hrefs = {}
+        self._infos = {}
+        self._labels = {}
 
-    def add(self, page):
-        if terms := page.meta.get("tags"):
-            # Reduce the labels to all-lower-case to make matching case-insensitive.
-            tags = []
-            for term in terms:
-                tag = tagify(term)
-                self.tag_labels[tag] = term
-                tags.append(tag)
+    def add(self, page) -> set[frozenset[str]]:
+        """Index this page, and return the combinations of tags it was added to."""
+        tags = self._tags_for(page)
+        subsets = self._subsets(tags)
+        for subset in subsets:
+            if (pages := self.pages_by_tags.get(subset)) is not None:
+                self._insert(pages, page)
+            elif len(subset) == 1 or self.min_pages <= 1:
+                self.pages_by_tags[subset] = [page]
+                self._link(subset)
+            elif pages := self._enough_pages(subset):
+                self.pages_by_tags[subset] = pages
+                self._link(subset, ordered=True)
+        self._relabel(tags)
+        return set(subsets)
+
+    def remove(self, page) -> set[frozenset[str]]:
+        """Remove this page, and return the combinations of tags it was removed from.
+
+        The page must have been added, and its tags not changed since.
+        """
+        tags = self._tags_for(page)
+        subsets = self._subsets(tags)
+        # Supersets first, so that combinations are unlinked before their parents.
+        for subset in sorted(subsets, key=len, reverse=True):
+            if (pages := self.pages_by_tags.get(subset)) is None:
+                continue  # Too few pages to be indexed.
+            del pages[index_of(pages, page)]
+            if not pages or len(subset) > 1 and len(pages) < self.min_pages:
+                del self.pages_by_tags[subset]
+                self._unlink(subset)
+        self._reordered = self.page_order is not None
+        self._relabel(tags)
+        return set(subsets)
+
+    def update(self, old_page, new_page) -> set[frozenset[str]]:
+        """Replace a page with a new version of it.
+
+        Returns the combinations of tags of either version,
+        since their pages have changed.
+        """
+        return self.remove(old_page) | self.add(new_page)
+
+    def _subsets(self, tags: list[str]) -> list[frozenset[str]]:
+        """The combinations of these tags to index a page under, smallest first.
+
+        Terms that differ only in case give the same tag more than once,
+        but the page is indexed under each combination only once.
+        """
+        return list(dict.fromkeys(iter_subsets(tags, self.max_combination_size)))
+
+    def _enough_pages(self, tags: frozenset[str]) -> list | None:
+        """The pages with these tags, if there are at least `min_pages` of them.
+
+        They are found from the parent with fewest pages, but only if
+        every parent has enough, since otherwise this cannot.
+        """
+        fewest = None
+        for parent in self.parents(tags):
+            pages = self.pages_by_tags.get(parent)
+            if pages is None or len(pages) < self.min_pages:
+                return None
+            if fewest is None or len(pages) < len(fewest):
+                fewest, (tag,) = pages, tags - parent
+        pages = [page for page in fewest if tag in self._tags_for(page)]
+        return pages if len(pages) >= self.min_pages else None
+
+    def _insert(self, pages: list, page):
+        """Add a page to the list of pages for a combination, in order."""
+        if self.page_order is None:
+            pages.append(page)
+        elif pages and self._position(page) < self._position(pages[-1]):
+            insort(pages, page, key=self._position)
+            self._reordered = True
+        else:
+            pages.append(page)
+
+    def _position(self, page) -> int:
+        return self.page_order[page.name]
+
+    def _tags_for(self, page) -> list[str]:
+        """The tags of this page, tagified."""
+        return [self._tag_for_term(term) for term in page.meta.get("tags") or ()]
+
+    def _tag_for_term(self, term: str) -> str:
+        if (tag := self._tags_by_term.get(term)) is None:
+            tag = self._tags_by_term[term] = tagify(term)
+        return tag
+
+    def _relabel(self, tags: Iterable[str]):
+        """Update the labels of these tags after pages with them are added or removed.
+
+        The label of a tag is the term used for it by the last page with it.
+        Labels and counts may have changed, so they are worked out again.
+        """
+        for tag in tags:
+            if (page := self._last_page(tag)) is None:
+                self.tag_labels.pop(tag, None)
+                continue
+            for term in page.meta["tags"]:
+                if self._tag_for_term(term) == tag:
+                    self.tag_labels[tag] = term
+        self._infos.clear()
+        self._labels.clear()
+        self._canonical = None
+
+    def _last_page(self, tag: str):
+        """The last of the pages with this tag, or None if there are none."""
+        pages = self.pages_by_tags.get(frozenset((tag,)))
+        return pages[-1] if pages else None
+
+    def _link(self, tags: frozenset[str], ordered=False):
+        """Add a new combination to the lattice.
+
+        Subsets are indexed before supersets, so its parents are already there.
+        Usually it is new because the page just added is its first. If it
+        is `ordered`, it is put among its siblings where it would be
+        had it been linked when its first page was added.
+        """
+        self.narrower[tags] = []
+        if len(tags) > 1:
+            for parent in self.parents(tags):
+                siblings = self.narrower[parent]
+                if ordered:
+                    insort(siblings, tags, key=partial(self._sibling_order, parent))
+                else:
+                    siblings.append(tags)
+
+    def _sibling_order(self, parent: frozenset[str], tags: frozenset[str]) -> tuple:
+        """Where this child of `parent` was first among its siblings.
+
+        That is, the position of its first page in the pages of its parent,
+        and where its tags are in that page’s list of tags.
+        """
+        first = self.pages_by_tags[tags][0]
+        tag_list = self._tags_for(first)
+        return (
+            index_of(self.pages_by_tags[parent], first),
+            sorted(tag_list.index(tag) for tag in tags),
+        )
+
+    def _unlink(self, tags: frozenset[str]):
+        """Remove a combination that no longer has any pages from the lattice."""
+        del self.narrower[tags]
+        for parent in self.parents(tags):
+            if (siblings := self.narrower.get(parent)) is not None:
+                siblings.remove(tags)
+
+    def parents(self, tags: frozenset[str]) -> list[frozenset[str]]:
+        """The combinations with one tag fewer than this one."""
+        return [tags - {tag} for tag in tags] if len(tags) > 1 else []
+
+    def children(self, tags: frozenset[str]) -> list[frozenset[str]]:
+        """The indexed combinations with one tag more than this one."""
+        children = self.narrower.get(tags, [])
+        if self._reordered and len(children) > 1:
+            # In the order they would have been linked if indexed afresh.
+            children = sorted(children, key=self._creation_order)
+        return children
+
+    def _creation_order(self, tags: frozenset[str]) -> tuple:
+        """Where this combination would be among its siblings if indexed afresh.
+
+        That is, when the first page with these tags was added,
+        and where they are in that page’s list of tags.
+        """
+        first = self.pages_by_tags[tags][0]
+        tag_list = self._tags_for(first)
+        return self._position(first), sorted(tag_list.index(tag) for tag in tags)
+
+    def combinations(self) -> Iterator[tuple[frozenset[str], list]]:
+        """Yield the combinations of tags that get pages of their own, and their pages."""
+        for tags, pages in self.pages_by_tags.items():
+            if len(tags) == 1 or len(pages) >= self.min_pages:
+                yield tags, pages
+
+    def has_tag_page(self, tags: frozenset[str]) -> bool:
+        """Whether this combination of tags gets a page of its own."""
+        pages = self.pages_by_tags.get(tags)
+        return pages is not None and (len(tags) == 1 or len(pages) >= self.min_pages)
+
+    def pages_for_tags(self, tags: frozenset[str]) -> list | None:
+        """The pages with all of these tags, or None if there are none.
+
+        Assumes tags are already tagified.
+        """
+        if (pages := self.pages_by_tags.get(tags)) is not None:
+            return pages
+        if len(tags) < 2 or (
+            self.min_pages <= 1
+            and (
+                self.max_combination_size is None
+                or len(tags) <= self.max_combination_size
+            )
+        ):
+            # It would have been indexed if any page had these tags.
+            return None
 
-            # Now index page under all combinations of tags.
-            for subset in iter_subsets(tags):
-                self.pages_by_tags.setdefault(subset, []).append(page)
+        # Not indexed, so filter the pages of the least used tag.
+        lists = [self.pages_by_tags.get(frozenset((tag,))) for tag in tags]
+        if not all(lists):
+            return None
+        lists.sort(key=len)
+        others = [{id(page) for page in pages} for pages in lists[1:]]
+        pages = [p for p in lists[0] if all(id(p) in ids for ids in others)]
+        return pages or None
+
+    def count(self, tags: frozenset[str]) -> int:
+        """The number of pages with all of these tags."""
+        pages = self.pages_for_tags(tags)
+        return len(pages) if pages else 0
 
     def tag_info(self, term: str) -> TagInfo:
         """Info about one tag."""
-        tag = tagify(term)
-        return TagInfo(
-            self.tag_labels[tag],
-            self.tags_file((tag,)),
-            len(self.pages_by_tags[frozenset((tag,))]),
-        )
+        tag = self._tag_for_term(term)
+        if (info := self._infos.get(tag)) is None:
+            tags = frozenset((tag,))
+            info = self._infos[tag] = (
+                self.tag_labels[tag],
+                self.tags_href(tags),
+                self.count(tags),
+            )
+        # A new one each time, since templates mark the first in a list.
+        return TagInfo(*info)
 
     def pages_for_terms(self, terms: Iterable[str]) -> list:
         """Return the list of pages matching these terms."""
-        return self.pages_by_tags.get(frozenset(tagify(term) for term in terms))
+        return self.pages_for_tags(frozenset(self._tag_for_term(t) for t in terms))
 
     def page_tags(self, page) -> list[TagInfo] | None:
         """Create tag info suitable for use in templates."""
@@ -65,8 +333,50 @@ class Tagging:
 
         Assumes tags are already tagified.
         """
-        urlified = "+".join(sorted(tags))
-        return self.href_format.format(tags=urlified)
+        if not isinstance(tags, frozenset):
+            tags = frozenset(tags)
+        if (href := self._hrefs.get(tags)) is None:
+            urlified = "+".join(sorted(tags))
+            href = self._hrefs[tags] = self.href_format.format(tags=urlified)
+        return href
+
+    def canonical_tags(self, tags: frozenset[str]) -> frozenset[str]:
+        """The combination whose page stands for this one.
+
+        If `collapse_equivalent` is true, this is the combination with
+        the most tags (the first in sorted order if there is a tie) of those
+        that get pages and have exactly the same pages as this one.
+        Otherwise it is this combination.
+        """
+        if not self.collapse_equivalent:
+            return tags
+        if self._canonical is None:
+            groups = {}
+            for combination, pages in self.combinations():
+                key = tuple(id(page) for page in pages)
+                groups.setdefault(key, []).append(combination)
+            self._canonical = {}
+            for combinations in groups.values():
+                if len(combinations) > 1:
+                    canonical = min(combinations, key=lambda c: (-len(c), sorted(c)))
+                    for combination in combinations:
+                        self._canonical[combination] = canonical
+        return self._canonical.get(tags, tags)
+
+    def tags_href(self, tags: frozenset[str]) -> str:
+        """The href for links to the page for this combination of tags.
+
+        This differs from `tags_file` if the page is shared with an equivalent
+        combination.
+        """
+        return self.tags_file(self.canonical_tags(tags))
+
+    def combination_label(self, tags: frozenset[str]) -> str:
+        """The labels of this combination of tags, joined with plus signs."""
+        if (label := self._labels.get(tags)) is None:
+            labels = sorted(self.tag_labels[tag] for tag in tags)
+            label = self._labels[tags] = " + ".join(labels)
+        return label
 
     def narrowing_tags(self, tags: Iterable[str]) -> list[TagInfo]:
         """Find tags that, when combined with these tags, yield fewer pages.
@@ -77,15 +387,14 @@ class Tagging:
         Assumes tags are already tagified.
         """
         tag_set = frozenset(tags)
-        tag_count = len(tag_set) + 1  # How many tags we want in results.
-        page_count = len(self.pages_by_tags[tag_set])
+        page_count = self.count(tag_set)
         narrowings = [
-            (k, len(pages))
-            for k, pages in self.pages_by_tags.items()
-            if k > tag_set and len(k) == tag_count and len(pages) < page_count
+            (k, count)
+            for k in self.children(tag_set)
+            if (count := self.count(k)) < page_count and self.has_tag_page(k)
         ]
         return [
-            TagInfo(self.tag_labels[next(iter(k - tag_set))], self.tags_file(k), count)
+            TagInfo(self.tag_labels[next(iter(k - tag_set))], self.tags_href(k), count)
             for k, count in narrowings
         ]
 
@@ -98,17 +407,16 @@ class Tagging:
         Assumes tags are already tagified.
         """
         tag_set = frozenset(tags)
-        min_count = len(self.pages_by_tags[tag_set]) + 1
+        min_count = self.count(tag_set) + 1
         widenings = [
             (tag_subset, count)
-            for tag_subset in iter_subsets(tags)
-            if (count := len(self.pages_by_tags.get(tag_subset))) and count >= min_count
+            for tag_subset in iter_subsets(tags, self.max_combination_size)
+            if self.has_tag_page(tag_subset)
+            and (count := self.count(tag_subset)) >= min_count
         ]
         tag_infos = [
             TagInfo(
-                " + ".join(sorted(self.tag_labels[tag] for tag in tag_subset)),
-                self.tags_file(tag_subset),
-                count,
+                self.combination_label(tag_subset), self.tags_href(tag_subset), count
             )
             for tag_subset, count in widenings
         ]
@@ -116,12 +424,282 @@ class Tagging:
         return tag_infos
 
 
-def iter_subsets(xs: Set) -> Generator[frozenset]:
-    """Yield all the subsets of the"""
+class BitsetTagging(Tagging):
+    """Index of pages by tags that keeps a bitset of pages for each tag.
+
+    Pages are numbered in order, and each tag has an int
+    with a bit set for each page with that tag. The pages with a combination
+    of tags are found by ANDing their bitsets and counted with a popcount,
+    so there are no lists of pages for combinations, and memory grows with
+    the number of pages times the number of tags.
+
+    If NumPy is available, the bitsets are also the rows of an array,
+    so the tags that narrow a combination are counted all at once.
+
+    Updating a page changes only its bits. Removing a page, or adding one
+    before others, numbers the pages again, which means making the list
+    of page ids of each tag again, but no combinations are indexed.
+
+    Combinations are listed in a different order from `Tagging`,
+    but narrowings come in the same order, so generated pages are the same.
+    """
+
+    name = "bitsets"
+    ids_by_tag: dict[str, array]
+
+    def __init__(
+        self,
+        href_format="tagged/{tags}.html",
+        max_combination_size: int | None = None,
+        min_pages: int = 1,
+        collapse_equivalent: bool = False,
+        page_order: Mapping[str, int] | None = None,
+        use_numpy: bool | None = None,
+    ):
+        super().__init__(
+            href_format,
+            max_combination_size,
+            min_pages,
+            collapse_equivalent,
+            page_order,
+        )
+        if use_numpy and numpy is None:
+            raise RuntimeError("Using NumPy with BitsetTagging needs numpy 2.")
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        self.pages = []
+        self.tag_lists = []
+        self.ids_by_tag = {}
+        self._bits = None
+
+    def add(self, page) -> set[frozenset[str]]:
+        if tags := self._tags_for(page):
+            if (
+                self.page_order is not None
+                and self.pages
+                and self._position(page) < self._position(self.pages[-1])
+            ):
+                id = bisect_right(self.pages, self._position(page), key=self._position)
+                self.pages.insert(id, page)
+                self.tag_lists.insert(id, tags)
+                self._renumber()
+            else:
+                self._append_ids(len(self.pages), tags)
+                self.pages.append(page)
+                self.tag_lists.append(tags)
+                self._bits = None
+            self._relabel(tags)
+        return set(iter_subsets(tags, self.max_combination_size))
+
+    def remove(self, page) -> set[frozenset[str]]:
+        if tags := self._tags_for(page):
+            id = index_of(self.pages, page)
+            del self.pages[id]
+            del self.tag_lists[id]
+            self._renumber()
+            self._relabel(tags)
+        return set(iter_subsets(tags, self.max_combination_size))
+
+    def update(self, old_page, new_page) -> set[frozenset[str]]:
+        old_tags = self._tags_for(old_page)
+        if not old_tags or not (tags := self._tags_for(new_page)):
+            return super().update(old_page, new_page)
+
+        # The new version takes the place of the old one.
+        id = index_of(self.pages, old_page)
+        self.pages[id] = new_page
+        self.tag_lists[id] = tags
+        for tag in dict.fromkeys(old_tags):
+            if tag not in tags:
+                self._flip(tag, id)
+        for tag in dict.fromkeys(tags):
+            if tag not in old_tags:
+                self._flip(tag, id)
+        self._relabel(old_tags + tags)
+        return set(iter_subsets(old_tags, self.max_combination_size)) | set(
+            iter_subsets(tags, self.max_combination_size)
+        )
+
+    def _append_ids(self, id: int, tags: list[str]):
+        for tag in dict.fromkeys(tags):
+            if (ids := self.ids_by_tag.get(tag)) is None:
+                ids = self.ids_by_tag[tag] = array("L")
+            ids.append(id)
+
+    def _renumber(self):
+        """Make the lists of page ids again after pages are inserted or removed."""
+        self.ids_by_tag = {}
+        for id, tags in enumerate(self.tag_lists):
+            self._append_ids(id, tags)
+        self._bits = None
+
+    def _flip(self, tag: str, id: int):
+        """Add or remove this tag from the page with this id."""
+        ids = self.ids_by_tag.setdefault(tag, array("L"))
+        if id in ids:
+            ids.remove(id)
+            if not ids:
+                del self.ids_by_tag[tag]
+        else:
+            insort(ids, id)
+
+        # Change the bitsets too, unless they are to be built again anyway.
+        if self._bits is None:
+            return
+        if bits := self._bits.get(tag, 0) ^ (1 << id):
+            self._bits[tag] = bits
+        else:
+            del self._bits[tag]
+        if self.use_numpy:
+            if (row := self._rows.get(tag)) is None:
+                self._bits = None  # A new tag needs a new row.
+            else:
+                self._matrix.view("u1")[row, id >> 3] ^= 1 << (id & 7)
+
+    def _last_page(self, tag: str):
+        ids = self.ids_by_tag.get(tag)
+        return self.pages[ids[-1]] if ids else None
+
+    def _bitsets(self) -> dict[str, int]:
+        """The bitset of each tag, built from the page ids after pages are added."""
+        if self._bits is None:
+            # Whole 64-bit words, so NumPy can use them as they are.
+            self._size = (len(self.pages) + 63) // 64 * 8
+            buffers = []
+            for ids in self.ids_by_tag.values():
+                buffer = bytearray(self._size)
+                for id in ids:
+                    buffer[id >> 3] |= 1 << (id & 7)
+                buffers.append(buffer)
+            self._bits = {
+                tag: int.from_bytes(buffer, "little")
+                for tag, buffer in zip(self.ids_by_tag, buffers)
+            }
+            if self.use_numpy:
+                self._tags = list(self.ids_by_tag)
+                self._rows = {tag: row for row, tag in enumerate(self._tags)}
+                # Copied in to a bytearray so that it can be changed.
+                matrix = bytearray(b"".join(buffers))
+                self._matrix = numpy.frombuffer(matrix, dtype="<u8").reshape(
+                    len(buffers), self._size // 8
+                )
+        return self._bits
+
+    def _and(self, tags: Iterable[str]) -> int:
+        """The bitset of the pages with all of these tags."""
+        bits = self._bitsets() if self._bits is None else self._bits
+        tags = iter(tags)
+        result = bits.get(next(tags, None), 0)
+        for tag in tags:
+            result &= bits.get(tag, 0)
+        return result
+
+    def _ids(self, bits: int) -> list[int]:
+        """The ids of the pages in this bitset, in the order they were added."""
+        digits = bin(bits)[:1:-1]  # Lowest bit first.
+        ids = []
+        i = digits.find("1")
+        while i >= 0:
+            ids.append(i)
+            i = digits.find("1", i + 1)
+        return ids
+
+    def _extra_tags(self, bits: int, tags: frozenset[str]) -> dict[str, int]:
+        """Count the pages in this bitset with each tag not in `tags`.
+
+        Only tags on at least one of the pages are included. NumPy counts
+        every tag at once, which is quicker unless there are only a few pages.
+        """
+        if self.use_numpy and bits.bit_count() > len(self._tags):
+            row = numpy.frombuffer(bits.to_bytes(self._size, "little"), dtype="<u8")
+            counts = numpy.bitwise_count(self._matrix & row).sum(axis=1)
+            result = {self._tags[i]: int(counts[i]) for i in numpy.flatnonzero(counts)}
+        else:
+            all_bits = self._bits
+            result = {tag: 0 for id in self._ids(bits) for tag in self.tag_lists[id]}
+            for tag in result:
+                result[tag] = (bits & all_bits[tag]).bit_count()
+        for tag in tags:
+            result.pop(tag, None)
+        return result
+
+    def _creation_order(self, tags: frozenset[str]) -> tuple:
+        """Where `Tagging` would have put this combination among its siblings.
+
+        That is, when the first page with these tags was added,
+        and where they are in that page’s list of tags.
+        """
+        bits = self._and(tags)
+        first = (bits & -bits).bit_length() - 1
+        tag_list = self.tag_lists[first]
+        return first, sorted(tag_list.index(tag) for tag in tags)
+
+    def children(self, tags: frozenset[str]) -> list[frozenset[str]]:
+        if (
+            self.max_combination_size is not None
+            and len(tags) >= self.max_combination_size
+        ):
+            return []
+        if not (bits := self._and(tags)):
+            return []
+        children = [tags | {tag} for tag in self._extra_tags(bits, tags)]
+        children.sort(key=self._creation_order)
+        return children
+
+    def combinations(self) -> Iterator[tuple[frozenset[str], list]]:
+        bits = self._bitsets()
+        order = {tag: i for i, tag in enumerate(sorted(bits))}
+
+        # Each combination is extended only with tags later in the order,
+        # so that it is found once. A combination with too few pages
+        # is not extended, since adding tags cannot add pages.
+        stack = [(frozenset((tag,)), b, order[tag]) for tag, b in bits.items()]
+        while stack:
+            tags, b, last = stack.pop()
+            yield tags, [self.pages[id] for id in self._ids(b)]
+            if (
+                self.max_combination_size is not None
+                and len(tags) >= self.max_combination_size
+            ):
+                continue
+            for tag, count in self._extra_tags(b, tags).items():
+                if order[tag] > last and count >= self.min_pages:
+                    stack.append((tags | {tag}, b & bits[tag], order[tag]))
+
+    def has_tag_page(self, tags: frozenset[str]) -> bool:
+        if (
+            self.max_combination_size is not None
+            and len(tags) > self.max_combination_size
+        ):
+            return False
+        count = self.count(tags)
+        return count > 0 and (len(tags) == 1 or count >= self.min_pages)
+
+    def pages_for_tags(self, tags: frozenset[str]) -> list | None:
+        ids = self._ids(self._and(tags))
+        return [self.pages[id] for id in ids] if ids else None
+
+    def count(self, tags: frozenset[str]) -> int:
+        return self._and(tags).bit_count()
+
+
+def index_of(pages: list, page) -> int:
+    """The position of this very page in the list, not just one equal to it."""
+    for i, p in enumerate(pages):
+        if p is page:
+            return i
+    raise ValueError(f"{page.name} is not in the list")
+
+
+ENGINES = {engine.name: engine for engine in [Tagging, BitsetTagging]}
+
+
+def iter_subsets(xs: Set, max_size: int | None = None) -> Generator[frozenset]:
+    """Yield all the non-empty subsets of these tags, up to `max_size` tags."""
+    top = len(xs) if max_size is None else min(max_size, len(xs))
     for x in xs:
         yield frozenset((x,))
-    for k in range(2, len(xs)):
+    for k in range(2, min(top + 1, len(xs))):
         for combo in itertools.combinations(xs, k):
             yield frozenset(combo)
-    if len(xs) > 1:
+    if 1 < len(xs) <= top:
         yield frozenset(xs)
@@ -0,0 +1,46 @@
+"""Mustache templates tokenized in advance."""
+
+from collections.abc import Iterator, Mapping
+
+from chevron.tokenizer import tokenize
+
+from .build import digest
+
+
+class CompiledTemplates(Mapping):
+    """Maps template names to lists of tokens ready to pass to `chevron.render`.
+
+    Chevron accepts a list of tokens in place of the text of a template,
+    and this includes partials looked up in `partials_dict`. Passing
+    this mapping as both means that no template is tokenized more than once.
+
+    Tokens are remembered by the name and a hash of the text of the template,
+    so templates that have not changed are not tokenized again
+    when the templates are reloaded.
+    """
+
+    def __init__(self, texts: Mapping[str, str] = None):
+        self.texts = {}
+        self._keys = {}
+        self._tokens = {}
+        if texts:
+            self.load(texts)
+
+    def load(self, texts: Mapping[str, str]):
+        """Replace the templates, keeping tokens for any that are unchanged."""
+        self.texts = dict(texts)
+        self._keys = {name: (name, digest(text)) for name, text in self.texts.items()}
+        keys = set(self._keys.values())
+        self._tokens = {k: v for k, v in self._tokens.items() if k in keys}
+
+    def __getitem__(self, name: str) -> list[tuple[str, str]]:
+        key = self._keys[name]
+        if (tokens := self._tokens.get(key)) is None:
+            tokens = self._tokens[key] = list(tokenize(self.texts[name]))
+        return tokens
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
@@ -1,16 +1,81 @@
 """Classes for generating XML documents, for people fussy about XML formatting."""
 
 import io
-from collections.abc import Mapping
-from typing import Self
-from xml.sax.saxutils import escape
+from collections.abc import Iterable, Mapping
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import BinaryIO, Self
 
 # Default namespace definitions. Individual Doc instances may override these.
 NAMESPACES = {
     "": "http://www.w3.org/1999/xhtml",
     "atom": "http://www.w3.org/2005/Atom",
+    "fh": "http://purl.org/syndication/history/1.0",
 }
 
+# Shared by all elements without attributes, which is most of them.
+NO_ATTRS = MappingProxyType({})
+
+
+def escape_text(text: str) -> str:
+    """Escape text for use as the content of an element.
+
+    Most text has nothing to escape, and is returned as is.
+    """
+    if "&" in text or "<" in text or ">" in text:
+        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+
+def escape_attr(value: str) -> str:
+    """Escape text for use as the value of an attribute in double quotes."""
+    if "&" in value or "<" in value or ">" in value or '"' in value:
+        return escape_text(value).replace('"', "&quot;")
+    return value
+
+
+# Sets of prefixes are interned, since most elements use the same few.
+_PREFIX_SETS: dict[frozenset[str], frozenset[str]] = {}
+_OWN_PREFIXES: dict[str | tuple[str, ...], frozenset[str]] = {}
+
+
+def _interned(prefixes: frozenset[str]) -> frozenset[str]:
+    return _PREFIX_SETS.setdefault(prefixes, prefixes)
+
+
+def _own_prefixes(etype: str, attrs: Mapping[str, str]) -> frozenset[str]:
+    """The prefixes used by the name and attributes of one element."""
+    key = (etype, *attrs) if attrs else etype
+    if (prefixes := _OWN_PREFIXES.get(key)) is None:
+        # If etype has no colon, it is default namespace.
+        first, _, second = etype.partition(":")
+        found = {first if second else ""}
+        for qname in attrs:
+            # If attr name has no colon, it is in no namespace.
+            first, _, second = qname.partition(":")
+            if second:
+                found.add(first)
+        prefixes = _OWN_PREFIXES[key] = _interned(frozenset(found))
+    return prefixes
+
+
+def _start_tag(
+    etype: str, attrs: Mapping[str, str], default_prefix: str | None
+) -> tuple[str, str]:
+    """The name of the element and its formatted attributes.
+
+    If `default_prefix` is supplied, it is removed from the element name.
+    """
+    if default_prefix is not None:
+        bad_attrs = [k for k in attrs.keys() if k.startswith(default_prefix)]
+        if bad_attrs:
+            raise ValueError(
+                f'Cannot represent attrs {", ".join(bad_attrs)} '
+                f'with default prefix {default_prefix.removesuffix(":")}'
+            )
+        etype = etype.removeprefix(default_prefix)
+    return etype, "".join(f' {k}="{escape_attr(v)}"' for k, v in attrs.items())
+
 
 class Elt:
     """One element in the XML document.
@@ -21,14 +86,28 @@ class Elt:
     - content that is just nested elements/
 
     In other words, we do not support mixed content.
+
+    Feeds have many small elements, so they are kept compact:
+    elements without attributes share a read-only mapping,
+    and the list of child elements is created when the first is added.
+
+    The namespace prefixes used by an element and its descendants are
+    kept up to date in `prefixes` as elements are added, so that
+    a document can declare them without searching the whole tree.
+    For the same reason `attrs` is a read-only copy of the attributes
+    supplied: use `set_attr` to change them.
     """
 
+    __slots__ = ("etype", "attrs", "text", "elements", "prefixes", "parent")
+
     def __init__(self, etype: str, attrs: Mapping[str, str] = None, text: str = None):
         self.etype = etype
-        self.attrs = attrs or {}
+        self.attrs = MappingProxyType(dict(attrs)) if attrs else NO_ATTRS
         self.text = text
 
-        self.elements = []
+        self.elements = ()
+        self.prefixes = _own_prefixes(etype, self.attrs)
+        self.parent = None
 
     def element(
         self, etype: str, attrs: Mapping[str, str] | str = None, text: str = None
@@ -40,66 +119,91 @@ class Elt:
             attrs = {}
         return self.append(Elt(etype, attrs, text))
 
+    def set_attr(self, name: str, value: str):
+        """Set one attribute, declaring its namespace prefix if it has one."""
+        self.attrs = MappingProxyType(self.attrs | {name: value})
+        self._add_prefixes(_own_prefixes(self.etype, self.attrs))
+
     def append(self, elt: "Elt") -> "Elt":
-        self.elements.append(elt)
+        if self.elements:
+            self.elements.append(elt)
+        else:
+            self.elements = [elt]
+        # Serialized elements cannot change, so they need no parent to tell.
+        if not isinstance(elt, Raw):
+            elt.parent = self
+        self._add_prefixes(elt.prefixes)
         return elt
 
+    def _add_prefixes(self, prefixes: frozenset[str]):
+        """Add these prefixes to this element and its ancestors."""
+        elt = self
+        while elt is not None and not prefixes <= elt.prefixes:
+            elt.prefixes = _interned(elt.prefixes | prefixes)
+            elt = elt.parent
+
     def iter_prefixes(self):
         """Yield prefixes used for element or attributes.
 
         This is used when deciding which namespaces need declarations
         on the root element of the document.
         """
-        # If etype has no colon, it is default namespace.
-        first, _, second = self.etype.partition(":")
-        yield first if second else ""
-
-        for qname in self.attrs:
-            # If attr name has no colon, it is in no namespace.
-            first, _, second = qname.partition(":")
-            if second:
-                yield first
+        return iter(self.prefixes)
 
-        for elt in self.elements:
-            yield from elt.iter_prefixes()
-
-    def write_to(self, out, *, indent=None, default_prefix=None):
+    def write_to(self, out, *, indent=None, default_prefix=None, compact=False):
         """Write the representation of this element and its content.
 
         Optional argument `indent` is used to add whitespace at
-        the start of each line.
+        the start of each line. If `compact` is true then there is
+        no indentation and no line breaks between elements.
         """
-        return self._write_to(self.attrs, indent or "", default_prefix, out)
-
-    def _write_to(self, attrs, indent: str, default_prefix: str | None, out):
-        if default_prefix is not None:
-            bad_attrs = [k for k in attrs.keys() if k.startswith(default_prefix)]
-            if bad_attrs:
-                raise ValueError(
-                    f'Cannot represent attrs {", ".join(bad_attrs)} '
-                    f'with default prefix {default_prefix.removesuffix(":")}'
-                )
-            etype = self.etype.removeprefix(default_prefix)
-            attrs = {k.removeprefix(default_prefix): v for k, v in attrs.items()}
-        else:
-            etype = self.etype
-        formatted = formatted = "".join(f' {k}="{escape(v)}"' for k, v in attrs.items())
+        indent = "" if compact else indent or ""
+        return self._write_to(self.attrs, indent, default_prefix, out, compact)
+
+    def _write_to(
+        self, attrs, indent: str, default_prefix: str | None, out, compact=False
+    ):
+        etype, formatted = _start_tag(self.etype, attrs, default_prefix)
+        newline = "" if compact else "\n"
 
         if self.elements:
-            out.write(f"{indent}<{etype}{formatted}>\n")
+            out.write(f"{indent}<{etype}{formatted}>{newline}")
+            inner = indent if compact else indent + "  "
             for elt in self.elements:
-                elt.write_to(out, indent=indent + "  ", default_prefix=default_prefix)
-            out.write(f"{indent}</{etype}>\n")
+                elt.write_to(
+                    out, indent=inner, default_prefix=default_prefix, compact=compact
+                )
+            out.write(f"{indent}</{etype}>{newline}")
         elif self.text is not None:
-            out.write(f"{indent}<{etype}{formatted}>{escape(self.text)}</{etype}>\n")
+            text = escape_text(self.text)
+            out.write(f"{indent}<{etype}{formatted}>{text}</{etype}>{newline}")
         else:
-            out.write(f"{indent}<{etype}{formatted}/>\n")
+            out.write(f"{indent}<{etype}{formatted}/>{newline}")
 
-    def to_string(self):
+    def to_string(self, *, compact=False):
         buf = io.StringIO()
-        self.write_to(buf)
+        self.write_to(buf, compact=compact)
         return buf.getvalue()
 
+    def to_raw(self, *, indent=None, default_prefix=None, compact=False) -> "Raw":
+        """Serialize this element now, for inclusion in documents later.
+
+        The arguments are the indentation, default prefix, and compactness
+        it will have where it is placed in the document.
+        """
+        buf = io.StringIO()
+        self.write_to(
+            buf, indent=indent, default_prefix=default_prefix, compact=compact
+        )
+        return Raw(
+            self.etype,
+            buf.getvalue(),
+            self.prefixes,
+            indent=indent,
+            default_prefix=default_prefix,
+            compact=compact,
+        )
+
     def find(self, etype: str, attrs: Mapping[str, str] = None) -> Self | None:
         """Used in tests to find a matching child element."""
         for element in self.elements:
@@ -109,6 +213,53 @@ class Elt:
                 return element
 
 
+class Raw(Elt):
+    """An element that has already been serialized, and is copied out as is.
+
+    This saves escaping and formatting an element again when it is
+    included in many documents. Because the text is copied verbatim,
+    it can only be written with the indentation, default prefix,
+    and compactness it was serialized with. Use `Elt.to_raw` to make one.
+    """
+
+    __slots__ = ("xml", "context")
+
+    def __init__(
+        self,
+        etype: str,
+        xml: str,
+        prefixes: frozenset[str],
+        *,
+        indent: str = None,
+        default_prefix: str = None,
+        compact: bool = False,
+    ):
+        super().__init__(etype)
+        self.xml = xml
+        self.prefixes = _interned(frozenset(prefixes))
+        self.context = _raw_context(indent, default_prefix, compact)
+
+    def append(self, elt: Elt) -> Elt:
+        raise TypeError("Cannot add elements to a serialized element")
+
+    def set_attr(self, name: str, value: str):
+        raise TypeError("Cannot change attributes of a serialized element")
+
+    def write_to(self, out, *, indent=None, default_prefix=None, compact=False):
+        if _raw_context(indent, default_prefix, compact) != self.context:
+            indent, default_prefix, compact = self.context
+            raise ValueError(
+                f"Element {self.etype} was serialized for indent {indent!r}, "
+                f"prefix {default_prefix!r}, and compact {compact}"
+            )
+        out.write(self.xml)
+
+
+def _raw_context(indent: str | None, default_prefix: str | None, compact: bool):
+    # Indentation makes no difference to compact output.
+    return "" if compact else indent or "", default_prefix, compact
+
+
 class Doc(Elt):
     """A simple XML generator for XML.
 
@@ -131,6 +282,8 @@ class Doc(Elt):
     regexes.
     """
 
+    __slots__ = ("namespaces",)
+
     def __init__(
         self,
         etype: str,
@@ -139,14 +292,19 @@ class Doc(Elt):
         *,
         text=None,
     ):
-        super().__init__(etype, attrs, text)
+        super().__init__(etype, None, text)
+        # The root element’s attrs may be updated (with `xml:base`, say),
+        # so it has its own dict, and its prefixes are found again when written.
+        self.attrs = dict(attrs) if attrs else {}
+        self.prefixes = _own_prefixes(etype, self.attrs)
         self.namespaces = NAMESPACES | (dict(namespaces) if namespaces else {})
 
-    def write_to(self, out):
-        attrs = self.attrs
-
+    def write_to(self, out, *, compact=False):
         # We need to add namespace declarations to the attrs of the root elt.
-        prefixes = set(self.iter_prefixes())
+        # They are added to a copy so that writing does not change the document.
+        attrs = dict(self.attrs)
+        # The attrs of the root may have been changed since it was created.
+        prefixes = set(self.prefixes | _own_prefixes(self.etype, attrs))
         prefixes.discard("xml")
         prefix, colon, local_name = self.etype.partition(":")
         if colon:
@@ -164,10 +322,163 @@ class Doc(Elt):
             }
         )
 
-        return self._write_to(attrs, "", default_prefix, out)
+        return self._write_to(attrs, "", default_prefix, out, compact)
+
+    def set_attr(self, name: str, value: str):
+        self.attrs[name] = value
 
     @classmethod
     def from_element(cls, element: Elt, namespaces: Mapping[str, str]) -> Self:
         doc = cls(element.etype, element.attrs, namespaces, text=element.text)
         doc.elements = element.elements
+        doc.prefixes = element.prefixes
         return doc
+
+
+class XmlWriter:
+    """Writes an XML document to a binary file as its elements are produced.
+
+    Unlike `Doc`, the document is never held in memory as a whole, so
+    this suits documents with many elements, like site maps.
+    The output is formatted the same way as `Doc` formats it: the namespace
+    of the root element is made the default namespace, and nested elements
+    are indented unless `compact` is true.
+
+    Because the namespace declarations are written first, the prefixes
+    used other than that of the root element must be supplied in advance.
+    Writing an element with any other prefix is an error.
+
+    It is used as a context manager, which writes the root element:
+
+        with XmlWriter(f, "atom:feed", prefixes=["fh"]) as writer:
+            writer.element("atom:title", {}, "Blog")
+            with writer.nested("atom:author"):
+                writer.element("atom:name", {}, "Alice")
+            writer.append(entry)
+    """
+
+    def __init__(
+        self,
+        out: BinaryIO,
+        etype: str,
+        attrs: Mapping[str, str] = None,
+        namespaces: Mapping[str, str] = None,
+        *,
+        prefixes: Iterable[str] = (),
+        compact: bool = False,
+    ):
+        self.namespaces = NAMESPACES | (dict(namespaces) if namespaces else {})
+        self.etype = etype
+        self.attrs = dict(attrs) if attrs else {}
+
+        prefix, colon, _ = etype.partition(":")
+        self.default_prefix = prefix + ":" if colon else None
+        prefixes = set(prefixes) - {"", "xml", prefix}
+        if colon:
+            self.attrs["xmlns"] = self.namespaces[prefix]
+        self.attrs.update({f"xmlns:{p}": self.namespaces[p] for p in sorted(prefixes)})
+        self.prefixes = prefixes | {"", "xml", prefix}
+
+        self._binary = out
+        self._out = None
+        self._names = {}
+        self._open = []
+        self.compact = compact
+        self._indent = ""
+        self._step = "" if compact else "  "
+        self._newline = "" if compact else "\n"
+        self._pending = False
+
+    def __enter__(self) -> Self:
+        # The wrapper does the buffering and encoding.
+        self._out = io.TextIOWrapper(self._binary, encoding="UTF-8")
+        self._start(*_start_tag(self.etype, self.attrs, self.default_prefix))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            while self._open:
+                self.end()
+        self._out.flush()
+        self._out.detach()
+        self._out = None
+
+    def element(
+        self, etype: str, attrs: Mapping[str, str] | str = None, text: str = None
+    ):
+        """Write an element with no children."""
+        if isinstance(attrs, str) and text is None:
+            text = attrs
+            attrs = {}
+        etype, formatted = self._tag(etype, attrs)
+        self._finish_pending()
+        if text is None:
+            self._out.write(f"{self._indent}<{etype}{formatted}/>{self._newline}")
+        else:
+            text = escape_text(text)
+            self._out.write(
+                f"{self._indent}<{etype}{formatted}>{text}</{etype}>{self._newline}"
+            )
+
+    def append(self, elt: Elt):
+        """Write this element and its descendants."""
+        if missing := elt.prefixes - self.prefixes:
+            raise ValueError(f"Undeclared prefixes {', '.join(sorted(missing))}")
+        self._finish_pending()
+        elt.write_to(
+            self._out,
+            indent=self._indent,
+            default_prefix=self.default_prefix,
+            compact=self.compact,
+        )
+
+    def start(self, etype: str, attrs: Mapping[str, str] = None):
+        """Write the start of an element whose children are written next."""
+        self._start(*self._tag(etype, attrs))
+
+    def end(self):
+        """Write the end of the element most recently started."""
+        etype = self._open.pop()
+        self._indent = self._indent.removesuffix(self._step)
+        if self._pending:
+            self._out.write(f"/>{self._newline}")
+            self._pending = False
+        else:
+            self._out.write(f"{self._indent}</{etype}>{self._newline}")
+
+    @contextmanager
+    def nested(self, etype: str, attrs: Mapping[str, str] = None):
+        """Start an element, and end it after the body of the `with` statement."""
+        self.start(etype, attrs)
+        yield self
+        self.end()
+
+    def _start(self, etype: str, formatted: str):
+        self._finish_pending()
+        self._out.write(f"{self._indent}<{etype}{formatted}")
+        self._open.append(etype)
+        self._indent += self._step
+        # Whether to write `>` or `/>` depends on whether it has children.
+        self._pending = True
+
+    def _finish_pending(self):
+        if self._pending:
+            self._out.write(f">{self._newline}")
+            self._pending = False
+
+    def _tag(self, etype: str, attrs: Mapping[str, str] | None) -> tuple[str, str]:
+        """The name and formatted attributes of an element, checking its prefixes."""
+        # Element names are checked once and remembered.
+        if (name := self._names.get(etype)) is None:
+            prefix, colon, _ = etype.partition(":")
+            if (prefix if colon else "") not in self.prefixes:
+                raise ValueError(f"Undeclared prefix {prefix}")
+            name, _ = _start_tag(etype, NO_ATTRS, self.default_prefix)
+            self._names[etype] = name
+        if not attrs:
+            return name, ""
+        for qname in attrs:
+            prefix, colon, _ = qname.partition(":")
+            if colon and prefix not in self.prefixes:
+                raise ValueError(f"Undeclared prefix {prefix}")
+        return _start_tag(etype, attrs, self.default_prefix)
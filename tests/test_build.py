@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from mismiy.build import BuildGraph, Changes, digest
+
+from .mixins import TempDirMixin
+
+
+class TestBuildGraph(TempDirMixin, unittest.TestCase):
+    def test_output_is_up_to_date_if_inputs_unchanged(self):
+        # Given an output was recorded in the previous build …
+        graph = BuildGraph(self.dir_path)
+        graph.write("a.html", "Hello")
+        graph.record("a.html", {"page:a": digest("Hello")})
+        graph.save()
+
+        # When we check it in the next build …
+        graph = BuildGraph(self.dir_path)
+
+        # Then it is up to date only if the inputs are the same.
+        self.assertTrue(graph.up_to_date("a.html", {"page:a": digest("Hello")}))
+        self.assertFalse(graph.up_to_date("a.html", {"page:a": digest("Hi")}))
+        self.assertFalse(graph.up_to_date("b.html", {"page:a": digest("Hello")}))
+
+    def test_output_is_not_up_to_date_if_fingerprint_changes(self):
+        graph = BuildGraph(self.dir_path, "1.0")
+        graph.write("a.html", "Hello")
+        graph.record("a.html", {})
+        graph.save()
+
+        graph = BuildGraph(self.dir_path, "2.0")
+
+        self.assertFalse(graph.up_to_date("a.html", {}))
+
+    def test_output_is_not_up_to_date_if_file_deleted(self):
+        graph = BuildGraph(self.dir_path)
+        graph.write("a.html", "Hello")
+        graph.record("a.html", {})
+        graph.save()
+        (self.dir_path / "a.html").unlink()
+
+        graph = BuildGraph(self.dir_path)
+
+        self.assertFalse(graph.up_to_date("a.html", {}))
+
+    def test_writes_only_files_whose_content_changed(self):
+        # Given 2 files were written in the previous build …
+        graph = BuildGraph(self.dir_path, "1.0")
+        graph.write("a.html", "Hello")
+        graph.write("sub/b.html", "Hello")
+        graph.save()
+        os.utime(self.dir_path / "a.html", ns=(0, 0))
+        os.utime(self.dir_path / "sub/b.html", ns=(0, 0))
+
+        # When they are generated again, even with a different fingerprint …
+        graph = BuildGraph(self.dir_path, "2.0")
+        graph.write("a.html", "Hello")
+        graph.write("sub/b.html", "Goodbye")
+        graph.write("c.html", "Hello")
+
+        # Then only the changed and new files are written.
+        self.assertEqual((self.dir_path / "a.html").stat().st_mtime_ns, 0)
+        self.assertEqual((self.dir_path / "sub/b.html").read_text(), "Goodbye")
+        self.assertEqual(graph.changes, Changes(["c.html"], ["sub/b.html"]))
+
+    def test_compares_with_existing_file_not_in_manifest(self):
+        (self.dir_path / "a.html").write_text("Hello")
+
+        graph = BuildGraph(self.dir_path)
+        graph.write("a.html", "Hello")
+
+        self.assertEqual(graph.changes, Changes())
+
+    def test_prunes_outputs_not_generated_this_time(self):
+        # Given 2 outputs were generated in the previous build …
+        graph = BuildGraph(self.dir_path)
+        for name in ["a.html", "tagged/b.html"]:
+            graph.write(name, "Hello")
+            graph.record(name, {})
+        graph.save()
+
+        # When only one of them is generated in the next …
+        graph = BuildGraph(self.dir_path)
+        graph.record("a.html", {})
+        graph.prune()
+        graph.save()
+
+        # Then the other is deleted.
+        self.assertTrue((self.dir_path / "a.html").exists())
+        self.assertFalse((self.dir_path / "tagged/b.html").exists())
+        self.assertEqual(graph.changes, Changes(removed=["tagged/b.html"]))
+        self.assertEqual(BuildGraph(self.dir_path).hashes.keys(), {"a.html"})
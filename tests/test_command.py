@@ -1,14 +1,24 @@
+import io
 import unittest
 from datetime import datetime
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import ANY, Mock, patch
 
-from mismiy import command
+from mismiy import command, markdown
+from mismiy.tagging import BitsetTagging, Tagging
 
 from .mixins import TempDirMixin
 
 
 class TestCommand(TempDirMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        # Avoid changing the HTML cache used by other tests.
+        patcher = patch.object(command, "markdown")
+        self.markdown = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.markdown.ENGINES = {name: Mock() for name in markdown.ENGINES}
+
     def test_uses_named_directories(self):
         with patch.object(command, "Gen") as gen_cls, patch.object(
             command, "Loader"
@@ -17,9 +27,25 @@ class TestCommand(TempDirMixin, unittest.TestCase):
             command.main(["-ss", "-oo", "-tt", "p"])
 
         loader_cls.assert_called_with(
-            [Path("p")], include_drafts=False, now=datetime(2024, 5, 20, 21, 7, 0)
+            [Path("p")],
+            include_drafts=False,
+            now=datetime(2024, 5, 20, 21, 7, 0),
+            cache=ANY,
+            jobs=1,
+            lazy=False,
+        )
+        gen_cls.assert_called_with(
+            Path("t"),
+            Path("s"),
+            incremental=True,
+            jobs=1,
+            archived_feeds=False,
+            compact_feeds=False,
+            max_tag_combination=None,
+            min_tagged_pages=1,
+            tagging_class=Tagging,
+            equivalent_tag_pages="separate",
         )
-        gen_cls.assert_called_with(Path("t"), Path("s"))
         gen_cls.return_value.render_pages.assert_called_with(
             loader_cls.return_value, Path("o")
         )
@@ -32,9 +58,25 @@ class TestCommand(TempDirMixin, unittest.TestCase):
             command.main([])
 
         loader_cls.assert_called_with(
-            [Path("posts")], include_drafts=False, now=datetime(2024, 5, 20, 21, 7, 0)
+            [Path("posts")],
+            include_drafts=False,
+            now=datetime(2024, 5, 20, 21, 7, 0),
+            cache=ANY,
+            jobs=1,
+            lazy=False,
+        )
+        gen_cls.assert_called_with(
+            Path("templates"),
+            Path("static"),
+            incremental=True,
+            jobs=1,
+            archived_feeds=False,
+            compact_feeds=False,
+            max_tag_combination=None,
+            min_tagged_pages=1,
+            tagging_class=Tagging,
+            equivalent_tag_pages="separate",
         )
-        gen_cls.assert_called_with(Path("templates"), Path("static"))
         gen_cls.return_value.render_pages.assert_called_with(
             loader_cls.return_value, Path("pub")
         )
@@ -49,5 +91,108 @@ class TestCommand(TempDirMixin, unittest.TestCase):
             command.main(["--drafts", "--as-of=2024-05-05"])
 
         loader_cls.assert_called_with(
-            [Path("posts")], include_drafts=True, now=datetime(2024, 5, 5)
+            [Path("posts")],
+            include_drafts=True,
+            now=datetime(2024, 5, 5),
+            cache=ANY,
+            jobs=1,
+            lazy=False,
         )
+
+    def test_uses_parse_cache_in_cache_dir(self):
+        with patch.object(command, "Gen"), patch.object(
+            command, "Loader"
+        ) as loader_cls, patch.object(command, "ParseCache") as cache_cls:
+            command.main(["--cache-dir", "c"])
+
+        cache_cls.assert_called_with(Path("c/pages.pickle"))
+        self.markdown.html_cache.load.assert_called_with(Path("c/html.pickle"))
+        self.assertEqual(loader_cls.call_args.kwargs["cache"], cache_cls.return_value)
+
+    def test_can_disable_cache(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(
+            command, "Loader"
+        ) as loader_cls:
+            command.main(["--no-cache"])
+
+        self.assertIsNone(loader_cls.call_args.kwargs["cache"])
+        self.markdown.html_cache.load.assert_not_called()
+        self.assertFalse(gen_cls.call_args.kwargs["incremental"])
+
+    def test_can_load_and_render_pages_in_parallel(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(
+            command, "Loader"
+        ) as loader_cls:
+            command.main(["--jobs", "4"])
+
+        self.assertEqual(loader_cls.call_args.kwargs["jobs"], 4)
+        self.assertEqual(gen_cls.call_args.kwargs["jobs"], 4)
+
+    def test_can_archive_feeds(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(command, "Loader"):
+            command.main(["--archived-feeds"])
+
+        self.assertTrue(gen_cls.call_args.kwargs["archived_feeds"])
+
+    def test_can_write_compact_feeds(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(command, "Loader"):
+            command.main(["--compact-feeds"])
+
+        self.assertTrue(gen_cls.call_args.kwargs["compact_feeds"])
+
+    def test_can_limit_tag_combinations(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(command, "Loader"):
+            command.main(["--max-tag-combination", "2", "--min-tagged-pages=3"])
+
+        self.assertEqual(gen_cls.call_args.kwargs["max_tag_combination"], 2)
+        self.assertEqual(gen_cls.call_args.kwargs["min_tagged_pages"], 3)
+
+    def test_can_index_tags_with_bitsets(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(command, "Loader"):
+            command.main(["--tag-index", "bitsets"])
+
+        self.assertIs(gen_cls.call_args.kwargs["tagging_class"], BitsetTagging)
+
+    def test_can_share_pages_of_equivalent_tags(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(command, "Loader"):
+            command.main(["--equivalent-tag-pages", "redirect"])
+
+        self.assertEqual(gen_cls.call_args.kwargs["equivalent_tag_pages"], "redirect")
+
+    def test_can_load_page_bodies_lazily(self):
+        with patch.object(command, "Gen"), patch.object(
+            command, "Loader"
+        ) as loader_cls:
+            command.main(["--lazy"])
+
+        self.assertTrue(loader_cls.call_args.kwargs["lazy"])
+
+    def test_can_choose_markdown_engine(self):
+        with patch.object(command, "Gen"), patch.object(command, "Loader"):
+            command.main(["--markdown", "cmark"])
+
+        self.markdown.html_cache.use_engine.assert_called_with(
+            self.markdown.ENGINES["cmark"].return_value
+        )
+
+    def test_reports_markdown_engine_not_installed(self):
+        self.markdown.ENGINES["cmark"].side_effect = RuntimeError("Needs cmarkgfm.")
+
+        with patch.object(command, "Gen") as gen_cls, patch.object(
+            command, "Loader"
+        ), patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit):
+                command.main(["--markdown", "cmark"])
+
+        self.assertIn("error: Needs cmarkgfm.", stderr.getvalue())
+        gen_cls.assert_not_called()
+
+    def test_rejects_max_tag_combination_below_1(self):
+        with patch.object(command, "Gen") as gen_cls, patch.object(
+            command, "Loader"
+        ), patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit):
+                command.main(["--max-tag-combination", "0"])
+
+        self.assertIn("--max-tag-combination: must be at least 1", stderr.getvalue())
+        gen_cls.assert_not_called()
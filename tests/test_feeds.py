@@ -0,0 +1,178 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from mismiy.feeds import AtomFeed, archive_href, feed_href
+from mismiy.loader import Page
+
+
+def make_posts(count: int) -> list[Page]:
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    return [
+        Page(f"post-{i}", {"title": f"Post {i}", "published": start + timedelta(i)}, "")
+        for i in range(1, count + 1)
+    ]
+
+
+class TestAtomFeed(unittest.TestCase):
+    def test_pages_start_with_most_recent_posts(self):
+        feed = AtomFeed(make_posts(5), "tag:example.org,2024:blog", "Blog", page_size=2)
+
+        self.assertEqual(feed.page_count, 3)
+        self.assertEqual([p.name for p in feed.window(1)], ["post-5", "post-4"])
+        self.assertEqual([p.name for p in feed.window(3)], ["post-1"])
+
+    def test_builds_every_page_in_one_pass(self):
+        feed = AtomFeed(make_posts(5), "tag:example.org,2024:blog", "Blog", page_size=2)
+
+        with patch.object(feed, "entry", wraps=feed.entry) as entry:
+            docs = list(feed.docs())
+
+        self.assertEqual(
+            [href for href, _ in docs], ["feed.atom", "feed-2.atom", "feed-3.atom"]
+        )
+        self.assertEqual(entry.call_count, 5)
+        self.assertEqual(
+            [doc.to_string() for _, doc in docs],
+            [feed.doc(page).to_string() for page in [1, 2, 3]],
+        )
+
+    def test_reuses_serialized_entries_of_unchanged_posts(self):
+        posts = make_posts(3)
+        cache = {}
+        first = AtomFeed(posts, "tag:example.org,2024:blog", "Blog", entry_cache=cache)
+        first_text = first.doc(1).to_string()
+
+        # When one post is changed and the feed is built again with the cache …
+        posts[0] = Page("post-1", posts[0].meta | {"title": "Changed"}, "")
+        feed = AtomFeed(posts, "tag:example.org,2024:blog", "Blog", entry_cache=cache)
+        with patch.object(feed, "entry", wraps=feed.entry) as entry:
+            text = feed.doc(1).to_string()
+
+        # Then only that entry is serialized again.
+        self.assertEqual([c.args[0].name for c in entry.call_args_list], ["post-1"])
+        self.assertEqual(text, first_text.replace("Post 1<", "Changed<"))
+
+        # And changing the feed ID means all the entries are serialized again.
+        feed = AtomFeed(posts, "tag:example.org,2024:other", "Blog", entry_cache=cache)
+        with patch.object(feed, "entry", wraps=feed.entry) as entry:
+            feed.doc(1)
+        self.assertEqual(entry.call_count, 3)
+
+    def test_forgets_entries_of_posts_no_longer_in_feed(self):
+        posts = make_posts(3)
+        cache = {}
+        list(
+            AtomFeed(
+                posts, "tag:example.org,2024:blog", "Blog", entry_cache=cache
+            ).docs()
+        )
+
+        AtomFeed(
+            posts[1:], "tag:example.org,2024:blog", "Blog", entry_cache=cache
+        ).forget_stale_entries()
+
+        self.assertEqual(sorted(cache), ["post-2", "post-3"])
+
+    def test_links_between_pages(self):
+        feed = AtomFeed(make_posts(5), "tag:example.org,2024:blog", "Blog", page_size=2)
+
+        doc = feed.doc(2)
+
+        self.assertEqual(
+            [
+                (e.attrs["rel"], e.attrs["href"])
+                for e in doc.elements
+                if e.etype == "atom:link"
+            ],
+            [
+                ("first", "feed.atom"),
+                ("previous", "feed.atom"),
+                ("next", "feed-3.atom"),
+                ("last", "feed-3.atom"),
+            ],
+        )
+
+    def test_feed_href(self):
+        self.assertEqual(feed_href(1), "feed.atom")
+        self.assertEqual(feed_href(2), "feed-2.atom")
+        self.assertEqual(archive_href(3), "feed-archive-3.atom")
+
+
+def links(doc) -> list[tuple[str, str]]:
+    return [
+        (e.attrs["rel"], e.attrs["href"])
+        for e in doc.elements
+        if e.etype == "atom:link"
+    ]
+
+
+class TestArchivedFeed(unittest.TestCase):
+    def test_archives_are_anchored_at_oldest_post(self):
+        feed = AtomFeed(
+            make_posts(5),
+            "tag:example.org,2024:blog",
+            "Blog",
+            page_size=2,
+            archived=True,
+        )
+
+        self.assertEqual(feed.page_count, 1)
+        self.assertEqual(feed.archive_count, 2)
+        self.assertEqual([p.name for p in feed.archive_window(1)], ["post-2", "post-1"])
+        self.assertEqual([p.name for p in feed.archive_window(2)], ["post-4", "post-3"])
+        self.assertEqual([p.name for p in feed.window(1)], ["post-5", "post-4"])
+        self.assertEqual(
+            [href for href, _ in feed.docs()],
+            ["feed-archive-1.atom", "feed-archive-2.atom", "feed.atom"],
+        )
+
+    def test_links_between_archives(self):
+        feed = AtomFeed(
+            make_posts(5),
+            "tag:example.org,2024:blog",
+            "Blog",
+            page_size=2,
+            archived=True,
+        )
+
+        self.assertEqual(links(feed.doc(1)), [("prev-archive", "feed-archive-2.atom")])
+        self.assertEqual(
+            links(feed.archive_doc(1)),
+            [("current", "feed.atom"), ("next-archive", "feed-archive-2.atom")],
+        )
+        # The newest archive has no newer one to link to yet.
+        doc = feed.archive_doc(2)
+        self.assertEqual(
+            links(doc),
+            [("current", "feed.atom"), ("prev-archive", "feed-archive-1.atom")],
+        )
+        self.assertIn("<fh:archive/>", doc.to_string())
+
+    def test_full_archive_does_not_change_when_posts_added(self):
+        posts = make_posts(12)
+        before = AtomFeed(
+            posts[:7],
+            "tag:example.org,2024:blog",
+            "Blog",
+            "https://example.org/",
+            page_size=2,
+            archived=True,
+        )
+        after = AtomFeed(
+            posts,
+            "tag:example.org,2024:blog",
+            "Blog",
+            "https://example.org/",
+            page_size=2,
+            archived=True,
+        )
+
+        # Only the archives that already had a newer one are unchanged.
+        self.assertEqual(before.archive_count, 3)
+        self.assertEqual(after.archive_count, 6)
+        for archive in [1, 2]:
+            self.assertEqual(
+                after.archive_doc(archive).to_string(),
+                before.archive_doc(archive).to_string(),
+            )
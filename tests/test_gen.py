@@ -1,12 +1,33 @@
+import locale
+import random
+import shutil
 import unittest
 from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+from xml.etree import ElementTree
 
+from mismiy.feeds import AtomFeed
 from mismiy.gen import Gen
 from mismiy.loader import Loader, Page, Person
+from mismiy.tagging import BitsetTagging
+from mismiy.xml import NAMESPACES
 
 from .mixins import TempDirMixin
 
 
+def entry_titles(feed_text: str) -> list[str]:
+    """The titles of the entries in a serialized feed."""
+    root = ElementTree.fromstring(feed_text)
+    return [e.text for e in root.iterfind("atom:entry/atom:title", NAMESPACES)]
+
+
+def read_files(dir_path: Path) -> dict[str, str]:
+    return (
+        {p.name: p.read_text() for p in dir_path.iterdir()} if dir_path.exists() else {}
+    )
+
+
 class TestGen(TempDirMixin, unittest.TestCase):
     def setUp(self):
         super().setUp()
@@ -229,6 +250,75 @@ class TestGen(TempDirMixin, unittest.TestCase):
             "</ul>\n",
         )
 
+    def test_can_limit_tagged_pages(self):
+        self.add_post(
+            "2024-05-05-hello", "title: Hello\ntags:\n- a\n- b\n- c\n\nHello, World!"
+        )
+        self.add_post("2024-05-06-hello", "title: Hi\ntags:\n- a\n- b\n\nHi, World!")
+
+        gen = Gen(self.tpl_dir, max_tag_combination=2, min_tagged_pages=2)
+        gen.render_pages(self.loader, self.pub_dir)
+
+        self.assertEqual(
+            sorted(p.name for p in (self.pub_dir / "tagged").iterdir()),
+            ["a+b.html", "a.html", "b.html", "c.html"],
+        )
+
+    def test_bitset_tagging_generates_same_tagged_pages(self):
+        self.add_post(
+            "2024-05-05-hello", "title: Hello\ntags:\n- a\n- b\n- c\n\nHello, World!"
+        )
+        self.add_post("2024-05-06-hello", "title: Hi\ntags:\n- b\n- a\n\nHi, World!")
+        self.add_tpl(
+            "tagged.html",
+            "{{#reverse_chronological}}{{title}}, {{/reverse_chronological}}"
+            "{{#narrowings}}{{label}} ({{count}}), {{/narrowings}}",
+        )
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+        other_dir = self.dir_path / "other"
+
+        Gen(self.tpl_dir, tagging_class=BitsetTagging).render_pages(
+            self.loader, other_dir
+        )
+
+        tagged_dir = self.pub_dir / "tagged"
+        self.assertEqual(
+            {p.name: p.read_text() for p in tagged_dir.iterdir()},
+            {p.name: p.read_text() for p in (other_dir / "tagged").iterdir()},
+        )
+
+    def test_can_share_pages_of_equivalent_tags(self):
+        self.add_post(
+            "2024-05-05-hello", "title: Hello\ntags:\n- mismiy\n- python\n\nHello!"
+        )
+        self.add_post("2024-05-06-hello", "title: Hi\ntags:\n- mismiy\n\nHi!")
+
+        gen = Gen(self.tpl_dir, equivalent_tag_pages="shared")
+        gen.render_pages(self.loader, self.pub_dir)
+
+        self.assertEqual(
+            sorted(p.name for p in (self.pub_dir / "tagged").iterdir()),
+            ["mismiy+python.html", "mismiy.html"],
+        )
+
+    def test_can_redirect_pages_of_equivalent_tags(self):
+        self.add_post(
+            "2024-05-05-hello", "title: Hello\ntags:\n- mismiy\n- python\n\nHello!"
+        )
+        self.add_post("2024-05-06-hello", "title: Hi\ntags:\n- mismiy\n\nHi!")
+
+        gen = Gen(self.tpl_dir, equivalent_tag_pages="redirect")
+        gen.render_pages(self.loader, self.pub_dir)
+
+        self.assertEqual(
+            (self.pub_dir / "tagged" / "mismiy+python.html").read_text(),
+            "Tagged template",
+        )
+        self.assertIn(
+            '<meta http-equiv="refresh" content="0; url=mismiy+python.html">',
+            (self.pub_dir / "tagged" / "python.html").read_text(),
+        )
+
     def test_renders_static_files(self):
         static_dir = self.dir_path / "static"
         static_dir.mkdir()
@@ -241,6 +331,38 @@ class TestGen(TempDirMixin, unittest.TestCase):
             (self.pub_dir / "man.css").read_text(), "body { font-family: Helvetica; }"
         )
 
+    def test_reports_changes_to_static_files(self):
+        # Given a site with static files has been generated once …
+        static_dir = self.dir_path / "static"
+        static_dir.mkdir()
+        (static_dir / "man.css").write_text("body { font-family: Helvetica; }")
+        (static_dir / "img").mkdir()
+        (static_dir / "img" / "logo.svg").write_text("<svg/>")
+        changes = Gen(self.tpl_dir, static_dir).render_pages(self.loader, self.pub_dir)
+        self.assertIn("img/logo.svg", changes.added)
+
+        # When one static file is changed and another deleted …
+        (static_dir / "man.css").write_text("body { font-family: Futura; }")
+        (static_dir / "img" / "logo.svg").unlink()
+        changes = Gen(self.tpl_dir, static_dir).render_pages(self.loader, self.pub_dir)
+
+        # Then the changes are reported, and the deleted file is pruned.
+        self.assertEqual(changes.added, [])
+        self.assertEqual(changes.changed, ["man.css"])
+        self.assertEqual(changes.removed, ["img/logo.svg"])
+        self.assertFalse((self.pub_dir / "img" / "logo.svg").exists())
+
+    def test_generated_outputs_take_precedence_over_static_files(self):
+        static_dir = self.dir_path / "static"
+        static_dir.mkdir()
+        (static_dir / "index.html").write_text("Static")
+        self.add_tpl("index.html", "Generated")
+
+        for _ in range(2):
+            Gen(self.tpl_dir, static_dir).render_pages(self.loader, self.pub_dir)
+
+        self.assertEqual((self.pub_dir / "index.html").read_text(), "Generated")
+
     def test_skips_unpublished_posts(self):
         self.add_post("2024-05-19-drafty", "title: Drafty\n\nHello, world!")
         self.loader = Loader(
@@ -375,11 +497,7 @@ class TestGen(TempDirMixin, unittest.TestCase):
         self.assertEqual(result.find("atom:updated").text, "2024-05-26T00:00:00+01:00")
         # And contains entries in reverse chronological order.
         self.assertEqual(
-            [
-                e.find("atom:title").text
-                for e in result.elements
-                if e.etype == "atom:entry"
-            ],
+            entry_titles(result.to_string()),
             ["Fabulous", "Drafty"],
         )
 
@@ -399,11 +517,7 @@ class TestGen(TempDirMixin, unittest.TestCase):
 
         # Then it has the most recent 12 posts
         self.assertEqual(
-            [
-                e.find("atom:title").text
-                for e in result.elements
-                if e.etype == "atom:entry"
-            ],
+            entry_titles(result.to_string()),
             [f"Greetings from {i} May 2024" for i in range(25, 13, -1)],
         )
         self.assertEqual(
@@ -418,11 +532,7 @@ class TestGen(TempDirMixin, unittest.TestCase):
 
         # Then it has the next most recent 12 posts
         self.assertEqual(
-            [
-                e.find("atom:title").text
-                for e in result.elements
-                if e.etype == "atom:entry"
-            ],
+            entry_titles(result.to_string()),
             [f"Greetings from {i} May 2024" for i in range(13, 1, -1)],
         )
         self.assertEqual(
@@ -449,6 +559,311 @@ class TestGen(TempDirMixin, unittest.TestCase):
             r'.*<feed xml:base="https://mismiy.example/test/feed.atom" xmlns="http://www.w3.org/2005/Atom">.*',
         )
 
+    def test_render_compact_feed(self):
+        self.add_post("2024-05-05-hello", "title: Hello\n\nHello, World!")
+        self.add_post("2024-05-06-hello", "title: Greetings\n\nGreetings, World!")
+
+        gen = Gen(self.tpl_dir, compact_feeds=True)
+        gen.render_pages(self.loader, self.pub_dir)
+
+        feed_text = (self.pub_dir / "feed.atom").read_text()
+        self.assertTrue(
+            feed_text.startswith(
+                '<feed xml:base="https://mismiy.example/test/feed.atom"'
+                ' xmlns="http://www.w3.org/2005/Atom"><id>'
+            )
+        )
+        self.assertNotIn("\n  <", feed_text)
+        self.assertEqual(entry_titles(feed_text), ["Greetings", "Hello"])
+
+    def test_does_not_regenerate_unchanged_outputs(self):
+        # Given a site has been generated once …
+        self.add_post("2024-05-05-hello", "title: Hello\ntags:\n- greeting\n\nHello!")
+        self.add_post("2024-05-06-hello", "title: Greetings\n\nGreetings, World!")
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        # When it is generated again with no changes …
+        gen = Gen(self.tpl_dir)
+        with patch.object(gen, "render_job") as render_job, patch.object(
+            AtomFeed, "doc"
+        ) as feed_doc:
+            gen.render_pages(Loader([self.posts_dir, self.pages_dir]), self.pub_dir)
+
+        # Then nothing is rendered, not even the feed.
+        render_job.assert_not_called()
+        feed_doc.assert_not_called()
+
+    def test_regenerates_outputs_whose_inputs_changed(self):
+        # Given a site has been generated once …
+        self.add_post("2024-05-05-hello", "title: Hello\ntags:\n- greeting\n\nHello!")
+        self.add_post("2024-05-06-hello", "title: Greetings\n\nGreetings, World!")
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        # When one post is changed …
+        self.add_post("2024-05-05-hello", "title: Hi\ntags:\n- greeting\n\nHello!")
+        gen = Gen(self.tpl_dir)
+        with patch.object(gen, "_render_1", wraps=gen._render_1) as render_1:
+            gen.render_pages(Loader([self.posts_dir, self.pages_dir]), self.pub_dir)
+
+        # Then the outputs that include it are regenerated, and not the others.
+        self.assertCountEqual(
+            [c.args[0] for c in render_1.call_args_list],
+            ["2024-05-05-hello.html", "index.html", "tagged/greeting.html"],
+        )
+
+    def test_regenerates_outputs_when_partial_changes(self):
+        self.add_post("2024-05-05-hello", "title: Hello\n\nHello!")
+        self.add_tpl("post.html", "{{> footer.html }}")
+        self.add_tpl("footer.html", "Footer")
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        self.add_tpl("footer.html", "New footer")
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        html_path = self.pub_dir / "2024-05-05-hello.html"
+        self.assertEqual(html_path.read_text(), "New footer")
+
+    def test_regenerates_outputs_when_locale_changes(self):
+        # Given a site with month names has been generated once …
+        self.add_post("2024-05-05-hello", "title: Hello\n\nHello!")
+        self.add_tpl("post.html", "{{#published}}{{month_name}}{{/published}}")
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        # When it is generated again in a locale with other month names …
+        with patch.object(locale, "nl_langinfo", lambda item: "Mai"):
+            Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        # Then the month names are updated.
+        html_path = self.pub_dir / "2024-05-05-hello.html"
+        self.assertEqual(html_path.read_text(), "Mai")
+
+    def test_regenerates_missing_outputs(self):
+        self.add_post("2024-05-05-hello", "title: Hello\n\nHello!")
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+        html_path = self.pub_dir / "2024-05-05-hello.html"
+        html_path.unlink()
+
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        self.assertTrue(html_path.exists())
+
+    def test_regenerates_everything_if_not_incremental(self):
+        self.add_post("2024-05-05-hello", "title: Hello\n\nHello!")
+        Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+
+        gen = Gen(self.tpl_dir, incremental=False)
+        with patch.object(gen, "_render_1", wraps=gen._render_1) as render_1:
+            gen.render_pages(self.loader, self.pub_dir)
+
+        self.assertEqual(render_1.call_count, 2)
+
+    def test_reports_changes_and_prunes_stale_outputs(self):
+        # Given a site has been generated once …
+        self.add_post("2024-05-05-hello", "title: Hello\ntags:\n- greeting\n\nHello!")
+        changes = Gen(self.tpl_dir).render_pages(self.loader, self.pub_dir)
+        self.assertCountEqual(
+            changes.added,
+            [
+                "2024-05-05-hello.html",
+                "index.html",
+                "tagged/greeting.html",
+                "feed.atom",
+            ],
+        )
+
+        # When a post is changed so that its tag is removed …
+        self.add_post("2024-05-05-hello", "title: Hi\n\nHello!")
+        changes = Gen(self.tpl_dir).render_pages(
+            Loader([self.posts_dir, self.pages_dir]), self.pub_dir
+        )
+
+        # Then the outputs that changed are reported, and the tag page is deleted.
+        self.assertEqual(changes.added, [])
+        self.assertEqual(changes.changed, ["feed.atom"])
+        self.assertEqual(changes.removed, ["tagged/greeting.html"])
+        self.assertFalse((self.pub_dir / "tagged" / "greeting.html").exists())
+
+    def test_updates_tag_index_when_pages_change(self):
+        # Given a site has been generated once …
+        self.add_post("2024-05-05-hello", "title: Hello\ntags:\n- a\n- b\n\nHello!")
+        self.add_post("2024-05-06-hi", "title: Hi\ntags:\n- b\n- c\n\nHi!")
+        self.add_post("2024-05-07-yo", "title: Yo\ntags:\n- d\n\nYo!")
+        self.add_tpl(
+            "tagged.html",
+            "{{#reverse_chronological}}{{title}}, {{/reverse_chronological}}"
+            "{{#narrowings}}{{label}} ({{count}}), {{/narrowings}}",
+        )
+        gen = Gen(self.tpl_dir)
+        gen.render_pages(self.loader, self.pub_dir)
+
+        # When, as in watch mode, a post’s tags are changed and a post added …
+        self.add_post("2024-05-06-hi", "title: Hi\ntags:\n- C\n- a\n\nHi!")
+        self.add_post("2024-05-04-hey", "title: Hey\ntags:\n- b\n\nHey!")
+        self.loader.invalidate(
+            [self.posts_dir / "2024-05-06-hi.md", self.posts_dir / "2024-05-04-hey.md"]
+        )
+        changes = gen.render_pages(self.loader, self.pub_dir)
+
+        # Then tag pages are the same as when generated afresh.
+        other_dir = self.dir_path / "other"
+        Gen(self.tpl_dir).render_pages(self.loader, other_dir)
+        tagged_dir = self.pub_dir / "tagged"
+        self.assertEqual(
+            {p.name: p.read_text() for p in tagged_dir.iterdir()},
+            {p.name: p.read_text() for p in (other_dir / "tagged").iterdir()},
+        )
+        self.assertEqual(changes.removed, ["tagged/b+c.html"])
+        # And pages for tags that did not change are left alone.
+        self.assertNotIn("tagged/d.html", changes.changed)
+
+    def test_updates_tag_pages_like_a_fresh_build_after_random_edits(self):
+        self.add_tpl(
+            "tagged.html",
+            "{{#tags}}{{label}} ({{count}}), {{/tags}}\n"
+            "{{#reverse_chronological}}{{title}}, {{/reverse_chronological}}\n"
+            "{{#narrowings}}{{label}} {{href}} ({{count}}), {{/narrowings}}\n"
+            "{{#widenings}}{{label}} {{href}} ({{count}}), {{/widenings}}\n",
+        )
+        terms = ["a", "A", "b", "B", "c", "d", "D"]
+        for i, options in enumerate(
+            [
+                {},
+                {"max_tag_combination": 2},
+                {"min_tagged_pages": 2},
+                {"tagging_class": BitsetTagging},
+            ]
+        ):
+            with self.subTest(**options):
+                # Given a long-lived Gen, as in watch mode …
+                rng = random.Random(i)
+                site_dir = self.dir_path / f"site-{i}"
+                posts_dir = site_dir / "posts"
+                posts_dir.mkdir(parents=True)
+                shutil.copy(self.posts_dir / "META.yaml", posts_dir)
+                loader = Loader([posts_dir])
+                gen = Gen(self.tpl_dir, **options)
+                pub_dir = site_dir / "pub"
+                fresh_dir = site_dir / "fresh"
+
+                for step in range(30):
+                    # When one post at a time is added, edited, or deleted …
+                    post_file = posts_dir / f"2024-05-{rng.randrange(1, 9):02d}-post.md"
+                    if step > 8 and rng.random() < 0.2:
+                        post_file.unlink(missing_ok=True)
+                    else:
+                        chosen = rng.sample(terms, rng.randint(0, 3))
+                        tags = "".join(f"- {term}\n" for term in chosen)
+                        post_file.write_text(
+                            f"title: {post_file.stem}\n"
+                            + (f"tags:\n{tags}" if tags else "")
+                            + "\nHi"
+                        )
+                    loader.invalidate([post_file])
+                    gen.render_pages(loader, pub_dir)
+
+                    # Then the tag pages are the same as when generated afresh.
+                    Gen(self.tpl_dir, incremental=False, **options).render_pages(
+                        loader, fresh_dir
+                    )
+                    self.assertEqual(
+                        read_files(pub_dir / "tagged"),
+                        read_files(fresh_dir / "tagged"),
+                        f"after step {step}",
+                    )
+
+    def test_does_not_regenerate_full_archive_feeds(self):
+        # Given a site with an archived feed with one full archive …
+        for i in range(1, 4):
+            self.add_post(f"2024-05-{i:02d}-hello", f"title: Hello {i}\n\nHello!")
+        gen = Gen(self.tpl_dir, archived_feeds=True)
+        gen.page_size = 2
+        changes = gen.render_pages(self.loader, self.pub_dir)
+        self.assertIn("feed-archive-1.atom", changes.added)
+
+        # When enough posts are added to fill another archive, and then another …
+        for last in [5, 7]:
+            for i in range(last - 1, last + 1):
+                self.add_post(f"2024-05-{i:02d}-hello", f"title: Hello {i}\n\nHello!")
+            gen = Gen(self.tpl_dir, archived_feeds=True)
+            gen.page_size = 2
+            with patch.object(gen, "render_job", wraps=gen.render_job) as render_job:
+                changes = gen.render_pages(
+                    Loader([self.posts_dir, self.pages_dir]), self.pub_dir
+                )
+
+        # Then only the newest full archive is generated again, to link to the new one.
+        jobs = [c.args[0] for c in render_job.call_args_list]
+        self.assertNotIn(("archive", 1), jobs)
+        self.assertIn(("archive", 2), jobs)
+        self.assertIn(("archive", 3), jobs)
+        self.assertEqual(changes.added[-1:], ["feed-archive-3.atom"])
+        self.assertIn("feed-archive-2.atom", changes.changed)
+        self.assertIn("feed.atom", changes.changed)
+        self.assertIn(
+            '<link rel="prev-archive" href="feed-archive-3.atom"/>',
+            (self.pub_dir / "feed.atom").read_text(),
+        )
+
+    def test_archive_links_are_to_files_that_exist(self):
+        for i in range(1, 8):
+            self.add_post(f"2024-05-{i:02d}-hello", f"title: Hello {i}\n\nHello!")
+        gen = Gen(self.tpl_dir, archived_feeds=True)
+        gen.page_size = 2
+        gen.render_pages(self.loader, self.pub_dir)
+
+        hrefs = set()
+        for feed_file in self.pub_dir.glob("*.atom"):
+            root = ElementTree.parse(feed_file).getroot()
+            for link in root.iterfind("atom:link", NAMESPACES):
+                if link.get("rel") in ("prev-archive", "next-archive", "current"):
+                    hrefs.add(link.get("href"))
+
+        self.assertIn("feed-archive-3.atom", hrefs)
+        for href in hrefs:
+            self.assertTrue((self.pub_dir / href).is_file(), href)
+
+    def test_renders_same_bytes_in_parallel(self):
+        # Given a site with enough posts for several tags and feed pages …
+        for i in range(1, 31):
+            tags = "".join(
+                f"- {t}\n" for t in ["Odd" if i % 2 else "Even", f"M{i % 3}"]
+            )
+            self.add_post(
+                f"2024-05-{i:02d}-post",
+                f"title: Post {i}\ntags:\n{tags}\nHello, *{i}*.",
+            )
+        self.add_page("about", "title: About\n\nAbout *this*.")
+        self.add_page("index", "title: Welcome\n\nWelcome!")
+        tpl_dir = Path(__file__).parent.parent / "templates"
+
+        # When it is rendered serially and in parallel …
+        serial_dir = self.dir_path / "serial"
+        Gen(tpl_dir).render_pages(Loader([self.posts_dir, self.pages_dir]), serial_dir)
+        serial_files = sorted(p.relative_to(serial_dir) for p in serial_dir.rglob("*"))
+        self.assertIn(Path("tagged/even+m1.html"), serial_files)
+        self.assertIn(Path("feed-3.atom"), serial_files)
+        for lazy in [False, True]:
+            with self.subTest(lazy=lazy):
+                parallel_dir = self.dir_path / f"parallel-{lazy}"
+                Gen(tpl_dir, jobs=2).render_pages(
+                    Loader([self.posts_dir, self.pages_dir], lazy=lazy), parallel_dir
+                )
+
+                # Then the files are identical.
+                self.assertEqual(
+                    sorted(
+                        p.relative_to(parallel_dir) for p in parallel_dir.rglob("*")
+                    ),
+                    serial_files,
+                )
+                for file in serial_files:
+                    if (serial_dir / file).is_file():
+                        self.assertEqual(
+                            (parallel_dir / file).read_bytes(),
+                            (serial_dir / file).read_bytes(),
+                            file,
+                        )
+
     def add_post(self, name: str, text: str):
         (self.posts_dir / f"{name}.md").write_text(text)
 
@@ -1,8 +1,24 @@
+import os
+import pickle
 import unittest
 from datetime import datetime, timezone
 from pathlib import Path
-
-from mismiy.loader import Loader, Person, Source
+from unittest.mock import patch
+
+from strictyaml import YAMLError
+from strictyaml import load as yaml_load
+
+from mismiy import loader
+from mismiy.loader import (
+    LazyPage,
+    Loader,
+    ParseCache,
+    Person,
+    Source,
+    parse_text,
+    post_schema,
+    quick_meta,
+)
 
 from .mixins import TempDirMixin
 
@@ -140,6 +156,110 @@ class TestSource(TempDirMixin, unittest.TestCase):
             Person("Alice de Winter", "https://dewinter.example/alice"),
         )
 
+    def test_finds_pages_in_subdirectories(self):
+        (self.dir_path / "2024" / "05").mkdir(parents=True)
+        (self.dir_path / "2024" / "05" / "05-hello.md").write_text(
+            "title: Hello\n\nHello, world."
+        )
+        (self.dir_path / "about.markdown").write_text("title: About\n\nAbout.")
+        (self.dir_path / "notes.txt").write_text("title: Notes\n\nNot a page.")
+
+        result = Source(self.dir_path, include_drafts=True).pages()
+
+        self.assertEqual([p.name for p in result], ["2024/05/05-hello", "about"])
+
+    def test_skips_hidden_and_excluded_directories(self):
+        for dir_name in ".git", "_drafts", "kept":
+            (self.dir_path / dir_name).mkdir()
+            (self.dir_path / dir_name / "hello.md").write_text(
+                "title: Hello\n\nHello, world."
+            )
+
+        result = Source(self.dir_path, exclude={"_drafts"}).pages()
+
+        self.assertEqual([p.name for p in result], ["kept/hello"])
+
+    def test_can_choose_suffixes(self):
+        (self.dir_path / "hello.md").write_text("title: Hello\n\nHello.")
+        (self.dir_path / "notes.txt").write_text("title: Notes\n\nNotes.")
+
+        result = Source(self.dir_path, suffixes={".txt"}).pages()
+
+        self.assertEqual([p.name for p in result], ["notes"])
+
+    def test_missing_directory_has_no_pages(self):
+        source = Source(self.dir_path / "nonexistent")
+
+        self.assertEqual(source.pages(), [])
+
+    # Lazy loading:
+
+    def test_lazy_pages_have_same_meta_and_body(self):
+        (self.dir_path / "2024-05-25-greet.md").write_text(
+            "title: Greeting\n"
+            "author:\n"
+            "  name: Alice de Winter\n"
+            "\n"
+            "\n"
+            "  Hello, *world*.\n\nGoodbye.\n"
+        )
+        (self.dir_path / "2024-05-26-crlf.md").write_text(
+            "title: Windows\r\n\r\nHello,\r\nworld.\r\n"
+        )
+
+        eager = Source(self.dir_path).pages()
+        lazy = Source(self.dir_path, lazy=True).pages()
+
+        self.assertIsInstance(lazy[0], LazyPage)
+        self.assertEqual(
+            [(p.name, p.meta, p.body) for p in lazy],
+            [(p.name, p.meta, p.body) for p in eager],
+        )
+        self.assertEqual(lazy[0].body, "  Hello, *world*.\n\nGoodbye.\n")
+
+    def test_lazy_pages_read_body_when_needed(self):
+        page_file = self.dir_path / "2024-05-25-greet.md"
+        page_file.write_text("title: Greeting\n\nHello, world.")
+        (page,) = Source(self.dir_path, lazy=True).pages()
+
+        # The body has not been read yet …
+        page_file.write_text("title: Greeting\n\nHello, sailor.")
+
+        self.assertEqual(page.body, "Hello, sailor.")
+        self.assertEqual(page.body_html(), "<p>Hello, sailor.</p>\n")
+
+    def test_lazy_pages_can_drop_body(self):
+        page_file = self.dir_path / "2024-05-25-greet.md"
+        page_file.write_text("title: Greeting\n\nHello, world.")
+        (page,) = Source(self.dir_path, lazy=True).pages()
+        self.assertEqual(page.body, "Hello, world.")
+
+        page.drop_body()
+        page_file.write_text("title: Greeting\n\nHello, sailor.")
+
+        self.assertEqual(page.body, "Hello, sailor.")
+
+    def test_lazy_page_with_only_metadata(self):
+        (self.dir_path / "2024-05-25-greet.md").write_text("title: Greeting\n\n")
+
+        (page,) = Source(self.dir_path, lazy=True).pages()
+
+        self.assertEqual(page.meta["title"], "Greeting")
+        self.assertEqual(page.body, "")
+
+    def test_lazy_pages_can_be_pickled(self):
+        page_file = self.dir_path / "2024-05-25-greet.md"
+        page_file.write_text("title: Greeting\n\nHello, world.")
+        (page,) = Source(self.dir_path, lazy=True).pages()
+
+        copy = pickle.loads(pickle.dumps(page))
+
+        # The copy still reads its body when needed.
+        self.assertIsInstance(copy, LazyPage)
+        self.assertIsNone(copy._body)
+        self.assertEqual((copy.name, copy.meta), (page.name, page.meta))
+        self.assertEqual(copy.body, "Hello, world.")
+
     # Kinds of source (page or post):
 
     def test_random_directory_is_page(self):
@@ -246,6 +366,312 @@ class TestSource(TempDirMixin, unittest.TestCase):
         )
 
 
+class TestParseCache(TempDirMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.posts_dir = self.dir_path / "posts"
+        self.posts_dir.mkdir()
+        self.cache_path = self.dir_path / "cache" / "pages.pickle"
+
+    def test_reuses_parsed_pages_from_previous_run(self):
+        # Given a post loaded once with the cache …
+        (self.posts_dir / "2024-05-05-hello.md").write_text(
+            "title: Hello\nauthor: Alice\n\nHello, world."
+        )
+        first = Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        # When it is loaded again in a later run …
+        with patch.object(loader, "yaml_load", wraps=loader.yaml_load) as yaml_load:
+            second = Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        # Then the metadata was not parsed again.
+        yaml_load.assert_not_called()
+        self.assertEqual(second, first)
+        self.assertEqual(second[0].meta["author"], Person("Alice"))
+
+    def test_rereads_changed_files(self):
+        page_file = self.posts_dir / "2024-05-05-hello.md"
+        page_file.write_text("title: Hello\n\nHello, world.")
+        Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        page_file.write_text("title: Goodbye\n\nGoodbye, cruel world.")
+        (page,) = Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        self.assertEqual(page.meta["title"], "Goodbye")
+        self.assertEqual(page.body, "Goodbye, cruel world.")
+
+    def test_does_not_reparse_touched_file_with_same_content(self):
+        page_file = self.posts_dir / "2024-05-05-hello.md"
+        page_file.write_text("title: Hello\n\nHello, world.")
+        Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+        st = page_file.stat()
+        os.utime(page_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        with patch.object(loader, "yaml_load", wraps=loader.yaml_load) as yaml_load:
+            (page,) = Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        yaml_load.assert_not_called()
+        self.assertEqual(page.meta["title"], "Hello")
+
+    def test_lazy_loading_uses_cached_meta(self):
+        (self.posts_dir / "2024-05-05-hello.md").write_text(
+            "title: Hello\n\nHello, world."
+        )
+        Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        with patch.object(loader, "yaml_load", wraps=loader.yaml_load) as yaml_load:
+            (page,) = Source(
+                self.posts_dir, cache=ParseCache(self.cache_path), lazy=True
+            ).pages()
+
+        yaml_load.assert_not_called()
+        self.assertEqual(page.body, "Hello, world.")
+
+    def test_discards_cache_when_schema_changes(self):
+        (self.posts_dir / "2024-05-05-hello.md").write_text(
+            "title: Hello\n\nHello, world."
+        )
+        Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        cache = ParseCache(self.cache_path)
+        cache.fingerprint += " changed"
+        with patch.object(loader, "parse_meta", wraps=loader.parse_meta) as parse_meta:
+            Source(self.posts_dir, cache=cache).pages()
+
+        parse_meta.assert_called_once()
+
+    def test_forgets_deleted_files(self):
+        # Given two posts were loaded with the cache, along with another source …
+        pages_dir = self.dir_path / "pages"
+        pages_dir.mkdir()
+        (pages_dir / "about.md").write_text("title: About\n\nHello")
+        for name in ["2024-05-05-hello", "2024-05-06-goodbye"]:
+            (self.posts_dir / f"{name}.md").write_text(f"title: {name}\n\nHello")
+        Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+        Source(pages_dir, cache=ParseCache(self.cache_path)).pages()
+
+        # When one is deleted and the posts are loaded again …
+        (self.posts_dir / "2024-05-06-goodbye.md").unlink()
+        Source(self.posts_dir, cache=ParseCache(self.cache_path)).pages()
+
+        # Then its entry is dropped from the cache but the others are kept.
+        self.assertEqual(
+            sorted(Path(k).name for k in ParseCache(self.cache_path).entries),
+            ["2024-05-05-hello.md", "about.md"],
+        )
+
+    def test_forgets_invalidated_deleted_file(self):
+        page_file = self.posts_dir / "2024-05-05-hello.md"
+        page_file.write_text("title: Hello\n\nHello, world.")
+        source = Source(self.posts_dir, cache=ParseCache(self.cache_path))
+        source.pages()
+
+        page_file.unlink()
+        source.invalidate(page_file)
+        source.cache.save()
+
+        self.assertEqual(ParseCache(self.cache_path).entries, {})
+
+
+class TestInvalidate(TempDirMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.posts_dir = self.dir_path / "posts"
+        self.posts_dir.mkdir()
+        for day in [2, 4, 6]:
+            (self.posts_dir / f"2024-06-{day:02d}-jam.md").write_text(
+                f"title: Jam {day}\n\nHello"
+            )
+        now = datetime(2024, 6, 10, tzinfo=timezone.utc)
+        self.source = Source(self.posts_dir, now=now)
+        self.pages = self.source.pages()
+
+    def test_rereads_only_modified_file(self):
+        # Given one of the files is changed …
+        page_file = self.posts_dir / "2024-06-04-jam.md"
+        page_file.write_text("title: Marmalade\n\nHello")
+
+        # When it is invalidated …
+        with patch.object(loader, "read_page_file", wraps=loader.read_page_file) as rd:
+            self.source.invalidate(page_file)
+
+        # Then only it was read again, and the other pages are unchanged.
+        rd.assert_called_once_with(page_file.absolute())
+        result = self.source.pages()
+        self.assertIs(result, self.pages)
+        self.assertEqual(
+            [p.meta["title"] for p in result], ["Jam 2", "Marmalade", "Jam 6"]
+        )
+
+    def test_inserts_created_file_in_order(self):
+        page_file = self.posts_dir / "2024-06-03-jam.md"
+        page_file.write_text("title: Jam 3\n\nHello")
+
+        self.source.invalidate(page_file)
+
+        self.assertEqual(
+            [p.meta["title"] for p in self.source.pages()],
+            ["Jam 2", "Jam 3", "Jam 4", "Jam 6"],
+        )
+
+    def test_removes_deleted_file(self):
+        page_file = self.posts_dir / "2024-06-04-jam.md"
+        page_file.unlink()
+
+        self.source.invalidate(page_file)
+
+        self.assertEqual(
+            [p.meta["title"] for p in self.source.pages()], ["Jam 2", "Jam 6"]
+        )
+
+    def test_reevaluates_drafts(self):
+        # Given a post that becomes a draft, and then is published again …
+        page_file = self.posts_dir / "2024-06-04-jam.md"
+        page_file.write_text("title: Jam 4\npublished: 2024-07-01\n\nHello")
+        self.source.invalidate(page_file)
+        self.assertEqual(len(self.source.pages()), 2)
+
+        page_file.write_text("title: Jam 4\npublished: 2024-06-05\n\nHello")
+        self.source.invalidate(page_file)
+
+        # Then it is back in its place in the list.
+        self.assertEqual(
+            [p.meta["title"] for p in self.source.pages()], ["Jam 2", "Jam 4", "Jam 6"]
+        )
+
+    def test_ignores_files_outside_source(self):
+        other_file = self.dir_path / "2024-06-05-jam.md"
+        other_file.write_text("title: Jam 5\n\nHello")
+
+        result = self.source.invalidate(other_file)
+
+        self.assertFalse(result)
+        self.assertEqual(len(self.source.pages()), 3)
+
+    def test_reloads_everything_when_meta_changes(self):
+        (self.posts_dir / "META.yaml").write_text("title: Jam Today\n")
+
+        self.source.invalidate(self.posts_dir / "META.yaml")
+
+        self.assertEqual(self.source.title, "Jam Today")
+        self.assertEqual(len(self.source.pages()), 3)
+        self.assertIsNot(self.source.pages(), self.pages)
+
+    def test_loader_passes_paths_to_their_sources(self):
+        # Given a loader with 2 sources …
+        docs_dir = self.dir_path / "docs"
+        docs_dir.mkdir()
+        (docs_dir / "about.md").write_text("title: About\n\nHello")
+        subject = Loader([self.posts_dir, docs_dir])
+        subject.pages()
+
+        # When one file in each is changed …
+        (docs_dir / "about.md").write_text("title: About us\n\nHello")
+        (self.posts_dir / "2024-06-06-jam.md").unlink()
+        subject.invalidate(
+            [docs_dir / "about.md", str(self.posts_dir / "2024-06-06-jam.md")]
+        )
+
+        # Then both are updated.
+        self.assertEqual(
+            [p.meta["title"] for p in subject.pages()],
+            ["Jam 2", "Jam 4", "About us"],
+        )
+
+    def test_loader_saves_cache_once_per_batch(self):
+        # Given a loader with a cache …
+        cache = ParseCache(self.dir_path / "cache" / "pages.pickle")
+        subject = Loader([self.posts_dir], cache=cache)
+        subject.pages()
+
+        # When several files are changed together …
+        paths = [self.posts_dir / f"2024-06-{day:02d}-jam.md" for day in [2, 4]]
+        for path in paths:
+            path.write_text(f"title: {path.stem}\n\nChanged")
+        with patch.object(cache, "save", wraps=cache.save) as save:
+            subject.invalidate(paths)
+
+        # Then the cache is written once, with both changes.
+        save.assert_called_once()
+        entries = ParseCache(cache.path).entries
+        self.assertEqual(entries[str(paths[1].absolute())][3], "Changed")
+
+
+class TestQuickMeta(unittest.TestCase):
+    """The quick parser must agree with StrictYAML whenever it returns a result."""
+
+    corpus = [
+        "title: Hello",
+        "title: Hello, world!\nauthor: Alice de Winter",
+        "title:   Spaced out   \nid: tag:alleged.org.uk,2024:mismiy:1",
+        "title: Dated\npublished: 2024-05-19",
+        "title: Timed\npublished: 2024-05-19 10:00\nupdated: 2024-05-20T10:00:00+01:00",
+        "title: Zulu\nupdated: 2024-05-19T10:00:00Z",
+        "title: Tagged\ntags:\n- greeting\n- Big Data",
+        "title: Tagged\ntags:\n    - anime\n    - review",
+        "title: 12\nauthor: yes\nid: null",
+        "title: a#b, c] d'",
+        # The following are handled by StrictYAML instead.
+        "title: 'Quoted'",
+        'title: "Quoted"',
+        "title: Hello # comment",
+        "# Comment\ntitle: Hello",
+        "title: Hello\n  continued",
+        "title: -minus",
+        "title: Hello: world",
+        "title: @at",
+        "title: &anchor",
+        "title:",
+        "title: Hello\ntitle: Again",
+        "title: Flow\ntags: [a, b]",
+        "title: Tagged\ntags:\n- a\n- a",
+        "title: Tagged\ntags:\n- a\n  - b",
+        "title: Tagged\ntags:\n- a: b",
+        "title: Tagged\ntags:",
+        "title: Tagged\ntags: a",
+        "title: Nested\nauthor:\n  name: Alice\n  uri: https://dewinter.example/",
+        "title: Undated\npublished: tomorrow",
+        "title: Unknown\nkind: post",
+        "author: Anonymous",
+    ]
+
+    def test_agrees_with_strictyaml(self):
+        for head in self.corpus + self.posts_heads():
+            with self.subTest(head=head):
+                if (result := quick_meta(head)) is None:
+                    continue
+                self.assertEqual(result, yaml_load(head, post_schema).data)
+                self.assertEqual(list(result), list(yaml_load(head, post_schema).data))
+
+    def test_declines_what_strictyaml_rejects(self):
+        for head in self.corpus:
+            with self.subTest(head=head):
+                try:
+                    yaml_load(head, post_schema)
+                except (YAMLError, TypeError, ValueError):
+                    self.assertIsNone(quick_meta(head))
+
+    def test_handles_build_log_posts(self):
+        for head in self.posts_heads():
+            with self.subTest(head=head):
+                self.assertIsNotNone(quick_meta(head))
+
+    def posts_heads(self) -> list[str]:
+        posts_dir = Path(__file__).parent.parent / "posts"
+        return [
+            file.read_text(encoding="UTF-8").split("\n\n", 1)[0]
+            for file in sorted(posts_dir.glob("*.md"))
+        ]
+
+    def test_parse_text_falls_back_to_strictyaml(self):
+        meta, body = parse_text(
+            "title: Nested\nauthor:\n  name: Alice\n\nHello, world."
+        )
+
+        self.assertEqual(meta, {"title": "Nested", "author": {"name": "Alice"}})
+        self.assertEqual(body, "Hello, world.")
+
+
 class TestLoader(TempDirMixin, unittest.TestCase):
     """Loader wraps oneor mor sources."""
 
@@ -305,3 +731,32 @@ class TestLoader(TempDirMixin, unittest.TestCase):
             [x.meta["title"] for x in loader.posts()],
             ["Marzipan"],
         )
+
+    def test_loads_in_parallel_with_same_results(self):
+        # Given 2 directories with pages, some of them drafts …
+        dir_1 = self.dir_path / "posts"
+        dir_1.mkdir()
+        dir_2 = self.dir_path / "docs"
+        dir_2.mkdir()
+        for i in range(20, 0, -1):
+            (dir_1 / f"2024-06-{i:02d}-jam.md").write_text(f"title: Jam {i}\n\nHello")
+        (dir_1 / "undated.md").write_text("title: Undated\n\nHello")
+        (dir_2 / "about.md").write_text("title: About\n\nHello")
+        now = datetime(2024, 6, 10, tzinfo=timezone.utc)
+
+        # When we load them serially and with worker processes …
+        serial = Loader([dir_1, dir_2], now=now)
+        parallel = Loader([dir_1, dir_2], now=now, jobs=2)
+
+        # Then we get the same pages in the same order.
+        self.assertEqual(parallel.pages(), serial.pages())
+        self.assertEqual(
+            [p.meta["title"] for p in parallel.posts()],
+            [f"Jam {i}" for i in range(1, 11)],
+        )
+
+    def test_sends_files_to_workers_in_batches(self):
+        # A few batches per worker, but not too many files in each.
+        self.assertEqual(loader.batch_size(0, 2), 1)
+        self.assertEqual(loader.batch_size(21, 2), 3)
+        self.assertEqual(loader.batch_size(100_000, 4), 64)
@@ -0,0 +1,142 @@
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import mistletoe
+
+from mismiy import markdown
+from mismiy.loader import parse_text
+from mismiy.markdown import CmarkEngine, HtmlCache, MistletoeEngine
+
+from .mixins import TempDirMixin
+
+
+class TestHtmlCache(TempDirMixin, unittest.TestCase):
+    def test_converts_markdown_to_html(self):
+        cache = HtmlCache()
+
+        self.assertEqual(
+            cache.html("Hello, *world*!"), "<p>Hello, <em>world</em>!</p>\n"
+        )
+
+    def test_converts_each_body_once(self):
+        cache = HtmlCache()
+
+        with patch.object(
+            cache.engine, "html_many", wraps=cache.engine.html_many
+        ) as convert:
+            first = cache.html("Hello, *world*!")
+            second = cache.html("Hello, *world*!")
+            cache.html("Goodbye")
+
+        self.assertEqual(second, first)
+        self.assertEqual(convert.call_count, 2)
+
+    def test_converts_missing_bodies_in_one_batch(self):
+        cache = HtmlCache()
+        cache.html("Alpha")
+
+        with patch.object(
+            cache.engine, "html_many", wraps=cache.engine.html_many
+        ) as convert:
+            result = cache.html_many(["Alpha", "Bravo", "Charlie", "Bravo"])
+
+        convert.assert_called_once()
+        self.assertEqual(list(convert.call_args.args[0]), ["Bravo", "Charlie"])
+        self.assertEqual(
+            result,
+            ["<p>Alpha</p>\n", "<p>Bravo</p>\n", "<p>Charlie</p>\n", "<p>Bravo</p>\n"],
+        )
+
+    def test_discards_least_recently_used(self):
+        cache = HtmlCache(maxsize=2)
+        cache.html("Alpha")
+        cache.html("Bravo")
+        cache.html("Alpha")
+
+        cache.html("Charlie")
+
+        self.assertEqual(
+            list(cache.entries.values()),
+            ["<p>Alpha</p>\n", "<p>Charlie</p>\n"],
+        )
+
+    def test_can_save_and_reload(self):
+        cache_path = self.dir_path / "cache" / "html.pickle"
+        cache = HtmlCache(cache_path)
+        cache.html("Hello, *world*!")
+        cache.save()
+
+        cache = HtmlCache()
+        cache.load(cache_path)
+        with patch.object(cache.engine, "html_many") as convert:
+            result = cache.html("Hello, *world*!")
+
+        convert.assert_not_called()
+        self.assertEqual(result, "<p>Hello, <em>world</em>!</p>\n")
+
+    def test_ignores_saved_cache_from_other_version(self):
+        cache_path = self.dir_path / "html.pickle"
+        cache = HtmlCache(cache_path)
+        cache.html("Hello, *world*!")
+        cache.save()
+
+        cache = HtmlCache()
+        cache.fingerprint += " changed"
+        cache.load(cache_path)
+
+        self.assertFalse(cache.entries)
+
+
+def corpus() -> list[str]:
+    """Bodies of the posts and pages of the Mismiy build log."""
+    root = Path(__file__).parent.parent
+    files = sorted(root.glob("posts/*.md")) + sorted(root.glob("pages/*.markdown"))
+    return [parse_text(file.read_text(encoding="UTF-8"))[1] for file in files]
+
+
+class TestMistletoeEngine(unittest.TestCase):
+    def test_matches_mistletoe_on_corpus(self):
+        engine = MistletoeEngine()
+
+        for body in corpus():
+            with self.subTest(body=body[:40]):
+                self.assertEqual(engine.html(body), mistletoe.markdown(body))
+
+    def test_batch_matches_mistletoe_on_corpus(self):
+        bodies = corpus()
+
+        result = MistletoeEngine().html_many(bodies)
+
+        self.assertEqual(result, [mistletoe.markdown(body) for body in bodies])
+
+    def test_link_definitions_do_not_leak_between_documents(self):
+        engine = MistletoeEngine()
+
+        first, second = engine.html_many(["[x]\n\n[x]: /first", "[x]"])
+
+        self.assertEqual(first, '<p><a href="/first">x</a></p>\n')
+        self.assertEqual(second, "<p>[x]</p>\n")
+
+    def test_still_handles_html_after_another_renderer_finishes(self):
+        engine = MistletoeEngine()
+        engine.html("Warm up")
+
+        # Creating and finishing another renderer resets mistletoe’s token types.
+        mistletoe.markdown("Interloper")
+
+        self.assertEqual(engine.html("<div>\nhi\n</div>"), "<div>\nhi\n</div>\n")
+
+
+@unittest.skipIf(markdown.cmark is None, "cmarkgfm not installed")
+class TestCmarkEngine(unittest.TestCase):
+    def test_matches_mistletoe_on_corpus(self):
+        engine = CmarkEngine()
+
+        for body in corpus():
+            with self.subTest(body=body[:40]):
+                # The only difference is cmark escapes quotes in text.
+                self.assertEqual(
+                    engine.html(body).replace("&quot;", '"'),
+                    mistletoe.markdown(body).replace("&quot;", '"'),
+                )
@@ -1,7 +1,8 @@
 import unittest
 
+from mismiy import tagging
 from mismiy.loader import Page
-from mismiy.tagging import Tagging, TagInfo
+from mismiy.tagging import BitsetTagging, Tagging, TagInfo
 
 
 class TestTagging(unittest.TestCase):
@@ -109,6 +110,25 @@ class TestTagging(unittest.TestCase):
             [],
         )
 
+    def test_links_combinations_to_those_with_one_more_tag(self):
+        sut = Tagging()
+        sut.add(self.page_with_tags("Alpha", ["Papa", "Quebec"]))
+        sut.add(self.page_with_tags("Bravo", ["Quebec", "Romeo", "Papa"]))
+
+        self.assertCountEqual(
+            sut.children(frozenset(["quebec"])),
+            [frozenset(["papa", "quebec"]), frozenset(["quebec", "romeo"])],
+        )
+        self.assertEqual(
+            sut.children(frozenset(["papa", "quebec"])),
+            [frozenset(["papa", "quebec", "romeo"])],
+        )
+        self.assertEqual(sut.children(frozenset(["papa", "quebec", "romeo"])), [])
+        self.assertCountEqual(
+            sut.parents(frozenset(["papa", "quebec"])),
+            [frozenset(["papa"]), frozenset(["quebec"])],
+        )
+
     def test_can_list_widenings_of_tags(self):
         # Given some pages have been indexed.
         sut = Tagging()
@@ -137,6 +157,238 @@ class TestTagging(unittest.TestCase):
             ],
         )
 
+    def test_can_limit_size_of_indexed_combinations(self):
+        sut = Tagging(max_combination_size=2)
+        tags = [f"Tag {i}" for i in range(16)]
+        page1 = self.page_with_tags("Everything", tags)
+        page2 = self.page_with_tags("Some", tags[:3])
+        sut.add(page1)
+        sut.add(page2)
+
+        # Then only combinations of one or two tags are indexed.
+        self.assertEqual(len(sut.pages_by_tags), 16 + 16 * 15 // 2)
+        # But larger combinations can still be looked up.
+        self.assertEqual(sut.pages_for_terms(tags[:3]), [page1, page2])
+        self.assertEqual(sut.pages_for_terms(tags[:4]), [page1])
+        self.assertIsNone(sut.pages_for_terms(["Tag 1", "Tag 2", "Nonesuch"]))
+
+    def test_can_index_single_tags_only(self):
+        sut = Tagging(max_combination_size=1)
+        page = self.page_with_tags("Alpha", ["Papa", "Quebec"])
+        sut.add(page)
+
+        self.assertCountEqual(
+            [tags for tags, _ in sut.combinations()],
+            [frozenset(["papa"]), frozenset(["quebec"])],
+        )
+        self.assertEqual(sut.pages_for_terms(["Papa", "Quebec"]), [page])
+
+    def test_rejects_max_combination_size_below_1(self):
+        with self.assertRaises(ValueError):
+            Tagging(max_combination_size=0)
+
+    def test_only_combinations_with_enough_pages_get_pages(self):
+        sut = Tagging(min_pages=2)
+        sut.add(self.page_with_tags("Alpha", ["Papa", "Quebec"]))
+        sut.add(self.page_with_tags("Bravo", ["Papa", "Quebec", "Romeo"]))
+        sut.add(self.page_with_tags("Charley", ["Papa"]))
+
+        self.assertCountEqual(
+            [tags for tags, _ in sut.combinations()],
+            [
+                frozenset(["papa"]),
+                frozenset(["quebec"]),
+                frozenset(["romeo"]),
+                frozenset(["papa", "quebec"]),
+            ],
+        )
+        self.assertFalse(sut.has_tag_page(frozenset(["papa", "romeo"])))
+        # Combinations with too few pages are not indexed, but can be looked up.
+        self.assertNotIn(frozenset(["papa", "romeo"]), sut.pages_by_tags)
+        self.assertEqual(sut.count(frozenset(["papa", "romeo"])), 1)
+        # Narrowings link only to combinations that get pages.
+        self.assertEqual(
+            sut.narrowing_tags(["papa"]),
+            [TagInfo("Quebec", "tagged/papa+quebec.html", 2)],
+        )
+        self.assertEqual(sut.narrowing_tags(["papa", "quebec"]), [])
+
+    def test_indexes_combinations_once_they_have_enough_pages(self):
+        # Given combinations that do not yet have enough pages …
+        sut = Tagging(min_pages=2)
+        page1 = self.page_with_tags("Alpha", ["Papa", "Quebec", "Romeo"])
+        page2 = self.page_with_tags("Bravo", ["Papa", "Sierra"])
+        page3 = self.page_with_tags("Charlie", ["Papa", "Romeo"])
+        sut.add(page1)
+        sut.add(page2)
+        sut.add(page3)
+        self.assertEqual(
+            set(sut.pages_by_tags) - {frozenset([t]) for t in sut.tag_labels},
+            {frozenset(["papa", "romeo"])},
+        )
+
+        # When more pages are added …
+        page4 = self.page_with_tags("Delta", ["Sierra", "Papa", "Quebec"])
+        sut.add(page4)
+
+        # Then they are indexed with all their pages, and narrowings are
+        # in the order of their first pages, as if they had been indexed then.
+        self.assertEqual(sut.pages_for_terms(["papa", "quebec"]), [page1, page4])
+        self.assertEqual(
+            [info.label for info in sut.narrowing_tags(["papa"])],
+            ["Quebec", "Romeo", "Sierra"],
+        )
+
+        # And when pages are removed, they are no longer indexed.
+        sut.remove(page1)
+
+        self.assertNotIn(frozenset(["papa", "quebec"]), sut.pages_by_tags)
+        self.assertNotIn(frozenset(["papa", "quebec"]), sut.narrower)
+        self.assertEqual(
+            [info.label for info in sut.narrowing_tags(["papa"])], ["Sierra"]
+        )
+
+    def test_indexes_page_once_when_terms_give_same_tag(self):
+        sut = Tagging()
+        page = self.page_with_tags("Alpha", ["Papa", "PAPA"])
+        sut.add(page)
+
+        self.assertEqual(sut.pages_for_terms(["papa"]), [page])
+
+        sut.remove(page)
+
+        self.assertEqual(sut.pages_by_tags, {})
+
+    def test_can_collapse_combinations_with_the_same_pages(self):
+        # Given every page tagged Python is also tagged Mismiy …
+        sut = Tagging(collapse_equivalent=True)
+        sut.add(self.page_with_tags("Alpha", ["Mismiy", "Python"]))
+        sut.add(self.page_with_tags("Bravo", ["Mismiy", "Python", "Quebec"]))
+        sut.add(self.page_with_tags("Charley", ["Mismiy"]))
+
+        # Then their combination stands for Python.
+        mismiy_python = frozenset(["mismiy", "python"])
+        self.assertEqual(sut.canonical_tags(frozenset(["python"])), mismiy_python)
+        self.assertEqual(sut.canonical_tags(mismiy_python), mismiy_python)
+        self.assertEqual(
+            sut.canonical_tags(frozenset(["mismiy"])), frozenset(["mismiy"])
+        )
+        # And links go to its page.
+        self.assertEqual(sut.tag_info("Python").href, "tagged/mismiy+python.html")
+        self.assertEqual(
+            sut.narrowing_tags(["mismiy"]),
+            [
+                TagInfo("Python", "tagged/mismiy+python.html", 2),
+                TagInfo("Quebec", "tagged/mismiy+python+quebec.html", 1),
+            ],
+        )
+
+        # But not once a page is tagged Python alone.
+        sut.add(self.page_with_tags("Delta", ["Python"]))
+
+        self.assertEqual(sut.tag_info("Python").href, "tagged/python.html")
+
+    def test_works_out_tag_infos_again_after_adding_pages(self):
+        sut = Tagging()
+        sut.add(self.page_with_tags("Alpha", ["Papa", "Quebec"]))
+        # Infos are new each time, so marking one as first affects no other.
+        info = sut.tag_info("papa")
+        info.first = True
+        self.assertEqual(sut.tag_info("Papa"), TagInfo("Papa", "tagged/papa.html", 1))
+        self.assertFalse(sut.tag_info("Papa").first)
+        self.assertEqual(
+            sut.combination_label(frozenset(["papa", "quebec"])), "Papa + Quebec"
+        )
+
+        sut.add(self.page_with_tags("Bravo", ["PAPA"]))
+
+        self.assertEqual(sut.tag_info("papa"), TagInfo("PAPA", "tagged/papa.html", 2))
+        self.assertEqual(
+            sut.combination_label(frozenset(["papa", "quebec"])), "PAPA + Quebec"
+        )
+
+    def test_can_remove_pages(self):
+        # Given some pages have been indexed.
+        sut = Tagging()
+        page1 = self.page_with_tags("Alpha", ["papa", "Quebec"])
+        page2 = self.page_with_tags("Bravo", ["Papa"])
+        sut.add(page1)
+        sut.add(page2)
+        self.assertEqual(sut.tag_info("papa").label, "Papa")
+
+        # When one is removed.
+        changed = sut.remove(page2)
+
+        # Then only its combinations changed, and the label is from the other.
+        self.assertEqual(changed, {frozenset(["papa"])})
+        self.assertEqual(sut.pages_for_terms(["papa"]), [page1])
+        self.assertEqual(sut.tag_info("papa"), TagInfo("papa", "tagged/papa.html", 1))
+
+        # When the other is removed, its combinations are gone.
+        changed = sut.remove(page1)
+
+        self.assertEqual(
+            changed,
+            {frozenset(["papa"]), frozenset(["quebec"]), frozenset(["papa", "quebec"])},
+        )
+        self.assertEqual(dict(sut.combinations()), {})
+        self.assertEqual(sut.children(frozenset(["quebec"])), [])
+        self.assertEqual(sut.tag_labels, {})
+
+    def test_can_update_pages(self):
+        sut = Tagging()
+        page1 = self.page_with_tags("Alpha", ["Papa", "Quebec"])
+        page2 = self.page_with_tags("Bravo", ["Quebec"])
+        sut.add(page1)
+        sut.add(page2)
+
+        new_page1 = self.page_with_tags("Alpha", ["Quebec", "Romeo"])
+        changed = sut.update(page1, new_page1)
+
+        self.assertEqual(
+            changed,
+            {
+                frozenset(["papa"]),
+                frozenset(["quebec"]),
+                frozenset(["romeo"]),
+                frozenset(["papa", "quebec"]),
+                frozenset(["quebec", "romeo"]),
+            },
+        )
+        self.assertIsNone(sut.pages_for_terms(["papa"]))
+        self.assertEqual(sut.pages_for_terms(["quebec"]), [page2, new_page1])
+        self.assertEqual(
+            sut.narrowing_tags(["quebec"]),
+            [TagInfo("Romeo", "tagged/quebec+romeo.html", 1)],
+        )
+
+    def test_keeps_pages_in_order_when_updating(self):
+        # Given an index that keeps pages in the order they were loaded.
+        pages = [
+            self.page_with_tags("Alpha", ["Papa"]),
+            self.page_with_tags("Bravo", ["Quebec"]),
+            self.page_with_tags("Charlie", ["Papa", "Quebec"]),
+        ]
+        sut = Tagging(page_order={page.name: i for i, page in enumerate(pages)})
+        for page in pages:
+            sut.add(page)
+
+        # When the middle page gains a tag.
+        new_page = Page(
+            pages[1].name, {"title": "Bravo", "tags": ["Quebec", "Papa"]}, ""
+        )
+        sut.update(pages[1], new_page)
+        pages[1] = new_page
+
+        # Then it is as if the pages had been indexed afresh.
+        expected = Tagging()
+        for page in pages:
+            expected.add(page)
+        self.assertEqual(dict(sut.combinations()), dict(expected.combinations()))
+        self.assertEqual(sut.pages_for_terms(["papa"]), pages)
+        for tags, _ in expected.combinations():
+            self.assertEqual(sut.children(tags), expected.children(tags))
+
     def page_with_tags(self, title: str, tags: list[str]) -> Page:
         self.page_count += 1
         return Page(
@@ -144,3 +396,115 @@ class TestTagging(unittest.TestCase):
             {"title": title, "tags": tags},
             f"All about {title}!",
         )
+
+
+class TestBitsetTagging(unittest.TestCase):
+    use_numpy = False
+
+    def setUp(self):
+        super().setUp()
+        self.pages = []
+        tags = ["Papa", "Quebec", "Romeo", "Sierra", "Tango"]
+        for i in range(40):
+            # Every page has a different set of tags, in a different order.
+            page_tags = [tag for j, tag in enumerate(tags) if i * 7 % (j + 3) < 2]
+            page_tags = page_tags[i % 3 :] + page_tags[: i % 3]
+            self.pages.append(
+                Page(f"2025-03-{i:02d}-{i}", {"title": str(i), "tags": page_tags}, "")
+            )
+        self.pages.append(Page("2025-04-01-untagged", {"title": "Untagged"}, ""))
+
+    def test_finds_same_pages_and_links_as_tagging(self):
+        for options in [
+            {},
+            {"max_combination_size": 1},
+            {"max_combination_size": 2},
+            {"min_pages": 3},
+            {"collapse_equivalent": True},
+        ]:
+            with self.subTest(**options):
+                expected = Tagging(**options)
+                sut = BitsetTagging(use_numpy=self.use_numpy, **options)
+                for page in self.pages:
+                    expected.add(page)
+                    sut.add(page)
+
+                combinations = dict(sut.combinations())
+                self.assertEqual(combinations, dict(expected.combinations()))
+                for tags, pages in combinations.items():
+                    self.assertEqual(sut.pages_for_tags(tags), pages)
+                    self.assertEqual(
+                        sut.narrowing_tags(tags), expected.narrowing_tags(tags)
+                    )
+                    self.assertEqual(
+                        sut.widening_tags(tags), expected.widening_tags(tags)
+                    )
+                for page in self.pages:
+                    self.assertEqual(sut.page_tags(page), expected.page_tags(page))
+
+    def test_keeps_one_bitset_per_tag(self):
+        sut = BitsetTagging(use_numpy=self.use_numpy)
+        for page in self.pages:
+            sut.add(page)
+
+        self.assertEqual(sut.pages_by_tags, {})
+        self.assertEqual(len(sut.ids_by_tag), 5)
+        self.assertEqual(
+            sut.pages_for_terms(["Papa", "Quebec", "Romeo", "Sierra", "Tango"]),
+            [p for p in self.pages if len(p.meta.get("tags", [])) == 5] or None,
+        )
+        self.assertIsNone(sut.pages_for_terms(["Papa", "Nonesuch"]))
+        self.assertEqual(sut.count(frozenset(["nonesuch"])), 0)
+
+    def test_indexes_pages_added_later(self):
+        sut = BitsetTagging(use_numpy=self.use_numpy)
+        sut.add(self.pages[0])
+        self.assertEqual(sut.pages_for_terms(["Papa"]), [self.pages[0]])
+
+        sut.add(self.pages[1])
+
+        self.assertEqual(sut.pages_for_terms(["Papa"]), self.pages[:2])
+
+    def test_finds_same_pages_and_links_after_changes(self):
+        for options in [{}, {"max_combination_size": 2}, {"min_pages": 3}]:
+            with self.subTest(**options):
+                page_order = {page.name: i for i, page in enumerate(self.pages)}
+                sut = BitsetTagging(
+                    page_order=page_order, use_numpy=self.use_numpy, **options
+                )
+                for page in self.pages:
+                    sut.add(page)
+                sut.count(frozenset())  # Builds the bitsets, so they are patched.
+
+                # Remove some pages, and change the tags of others.
+                pages = list(self.pages)
+                for i in range(0, len(pages), 5):
+                    sut.remove(pages[i])
+                for i in range(1, len(pages), 5):
+                    old_tags = pages[i].meta.get("tags", [])
+                    new_page = Page(
+                        pages[i].name,
+                        {"title": str(i), "tags": old_tags[1:] + ["Uniform"]},
+                        "",
+                    )
+                    sut.update(pages[i], new_page)
+                    pages[i] = new_page
+                del pages[::5]
+
+                expected = Tagging(**options)
+                for page in pages:
+                    expected.add(page)
+                combinations = dict(sut.combinations())
+                self.assertEqual(combinations, dict(expected.combinations()))
+                for tags in combinations:
+                    self.assertEqual(
+                        sut.narrowing_tags(tags), expected.narrowing_tags(tags)
+                    )
+                    self.assertEqual(
+                        sut.widening_tags(tags), expected.widening_tags(tags)
+                    )
+
+
+@unittest.skipUnless(tagging.numpy, "needs NumPy")
+class TestBitsetTaggingWithNumpy(TestBitsetTagging):
+    use_numpy = True
@@ -0,0 +1,43 @@
+import unittest
+from unittest.mock import patch
+
+from chevron import render
+
+from mismiy import templates
+from mismiy.templates import CompiledTemplates
+
+
+class TestCompiledTemplates(unittest.TestCase):
+    def test_renders_same_as_template_text(self):
+        texts = {
+            "page.html": "<h1>{{title}}</h1>\n  {{> footer.html}}\n{{#tags}}{{.}} {{/tags}}",
+            "footer.html": "<footer>\n{{{body}}}\n</footer>\n",
+        }
+        data = {"title": "A & B", "body": "<p>Hi</p>", "tags": ["x", "y"]}
+        subject = CompiledTemplates(texts)
+
+        result = render(subject["page.html"], data, partials_dict=subject)
+
+        self.assertEqual(result, render(texts["page.html"], data, partials_dict=texts))
+
+    def test_tokenizes_each_template_once(self):
+        subject = CompiledTemplates(
+            {"a.html": "{{> b.html}}{{> b.html}}", "b.html": "B"}
+        )
+
+        with patch.object(templates, "tokenize", wraps=templates.tokenize) as tokenize:
+            for _ in range(3):
+                render(subject["a.html"], {}, partials_dict=subject)
+
+        self.assertEqual(tokenize.call_count, 2)
+
+    def test_reloading_keeps_tokens_of_unchanged_templates(self):
+        subject = CompiledTemplates({"a.html": "A", "b.html": "B"})
+        a_tokens = subject["a.html"]
+        b_tokens = subject["b.html"]
+
+        subject.load({"a.html": "A", "b.html": "Bee"})
+
+        self.assertIs(subject["a.html"], a_tokens)
+        self.assertIsNot(subject["b.html"], b_tokens)
+        self.assertEqual(render(subject["b.html"]), "Bee")
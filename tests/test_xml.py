@@ -3,7 +3,7 @@
 import io
 import unittest
 
-from mismiy.xml import Doc, Elt
+from mismiy.xml import Doc, Elt, Raw, XmlWriter, escape_attr, escape_text
 
 
 class TestDoc(unittest.TestCase):
@@ -74,6 +74,34 @@ class TestDoc(unittest.TestCase):
             '<bar greet="Hello &amp; &lt;world&gt;!" xmlns="https://foo.example/blort"/>\n',
         )
 
+    def test_escapes_quotes_in_attribute_content(self):
+        doc = Doc(
+            "foo:bar",
+            {"title": 'Say "hello"'},
+            namespaces={"foo": "https://foo.example/blort"},
+        )
+        doc.element("foo:baz", 'Say "hello"')
+
+        self.assertEqual(
+            doc.to_string(),
+            '<bar title="Say &quot;hello&quot;" xmlns="https://foo.example/blort">\n'
+            '  <baz>Say "hello"</baz>\n'
+            "</bar>\n",
+        )
+
+    def test_can_write_compactly(self):
+        doc = Doc("foo:bar", namespaces={"foo": "https://foo.example/blort"})
+        baz = doc.element("foo:baz", {"quux": "1"})
+        baz.element("foo:quux", "Hello\nworld")
+        baz.element("foo:empty")
+
+        self.assertEqual(
+            doc.to_string(compact=True),
+            '<bar xmlns="https://foo.example/blort">'
+            '<baz quux="1"><quux>Hello\nworld</quux><empty/></baz>'
+            "</bar>",
+        )
+
     def test_can_create_doc_from_elt(self):
         elt = Elt("foo:bar", {"baz": "quux"})
         elt.element("foo:quux2", "Hello, <world>!")
@@ -86,3 +114,241 @@ class TestDoc(unittest.TestCase):
             "  <quux2>Hello, &lt;world&gt;!</quux2>\n"
             "</bar>\n",
         )
+
+    def test_writing_doc_twice_gives_same_result_and_does_not_change_it(self):
+        doc = Doc("foo:bar", {"baz": "quux"}, {"foo": "https://foo.example/blort"})
+        doc.element("atom:title", {"xml:lang": "en"}, "Hello")
+
+        first = doc.to_string()
+        second = doc.to_string()
+
+        self.assertEqual(second, first)
+        self.assertEqual(doc.attrs, {"baz": "quux"})
+
+    def test_declares_prefixes_of_elements_added_to_nested_elements(self):
+        doc = Doc(
+            "foo:bar",
+            namespaces={
+                "foo": "https://foo.example/blort",
+                "bar": "https://bar.example/zum",
+            },
+        )
+        nested = doc.element("foo:nest")
+        deeper = nested.element("foo:deeper")
+
+        deeper.element("foo:egg", {"bar:zum": "1"})
+
+        self.assertEqual(doc.prefixes, {"foo", "bar"})
+        self.assertIn('xmlns:bar="https://bar.example/zum"', doc.to_string())
+
+    def test_declares_prefixes_of_attributes_set_later(self):
+        doc = Doc(
+            "foo:bar",
+            namespaces={
+                "foo": "https://foo.example/blort",
+                "bar": "https://bar.example/zum",
+            },
+        )
+        nested = doc.element("foo:nest")
+
+        nested.set_attr("bar:zum", "1")
+
+        self.assertEqual(nested.attrs, {"bar:zum": "1"})
+        self.assertIn('xmlns:bar="https://bar.example/zum"', doc.to_string())
+
+    def test_writing_doc_does_not_change_elt_it_was_created_from(self):
+        elt = Elt("foo:bar", {"baz": "quux"})
+
+        Doc.from_element(elt, {"foo": "https://foo.example/blort"}).to_string()
+
+        self.assertEqual(elt.attrs, {"baz": "quux"})
+
+
+class TestElt(unittest.TestCase):
+    def test_elements_without_attrs_or_children_share_empty_values(self):
+        first = Elt("atom:name", text="Alice")
+        second = Elt("atom:name", {}, "Bob")
+
+        self.assertIs(first.attrs, second.attrs)
+        self.assertEqual(first.elements, ())
+        self.assertFalse(hasattr(first, "__dict__"))
+
+    def test_sets_of_prefixes_are_shared(self):
+        first = Elt("atom:entry")
+        first.element("atom:title", "First")
+        second = Elt("atom:entry")
+        second.element("atom:title", {"xml:lang": "en"}, "Second")
+        second.element("atom:link", {"xml:lang": "en"})
+
+        self.assertEqual(first.prefixes, {"atom"})
+        self.assertIs(first.prefixes, Elt("atom:id").prefixes)
+        self.assertEqual(second.prefixes, {"atom", "xml"})
+        self.assertIs(second.prefixes, Elt("atom:x", {"xml:lang": "en"}).prefixes)
+
+    def test_attrs_cannot_be_changed_without_set_attr(self):
+        attrs = {"rel": "self"}
+        elt = Elt("atom:link", attrs)
+        attrs["href"] = "feed.atom"
+
+        with self.assertRaises(TypeError):
+            elt.attrs["href"] = "feed.atom"
+        with self.assertRaises(TypeError):
+            Elt("atom:link").attrs["href"] = "feed.atom"
+        self.assertEqual(elt.attrs, {"rel": "self"})
+
+        elt.set_attr("href", "feed.atom")
+
+        self.assertEqual(elt.attrs, {"rel": "self", "href": "feed.atom"})
+        self.assertEqual(Elt("atom:link").attrs, {})
+
+    def test_adding_child_creates_list_of_elements(self):
+        elt = Elt("atom:author")
+
+        name = elt.element("atom:name", "Alice")
+        uri = elt.element("atom:uri", "https://alice.example/")
+
+        self.assertEqual(elt.elements, [name, uri])
+
+
+class TestRaw(unittest.TestCase):
+    def test_is_written_as_serialized(self):
+        elt = Elt("foo:baz", {"bar:zum": "1"})
+        elt.element("foo:quux", "Hello & <world>!")
+        raw = elt.to_raw(indent="  ", default_prefix="foo:")
+        doc = Doc(
+            "foo:bar",
+            namespaces={
+                "foo": "https://foo.example/blort",
+                "bar": "https://bar.example/zum",
+            },
+        )
+
+        doc.append(raw)
+        doc.append(raw)
+
+        self.assertIsInstance(raw, Raw)
+        self.assertEqual(raw.etype, "foo:baz")
+        baz = (
+            '  <baz bar:zum="1">\n'
+            "    <quux>Hello &amp; &lt;world&gt;!</quux>\n"
+            "  </baz>\n"
+        )
+        self.assertEqual(
+            doc.to_string(),
+            '<bar xmlns="https://foo.example/blort" xmlns:bar="https://bar.example/zum">\n'
+            f"{baz}{baz}</bar>\n",
+        )
+
+    def test_can_be_serialized_compactly(self):
+        elt = Elt("foo:baz")
+        elt.element("foo:quux", "Hello")
+        doc = Doc("foo:bar", namespaces={"foo": "https://foo.example/blort"})
+        doc.append(elt.to_raw(default_prefix="foo:", compact=True))
+
+        self.assertEqual(
+            doc.to_string(compact=True),
+            '<bar xmlns="https://foo.example/blort"><baz><quux>Hello</quux></baz></bar>',
+        )
+        with self.assertRaises(ValueError):
+            doc.to_string()
+
+    def test_cannot_be_written_with_different_indent(self):
+        raw = Elt("foo:baz").to_raw(indent="  ", default_prefix="foo:")
+        doc = Doc("foo:bar", namespaces={"foo": "https://foo.example/blort"})
+        wrapper = doc.element("foo:wrapper")
+        wrapper.append(raw)
+
+        with self.assertRaises(ValueError):
+            doc.to_string()
+
+
+class TestXmlWriter(unittest.TestCase):
+    namespaces = {"foo": "https://foo.example/blort", "bar": "https://bar.example/zum"}
+
+    def test_writes_same_as_doc(self):
+        doc = Doc("foo:bar", {"baz": "quux"}, self.namespaces)
+        doc.element("foo:baz", {"xml:lang": "en"}, "Hello & <world>!")
+        nested = doc.element("foo:nest", {"bar:zum": "1"})
+        nested.element("foo:egg")
+        nested.element("bar:glum", "Glum")
+        doc.element("foo:empty")
+
+        out = io.BytesIO()
+        with XmlWriter(
+            out, "foo:bar", {"baz": "quux"}, self.namespaces, prefixes=["bar"]
+        ) as writer:
+            writer.element("foo:baz", {"xml:lang": "en"}, "Hello & <world>!")
+            with writer.nested("foo:nest", {"bar:zum": "1"}):
+                writer.element("foo:egg")
+                writer.element("bar:glum", "Glum")
+            writer.start("foo:empty")
+            writer.end()
+
+        self.assertEqual(out.getvalue(), doc.to_string().encode("UTF-8"))
+        self.assertFalse(out.closed)
+
+    def test_writes_empty_root_element(self):
+        out = io.BytesIO()
+        with XmlWriter(out, "foo:bar", namespaces=self.namespaces):
+            pass
+
+        self.assertEqual(out.getvalue(), b'<bar xmlns="https://foo.example/blort"/>\n')
+
+    def test_can_append_elements_and_raw_elements(self):
+        elt = Elt("foo:baz")
+        elt.element("foo:quux", "Caf\u00e9")
+        raw = elt.to_raw(indent="  ", default_prefix="foo:")
+        doc = Doc("foo:bar", namespaces=self.namespaces)
+        doc.append(elt)
+        doc.append(raw)
+
+        out = io.BytesIO()
+        with XmlWriter(out, "foo:bar", namespaces=self.namespaces) as writer:
+            writer.append(elt)
+            writer.append(raw)
+
+        self.assertEqual(out.getvalue(), doc.to_string().encode("UTF-8"))
+
+    def test_writes_same_as_doc_compactly(self):
+        doc = Doc("foo:bar", namespaces=self.namespaces)
+        nested = doc.element("foo:nest")
+        nested.element("foo:egg", "Egg")
+        doc.element("foo:empty")
+
+        out = io.BytesIO()
+        with XmlWriter(
+            out, "foo:bar", namespaces=self.namespaces, compact=True
+        ) as writer:
+            with writer.nested("foo:nest"):
+                writer.element("foo:egg", "Egg")
+            writer.start("foo:empty")
+            writer.end()
+
+        self.assertEqual(out.getvalue(), doc.to_string(compact=True).encode("UTF-8"))
+
+    def test_rejects_undeclared_prefixes(self):
+        out = io.BytesIO()
+        with XmlWriter(out, "foo:bar", namespaces=self.namespaces) as writer:
+            with self.assertRaises(ValueError):
+                writer.element("bar:glum")
+            with self.assertRaises(ValueError):
+                writer.start("bar:glum")
+
+
+class TestEscape(unittest.TestCase):
+    def test_returns_text_with_nothing_to_escape_as_is(self):
+        text = "Hello, world! " * 100
+
+        self.assertIs(escape_text(text), text)
+        self.assertIs(escape_attr(text), text)
+
+    def test_escapes_text(self):
+        self.assertEqual(
+            escape_text('<a href="x">&amp;</a>'),
+            '&lt;a href="x"&gt;&amp;amp;&lt;/a&gt;',
+        )
+
+    def test_escapes_attribute_values(self):
+        self.assertEqual(
+            escape_attr('Say "<hi>" & go'), "Say &quot;&lt;hi&gt;&quot; &amp; go"
+        )